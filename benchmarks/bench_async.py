@@ -0,0 +1,219 @@
+"""
+Load test of the async serving mode (`pymedgraph.asgi.AsyncAPI`). Clients send `/searchTerms` and `/intersection`
+requests in a loop, while builds are posted to `/buildGraph`. The latency of the reads is reported per phase:
+
+    idle        reads only
+    async       reads while builds run on the `BuildExecutor` of the async api
+    blocking    reads while builds run on the event loop, like a server with a single worker
+
+The app runs in process without http server. The reads are answered from an `InMemoryGraph` with the simulated
+round trip `--latency` of the async neo4j driver. A build waits `--fetch-time` for the simulated data sources and then
+uploads synthetic tables (see `benchmarks/bench_upload.py`) into an `InMemoryGraph` of its worker thread.
+
+Builds, which run python code, compete with the event loop for the GIL. This shows in the tail latency of the async
+phase, a shorter switch interval reduces it.
+
+Usage:
+    python benchmarks/bench_async.py --clients 8 --duration 5 --builds 4 --workers 2 --output report.json
+    # shorter switch interval of the GIL
+    python benchmarks/bench_async.py --switch-interval 0.0005
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_upload import build_tables, TERM
+from pymedgraph.asgi import AsyncAPI
+from pymedgraph.jobs import BuildExecutor, ResourcePool
+from pymedgraph.dataextraction.basepipe import NodeTable
+from pymedgraph.graph.asyncreader import AsyncGraphReader
+from pymedgraph.graph.memorygraph import InMemoryGraph
+from pymedgraph.graph.registry import SearchTermRegistry
+
+
+TOKEN = 'benchmark'
+
+
+class StandInAsyncReader(AsyncGraphReader):
+    """ `AsyncGraphReader` without driver, which answers the search term query from an `InMemoryGraph` """
+
+    def __init__(self, connector, latency: float):
+        self.connector = connector
+        self.driver = None
+        self.logger = None
+        self.latency = latency
+
+    async def query(self, query: str, parameters: dict = None) -> list or None:
+        await asyncio.sleep(self.latency)
+        if query == SearchTermRegistry.LOAD_QUERY:
+            return self.connector.get_search_term_info()
+        return None
+
+    async def close(self):
+        pass
+
+
+class InlineExecutor(BuildExecutor):
+    """ Runs the builds on the event loop, so the reads wait for them """
+
+    async def run(self, func, *args):
+        return self._call(func, args)
+
+
+def read_graph(n_terms: int, n_papers: int) -> InMemoryGraph:
+    """ Returns graph with `n_terms` search terms, whose papers share UMLS concepts """
+    rng = random.Random(0)
+    terms = [f'term {i}' for i in range(n_terms)]
+    ids = [str(i) for i in range(n_terms * n_papers)]
+    papers = pd.DataFrame({'source': [terms[i // n_papers] for i in range(len(ids))], 'node_label': 'Paper',
+                           'pubmedID': ids})
+    links = pd.DataFrame({'source': ids, 'node_label': 'UMLS', 'CUI': [f'C{rng.randrange(n_papers)}' for _ in ids]})
+    graph = InMemoryGraph()
+    graph._init_new_neo4j_graph(terms)
+    graph.upload_nodetable(NodeTable('pubmedPaper', papers, 'SearchTerm', 'label', 'source', 'Paper', 'pubmedID', []))
+    graph.upload_nodetable(NodeTable('UmlsLinks', links, 'Paper', 'pubmedID', 'source', 'UMLS', 'CUI', []))
+    graph.update_reachability(terms)
+    return graph
+
+
+def build(graph: InMemoryGraph, req_specs: dict, batch: bool) -> str:
+    """ Simulated build: waits for the data sources and uploads the tables into the graph of the worker """
+    time.sleep(req_specs['fetch_time'])
+    graph._init_new_neo4j_graph(TERM, delete_existing_graph=False)
+    for node_table in build_tables(req_specs['round'], req_specs['rows']):
+        graph.upload_nodetable(node_table)
+    return 'success'
+
+
+async def call(app, method: str, path: str, query: str = '', body: bytes = b'') -> int:
+    """ Sends one request to the ASGI app and returns the status """
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = list()
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(), 'headers': list()}
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def reads(app, terms: list, end: float, clients: int) -> list:
+    """ Runs `clients` concurrent read loops until `end` and returns the latencies """
+    latencies = list()
+
+    async def client(i):
+        rng = random.Random(i)
+        while time.perf_counter() < end:
+            if rng.random() < 0.5:
+                path, query = '/searchTerms', f'token={TOKEN}'
+            else:
+                path, query = '/intersection', f'searchTerms={",".join(rng.sample(terms, 3))}&level=UMLS&token={TOKEN}'
+            start = time.perf_counter()
+            status = await call(app, 'GET', path, query)
+            latencies.append(time.perf_counter() - start)
+            assert status == 200, f'{path} returned {status}'
+
+    await asyncio.gather(*[client(i) for i in range(clients)])
+    return latencies
+
+
+async def phase(app, terms: list, args, n_builds: int) -> dict:
+    """ Measures reads, while `n_builds` builds are posted one after the other per worker """
+    builds_done = list()
+    end = time.perf_counter() + args.duration
+
+    async def builder(i):
+        round_ = i
+        # reads are running before the first build
+        await asyncio.sleep(0.1)
+        while time.perf_counter() < end:
+            body = json.dumps({'token': TOKEN, 'wait': True, 'request_specs': {
+                'round': round_, 'rows': args.rows, 'fetch_time': args.fetch_time
+            }}).encode()
+            start = time.perf_counter()
+            if await call(app, 'POST', '/buildGraph', body=body) == 200:
+                builds_done.append(time.perf_counter() - start)
+            round_ += n_builds
+            # gives the reads a chance between two builds of the blocking phase
+            await asyncio.sleep(0.01)
+
+    results = await asyncio.gather(
+        reads(app, terms, end, args.clients), *[builder(i) for i in range(n_builds)]
+    )
+    latencies = results[0]
+    ms = np.array(latencies) * 1000
+    return {
+        'reads': len(latencies),
+        'reads_per_second': round(len(latencies) / args.duration, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'max_ms': round(float(ms.max()), 2),
+        'builds': len(builds_done),
+        'build_seconds': round(float(np.mean(builds_done)), 3) if builds_done else None
+    }
+
+
+def run(args) -> dict:
+    if args.switch_interval:
+        sys.setswitchinterval(args.switch_interval)
+    graph = read_graph(args.terms, args.papers)
+    terms = graph.get_search_terms()
+    reader = StandInAsyncReader(graph, args.latency)
+    report = {
+        'clients': args.clients, 'duration': args.duration, 'latency': args.latency, 'builds': args.builds,
+        'workers': args.workers, 'rows': args.rows, 'fetch_time': args.fetch_time,
+        'switch_interval': sys.getswitchinterval(), 'phases': dict()
+    }
+    for name, executor in [('idle', None), ('async', BuildExecutor), ('blocking', InlineExecutor)]:
+        builds = (executor or BuildExecutor)(
+            ResourcePool(InMemoryGraph, size=args.workers), max_workers=args.workers, max_queued=args.builds
+        )
+        app = AsyncAPI(reader, builds, build, [TOKEN])
+        report['phases'][name] = asyncio.run(phase(app, terms, args, args.builds if executor else 0))
+        builds.shutdown()
+        print(json.dumps({name: report['phases'][name]}))
+    return report
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent read clients')
+    parser.add_argument('--duration', type=float, default=5., help='seconds per phase')
+    parser.add_argument('--latency', type=float, default=0.002, help='simulated neo4j round trip in seconds')
+    parser.add_argument('--builds', type=int, default=4, help='concurrent build requests')
+    parser.add_argument('--workers', type=int, default=2, help='max_workers of the BuildExecutor')
+    parser.add_argument('--rows', type=int, default=20000, help='papers per build')
+    parser.add_argument('--fetch-time', type=float, default=0.5, help='simulated fetch time of a build in seconds')
+    parser.add_argument('--switch-interval', type=float, default=None,
+                        help='switch interval of the GIL in seconds, see `asgi.switch_interval` of the config')
+    parser.add_argument('--terms', type=int, default=20, help='search terms of the read graph')
+    parser.add_argument('--papers', type=int, default=2000, help='papers per search term of the read graph')
+    parser.add_argument('--output', default=None, help='path of JSON report')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark compares N single builds (`MedGraphManager.construct_med_graph`) with one batch build
+(`MedGraphManager.construct_med_graph_batch`) for the same search terms.
+
+Reported per mode: wall time, number of fetched and NER'd articles and the number of MedGen/UniProt requests.
+The tables are not uploaded.
+
+Usage:
+    python benchmarks/bench_batch_build.py --config pymedgraph/localconfig.json --terms phenylketonuria epilepsy
+"""
+import json
+import time
+import argparse
+
+from pymedgraph.manager import MedGraphManager
+
+
+class CallCounter(object):
+    """ Wraps a method and counts calls and the number of passed items """
+    def __init__(self, func, count_items):
+        self.func = func
+        self.count_items = count_items
+        self.calls = 0
+        self.items = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        self.items += self.count_items(*args, **kwargs)
+        return self.func(*args, **kwargs)
+
+
+def instrument(manager: MedGraphManager) -> dict:
+    counters = {
+        'fetchedArticles': CallCounter(manager.ncbi_fetcher.fetch_pubmed_paper, lambda ids, **kw: len(ids)),
+        'nerArticles': CallCounter(manager.ner_pipe.run, lambda **kw: len(kw['abstracts'])),
+        'medGenRequests': CallCounter(manager.ncbi_fetcher.get_medgen_summaries, lambda cuis: len(cuis)),
+        'uniProtRequests': CallCounter(manager.uniprot_pipe.run, lambda **kw: len(kw['genes']))
+    }
+    manager.ncbi_fetcher.fetch_pubmed_paper = counters['fetchedArticles']
+    manager.ner_pipe.run = counters['nerArticles']
+    manager.ncbi_fetcher.get_medgen_summaries = counters['medGenRequests']
+    manager.uniprot_pipe.run = counters['uniProtRequests']
+    return counters
+
+
+def reset(counters: dict):
+    for counter in counters.values():
+        counter.calls = 0
+        counter.items = 0
+
+
+def summary(counters: dict, wall_time: float) -> dict:
+    return {
+        'wallTime': round(wall_time, 3),
+        'fetchedArticles': counters['fetchedArticles'].items,
+        'nerArticles': counters['nerArticles'].items,
+        'medGenRequests': counters['medGenRequests'].calls,
+        'uniProtRequests': counters['uniProtRequests'].calls
+    }
+
+
+def run(manager: MedGraphManager, terms: list, n_articles: int) -> dict:
+    counters = instrument(manager)
+    request = {
+        'n_articles': n_articles,
+        'pipelines': {
+            'pubmed': {'run': True},
+            'ner': {'run': True},
+            'medGen': {'run': True, 'Snomed': True, 'clinicalFeatures': True},
+            'uniProt': {'run': True}
+        }
+    }
+    results = dict()
+
+    start = time.time()
+    for term in terms:
+        manager.construct_med_graph(dict(request, disease=term))
+    results['single'] = summary(counters, time.time() - start)
+
+    reset(counters)
+    start = time.time()
+    manager.construct_med_graph_batch(dict(request, diseases=terms))
+    results['batch'] = summary(counters, time.time() - start)
+    results['speedup'] = round(results['single']['wallTime'] / max(results['batch']['wallTime'], 1e-9), 2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='pymedgraph/localconfig.json')
+    parser.add_argument('--terms', nargs='+', required=True)
+    parser.add_argument('--n-articles', type=int, default=50)
+    args = parser.parse_args()
+
+    print(json.dumps(run(MedGraphManager(args.config), args.terms, args.n_articles), indent=2))
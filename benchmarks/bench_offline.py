@@ -0,0 +1,257 @@
+"""
+Offline benchmark of a full build. PubMed, MedGen and UniProt are replayed from fixtures by a local http server,
+the NER output is replayed from the fixtures, too, and the upload runs against a stand-in for the `Neo4jConnector`
+(see `benchmarks/offline.py`). The benchmark runs `MedGraphManager.construct_med_graph` and
+`Neo4jConnector.build_biomed_graph` for each scale in a fresh process, so the peak memory is measured per scale.
+
+The JSON report contains per scale the wall time of build and upload, the stage timings of the scheduler and the
+steps recorded by `pymedgraph.metrics` with rows per second, bytes and peak memory. It can be stored per commit and
+compared between runs.
+
+Usage:
+    # create synthetic fixtures with 10k articles (or record real responses, requires network and scispacy model)
+    python benchmarks/bench_offline.py generate --fixtures benchmarks/fixtures/synthetic --n-articles 10000
+    python benchmarks/bench_offline.py record --fixtures benchmarks/fixtures/pku --term phenylketonuria \
+        --n-articles 2000 --email me@example.com
+    # run benchmark
+    python benchmarks/bench_offline.py run --fixtures benchmarks/fixtures/synthetic --scales 10 1000 10000 \
+        --output report.json
+    # chunked build (`MedGraphManager.construct_med_graph_chunked`), compare peak_rss with the run above
+    python benchmarks/bench_offline.py run --fixtures benchmarks/fixtures/synthetic --scales 10000 --chunk-size 1000
+    # upload into `pymedgraph.graph.memorygraph.InMemoryGraph`, which builds the graph instead of counting queries
+    python benchmarks/bench_offline.py run --fixtures benchmarks/fixtures/synthetic --scales 10000 --backend memory
+    # upload the same outputs a second time with an `UploadManifest`, `reupload` reports the rows sent again
+    python benchmarks/bench_offline.py run --fixtures benchmarks/fixtures/synthetic --scales 10000 --manifest
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from offline import (FixtureStore, FakeServiceServer, FixtureNERPipe, StandInNeo4jConnector, patch_services,
+                     generate_fixtures, record_fixtures)
+
+
+def _config(path: str, n_articles: int, compact: bool = False) -> str:
+    """ Writes manager config without MedGen gene list, which would be downloaded at init """
+    cfg = {
+        'tables': {'compact': compact},
+        'NCBI': {'email': 'benchmark@example.com', 'tool_name': 'pymedgraph-benchmark', 'max_articles': n_articles},
+        'Neo4j': {'url': '', 'user': '', 'pw': ''},
+        'scheduler': {'max_workers': 4},
+        'pipes': {'medgen': {'max_concepts': 100}}
+    }
+    config_path = os.path.join(path, 'config.json')
+    with open(config_path, 'w') as fh:
+        json.dump(cfg, fh)
+    return config_path
+
+
+def run_scale(fixtures: str, n_articles: int, term: str, latency: float, row_cost: float,
+              chunk_size: int = None, compact: bool = False, single_pass: bool = False,
+              backend: str = 'standin', manifest: bool = False) -> dict:
+    """ Runs one build and upload and returns the report of the scale, chunked if `chunk_size` is set """
+    from pymedgraph.manager import MedGraphManager
+    from pymedgraph.graph.memorygraph import InMemoryGraph
+    from pymedgraph.graph.uploadworker import UploadWorker
+    from pymedgraph.metrics import REGISTRY, peak_rss
+
+    store = FixtureStore(fixtures)
+    request = {
+        'disease': term,
+        'n_articles': n_articles,
+        'use_cache': False,
+        'pipelines': {
+            'pubmed': {'run': True, 'meshTerms': True},
+            'ner': {'run': True, 'entityLinks': True},
+            'medGen': {'run': True, 'Snomed': True, 'clinicalFeatures': True},
+            'uniProt': {'run': True}
+        }
+    }
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch('pymedgraph.manager.NERPipe', lambda **kw: FixtureNERPipe(store, **kw)):
+        manager = MedGraphManager(config_path=_config(tmp, n_articles, compact=compact))
+    if backend == 'memory':
+        neo4j = InMemoryGraph()
+    else:
+        neo4j = StandInNeo4jConnector(row_cost=row_cost, manifest=manifest)
+        neo4j.single_pass = single_pass
+    REGISTRY.reset()
+    rss_start = peak_rss()
+
+    with FakeServiceServer(store, latency=latency) as server, patch_services(server):
+        if chunk_size:
+            # chunks are uploaded while the build is running, upload time is the wait for the last uploads
+            request['chunk_size'] = chunk_size
+            uploader = UploadWorker(neo4j, max_pending=2)
+            start = time.time()
+            disease, outputs, delete_graph = manager.construct_med_graph_chunked(request, uploader=uploader)
+            build_time = time.time() - start
+            start = time.time()
+            uploader.finish()
+            upload_time = time.time() - start
+        else:
+            start = time.time()
+            disease, outputs, delete_graph = manager.construct_med_graph(request)
+            build_time = time.time() - start
+            start = time.time()
+            neo4j.build_biomed_graph(disease, outputs, delete_graph)
+            upload_time = time.time() - start
+
+    upload = {'nodes': neo4j.count_nodes(), 'relationships': neo4j.count_relationships()} \
+        if backend == 'memory' else {'queries': neo4j.queries, 'rows': neo4j.rows}
+    reupload = None
+    if manifest and backend == 'standin':
+        # second upload of unchanged outputs, e.g. a rebuild of the same search term
+        queries, rows = neo4j.queries, neo4j.rows
+        start = time.time()
+        for output in outputs:
+            neo4j.upload_pipe_output(output)
+        reupload = {
+            'time': round(time.time() - start, 4), 'queries': neo4j.queries - queries, 'rows': neo4j.rows - rows
+        }
+
+    steps = dict()
+    for (kind, name), values in sorted(REGISTRY.snapshot().items()):
+        steps[f'{kind}:{name}'] = {
+            'count': values['count'],
+            'seconds': round(values['seconds'], 4),
+            'rows_in': values['rows_in'],
+            'rows_out': values['rows_out'],
+            'rows_per_second': round(max(values['rows_in'], values['rows_out']) / values['seconds'], 1)
+            if values['seconds'] > 0 else None,
+            'bytes': values['bytes'],
+            'peak_memory': values['peak_memory']
+        }
+    return {
+        'n_articles': n_articles,
+        'chunk_size': chunk_size,
+        'chunks': len(manager.stage_report.get('chunks', [])),
+        'fetched_articles': sum(c['articles'] for c in manager.stage_report['chunks']) if chunk_size else
+        len(outputs[0].get_table('pubmedPaper')) if outputs else 0,
+        'build_time': round(build_time, 4),
+        'upload_time': round(upload_time, 4),
+        'articles_per_second': round(n_articles / (build_time + upload_time), 2),
+        'stages': {k: round(v['duration'], 4) for k, v in manager.stage_report['stages'].items()},
+        'critical_path': manager.stage_report['critical_path'],
+        'tables': {t.name: len(t.data) for o in outputs for t in o.node_tables},
+        'table_bytes': int(sum(t.data.memory_usage(deep=True).sum() for o in outputs for t in o.node_tables)),
+        'upload': upload,
+        'reupload': reupload,
+        'requests': server.requests,
+        'steps': steps,
+        'peak_rss_start': rss_start,
+        'peak_rss': peak_rss()
+    }
+
+
+def _git_commit() -> str or None:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def run(args) -> dict:
+    """ Runs each scale in a separate process and collects the reports """
+    report = {
+        'commit': _git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'fixtures': os.path.abspath(args.fixtures),
+        'latency': args.latency,
+        'row_cost': args.row_cost,
+        'chunk_size': args.chunk_size,
+        'compact': args.compact,
+        'single_pass': args.single_pass,
+        'backend': args.backend,
+        'manifest': args.manifest,
+        'scales': list()
+    }
+    for scale in args.scales:
+        cmd = [
+            sys.executable, os.path.abspath(__file__), 'run-scale', '--fixtures', args.fixtures, '--term', args.term,
+            '--n-articles', str(scale), '--latency', str(args.latency), '--row-cost', str(args.row_cost),
+            '--backend', args.backend
+        ]
+        if args.chunk_size:
+            cmd += ['--chunk-size', str(args.chunk_size)]
+        if args.compact:
+            cmd.append('--compact')
+        if args.single_pass:
+            cmd.append('--single-pass')
+        if args.manifest:
+            cmd.append('--manifest')
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE)
+        report['scales'].append(json.loads(result.stdout.decode().strip().split('\n')[-1]))
+    return report
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='write synthetic fixtures')
+    generate_parser.add_argument('--fixtures', required=True)
+    generate_parser.add_argument('--n-articles', type=int, default=10000)
+    generate_parser.add_argument('--term', default='synthetic disease')
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    record_parser = subparsers.add_parser('record', help='record real responses, requires network')
+    record_parser.add_argument('--fixtures', required=True)
+    record_parser.add_argument('--term', required=True)
+    record_parser.add_argument('--n-articles', type=int, default=1000)
+    record_parser.add_argument('--email', required=True)
+    record_parser.add_argument('--nlp-model', default='en_ner_bc5cdr_md')
+
+    for name in ['run', 'run-scale']:
+        run_parser = subparsers.add_parser(name, help='run benchmark' if name == 'run' else argparse.SUPPRESS)
+        run_parser.add_argument('--fixtures', required=True)
+        run_parser.add_argument('--term', default='synthetic disease')
+        run_parser.add_argument('--latency', type=float, default=0., help='seconds added to each service response')
+        run_parser.add_argument('--row-cost', type=float, default=0., help='seconds per uploaded row')
+        run_parser.add_argument('--chunk-size', type=int, default=None, help='run chunked build with articles per chunk')
+        run_parser.add_argument('--compact', action='store_true', help='store compact node tables')
+        run_parser.add_argument('--single-pass', action='store_true', help='upload nodes and relations in one query')
+        run_parser.add_argument('--backend', choices=['standin', 'memory'], default='standin',
+                                help='upload to query counting stand-in or to in-memory graph')
+        run_parser.add_argument('--manifest', action='store_true', help='diff uploads with an upload manifest')
+        if name == 'run':
+            run_parser.add_argument('--scales', type=int, nargs='+', default=[10, 1000, 10000])
+            run_parser.add_argument('--output', default=None, help='path of JSON report, default is stdout')
+        else:
+            run_parser.add_argument('--n-articles', type=int, required=True)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.command == 'generate':
+        generate_fixtures(args.fixtures, args.n_articles, seed=args.seed, term=args.term)
+    elif args.command == 'record':
+        record_fixtures(args.fixtures, args.term, args.n_articles, args.email, nlp_model=args.nlp_model)
+    elif args.command == 'run-scale':
+        result = run_scale(args.fixtures, args.n_articles, args.term, args.latency, args.row_cost, args.chunk_size,
+                           args.compact, args.single_pass, args.backend, args.manifest)
+        # last line of stdout is read by `run()`, pipes print their progress before
+        print(json.dumps(result))
+    else:
+        report = run(args)
+        if args.output:
+            with open(args.output, 'w') as fh:
+                json.dump(report, fh, indent=2)
+        else:
+            print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of the upload time against the size of the graph. Requires a running neo4j instance, the graph and all its
+indexes and constraints are deleted before the benchmark.
+
+Synthetic Paper, DISEASE and UMLS tables are uploaded in rounds with `Neo4jConnector.upload_nodetable`. Each round
+adds new nodes, so the graph grows, and the upload time of each round is reported together with the number of nodes
+before the round. Without indexes the time per round grows with the graph, with indexes it stays flat.
+
+Usage:
+    python benchmarks/bench_upload.py --url bolt://localhost:7687 --user neo4j --pw secret --rounds 10 --rows 5000
+    # compare with uploads without indexes
+    python benchmarks/bench_upload.py --url bolt://localhost:7687 --user neo4j --pw secret --no-indexes
+"""
+import json
+import time
+import argparse
+
+import pandas as pd
+
+from pymedgraph.dataextraction.basepipe import NodeTable
+from pymedgraph.graph.neo4jconnector import Neo4jConnector
+
+
+TERM = 'benchmark disease'
+
+
+def build_tables(round_: int, n_rows: int) -> list:
+    """ Returns Paper, DISEASE and UMLS tables with `n_rows` new papers, entities and concepts of one round """
+    ids = [f'{round_}-{i}' for i in range(n_rows)]
+    papers = pd.DataFrame({
+        'source': TERM, 'node_label': 'Paper', 'pubmedID': ids, 'title': [f'title {i}' for i in ids]
+    })
+    entities = pd.DataFrame({'source': ids, 'node_label': 'DISEASE', 'text': [f'disease {i}' for i in ids]})
+    links = pd.DataFrame({
+        'source': entities['text'], 'node_label': 'UMLS', 'CUI': [f'C{i}' for i in ids], 'name': entities['text']
+    })
+    return [
+        NodeTable('pubmedPaper', papers, 'SearchTerm', 'label', 'source', 'Paper', 'pubmedID', ['title']),
+        NodeTable('Entities', entities, 'Paper', 'pubmedID', 'source', 'DISEASE', 'text', ''),
+        NodeTable('UmlsLinks', links, 'DISEASE', 'text', 'source', 'UMLS', 'CUI', ['name'])
+    ]
+
+
+def count_nodes(neo4j: Neo4jConnector) -> int:
+    return neo4j.query('MATCH (n) RETURN count(n) as total', None)[0]['total']
+
+
+def drop_indexes(neo4j: Neo4jConnector):
+    """ Drops constraints and indexes of previous runs, lookup indexes of neo4j are kept """
+    for row in neo4j.query('SHOW CONSTRAINTS YIELD name RETURN name', None) or []:
+        neo4j.query(f'DROP CONSTRAINT {row["name"]} IF EXISTS', None)
+    for row in neo4j.query('SHOW INDEXES YIELD name, type WHERE type <> "LOOKUP" RETURN name', None) or []:
+        neo4j.query(f'DROP INDEX {row["name"]} IF EXISTS', None)
+
+
+def run(args) -> dict:
+    neo4j = Neo4jConnector(args.url, args.user, args.pw, unique_constraints=args.unique_constraints)
+    drop_indexes(neo4j)
+    if args.no_indexes:
+        # skip index creation of the connector
+        neo4j._ensure_index = lambda label, attribute, unique=False: None
+    neo4j._init_new_neo4j_graph(TERM, delete_existing_graph=True)
+    report = {'rows': args.rows, 'indexes': not args.no_indexes, 'rounds': list()}
+    try:
+        for round_ in range(args.rounds):
+            tables = build_tables(round_, args.rows)
+            nodes = count_nodes(neo4j)
+            start = time.time()
+            for node_table in tables:
+                neo4j.upload_nodetable(node_table)
+            seconds = time.time() - start
+            report['rounds'].append({
+                'nodes_before': nodes,
+                'seconds': round(seconds, 4),
+                'rows_per_second': round(sum(len(t.data) for t in tables) / seconds, 1)
+            })
+            print(json.dumps(report['rounds'][-1]))
+    finally:
+        neo4j.close()
+    return report
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--pw', required=True)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=5000, help='new papers per round')
+    parser.add_argument('--no-indexes', action='store_true', help='upload without creating indexes')
+    parser.add_argument('--unique-constraints', action='store_true', help='create uniqueness constraints')
+    parser.add_argument('--output', default=None, help='path of JSON report')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,465 @@
+"""
+Local stand-ins for the services used by `pymedgraph`, so builds can be benchmarked without network access.
+
+- `FixtureStore`: recorded (or generated) responses of PubMed, MedGen and UniProt plus the NER output of the articles
+- `FakeServiceServer`: local http server, which answers E-utilities and UniProt requests from a `FixtureStore`
+- `patch_services()`: redirects `Bio.Entrez` and `pymedgraph.input.uniprot` to the local server
+- `FixtureNERPipe`: replays the recorded NER output, the scispacy model is not required
+- `StandInNeo4jConnector`: `Neo4jConnector` without driver, which only counts the uploaded rows
+
+Fixture directory layout:
+    pubmed_ids.json         search term -> list of PubMed UID`s (key '*' is used for unknown terms)
+    pubmed_articles.xml     PubmedArticleSet with all articles
+    medgen_uids.json        CUI -> MedGen UID
+    medgen_summaries.xml    eSummaryResult with one DocumentSummary per MedGen UID
+    uniprot.tsv             UniProt table as returned by the search endpoint
+    ner.json                {'entities': [[pubmedID, text, label], ...], 'links': [[text, CUI, score, name, def], ...]}
+"""
+import os
+import re
+import json
+import time
+import random
+import threading
+import contextlib
+import urllib.request
+import urllib.parse
+import xml.etree.ElementTree as ET
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+from Bio import Entrez
+
+from pymedgraph.dataextraction.basepipe import BasePipe, PipeOutput, NodeTable
+from pymedgraph.dataextraction.uniprotcolumns import UNIPROT_COLS
+import pymedgraph.input.uniprot as uniprot
+from pymedgraph.graph.neo4jconnector import Neo4jConnector
+from pymedgraph.graph.reachability import ReachabilityIndex
+from pymedgraph.graph.setalgebra import SetAlgebra
+from pymedgraph.graph.uploadmanifest import UploadManifest
+
+
+EUTILS_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'
+PUBMED_HEADER = (
+    '<?xml version="1.0" ?>\n<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2025//EN" '
+    '"https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">\n'
+)
+ESEARCH_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" ?>\n<!DOCTYPE eSearchResult PUBLIC "-//NLM//DTD esearch 20060628//EN" '
+    '"https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20060628/esearch.dtd">\n'
+)
+UNIPROT_LABELS = [v['label'] for v in UNIPROT_COLS.values()]
+
+
+class FixtureStore(object):
+    """ Class loads a fixture directory and builds the responses of the fake services """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'pubmed_ids.json'), 'r') as fh:
+            self.pubmed_ids = json.load(fh)
+        self.articles = self._read_fragments('pubmed_articles.xml', 'PubmedArticle', 'MedlineCitation/PMID')
+        with open(os.path.join(path, 'medgen_uids.json'), 'r') as fh:
+            self.medgen_uids = json.load(fh)
+        self.summaries = self._read_fragments('medgen_summaries.xml', 'DocumentSummarySet/DocumentSummary', None)
+        self.uniprot = pd.read_csv(os.path.join(path, 'uniprot.tsv'), delimiter='\t', dtype=str)
+        with open(os.path.join(path, 'ner.json'), 'r') as fh:
+            self.ner = json.load(fh)
+
+    def _read_fragments(self, file_name: str, element: str, id_path: str or None) -> dict:
+        """ Returns serialised child elements of the fixture file by id """
+        root = ET.parse(os.path.join(self.path, file_name)).getroot()
+        fragments = dict()
+        for child in root.findall(element):
+            key = child.find(id_path).text if id_path else child.attrib['uid']
+            fragments[key] = ET.tostring(child, encoding='unicode')
+        return fragments
+
+    def esearch(self, params: dict) -> bytes:
+        if params.get('db') == 'medgen':
+            cuis = [c.strip() for c in params.get('term', '').split(' OR ')]
+            ids = [self.medgen_uids[c] for c in cuis if c in self.medgen_uids]
+        else:
+            ids = self.pubmed_ids.get(params.get('term', '').lower(), self.pubmed_ids.get('*', list()))
+        ids = ids[:int(params.get('retmax', 20))]
+        body = '<eSearchResult><Count>{n}</Count><RetMax>{n}</RetMax><RetStart>0</RetStart><IdList>{ids}</IdList>' \
+               '<TranslationSet/><QueryTranslation>{q}</QueryTranslation></eSearchResult>'.format(
+                n=len(ids), ids=''.join(f'<Id>{i}</Id>' for i in ids), q='')
+        return (ESEARCH_HEADER + body).encode('utf-8')
+
+    def efetch(self, params: dict) -> bytes:
+        ids = [i for i in params.get('id', '').split(',') if i]
+        body = ''.join(self.articles[i] for i in ids if i in self.articles)
+        return (PUBMED_HEADER + f'<PubmedArticleSet>{body}</PubmedArticleSet>').encode('utf-8')
+
+    def esummary(self, params: dict) -> bytes:
+        ids = [i for i in params.get('id', '').split(',') if i]
+        body = ''.join(self.summaries[i] for i in ids if i in self.summaries)
+        return ('<?xml version="1.0" encoding="UTF-8" ?>\n<eSummaryResult><DocumentSummarySet status="OK">'
+                f'{body}</DocumentSummarySet></eSummaryResult>').encode('utf-8')
+
+    def uniprot_search(self, params: dict) -> bytes:
+        genes = set(g.lower() for g in re.findall(r'gene:([^\s()]+)', params.get('query', '')))
+        df = self.uniprot[self.uniprot[UNIPROT_COLS['gene_primary']['label']].str.lower().isin(genes)]
+        df = df.head(int(params.get('limit', len(df))))
+        return df.to_csv(sep='\t', index=False).encode('utf-8')
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """ Answers E-utilities and UniProt requests, the store is set at the server """
+
+    ROUTES = {
+        'esearch.fcgi': 'esearch',
+        'efetch.fcgi': 'efetch',
+        'esummary.fcgi': 'esummary',
+        'search': 'uniprot_search'
+    }
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        self._respond(url.path, urllib.parse.parse_qs(url.query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        url = urllib.parse.urlparse(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        params.update(urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8')))
+        self._respond(url.path, params)
+
+    def _respond(self, path: str, params: dict):
+        route = self.ROUTES.get(path.rstrip('/').split('/')[-1])
+        if route is None:
+            self.send_error(404)
+            return
+        params = {k: ','.join(v) for k, v in params.items()}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = getattr(self.server.store, route)(params)
+        self.server.count(route, len(body))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain' if route == 'uniprot_search' else 'text/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeServiceServer(object):
+    """
+    Class runs a local http server in a background thread, which replays the responses of a `FixtureStore`.
+
+    Usage:
+        with FakeServiceServer(FixtureStore('fixtures/synthetic')) as server, patch_services(server):
+            manager.construct_med_graph(req_specs)
+    """
+
+    def __init__(self, store: FixtureStore, latency: float = 0.):
+        """
+        :param store: FixtureStore
+        :param latency: float - seconds added to every response to simulate network latency
+        """
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _FixtureHandler)
+        self._server.store = store
+        self._server.latency = latency
+        self._server.count = self._count
+        self._lock = threading.Lock()
+        self._thread = None
+        self.requests = dict()
+
+    @property
+    def url(self) -> str:
+        return 'http://{h}:{p}/'.format(h=self._server.server_address[0], p=self._server.server_address[1])
+
+    def _count(self, route: str, n_bytes: int):
+        with self._lock:
+            stats = self.requests.setdefault(route, {'requests': 0, 'bytes': 0})
+            stats['requests'] += 1
+            stats['bytes'] += n_bytes
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextlib.contextmanager
+def patch_services(server: FakeServiceServer, rate_limit: bool = False):
+    """
+    Context manager redirects the requests of `Bio.Entrez` and `pymedgraph.input.uniprot` to the fake server.
+
+    :param server: FakeServiceServer
+    :param rate_limit: bool - keep the rate limit of `Bio.Entrez` (3 requests per second without api key)
+    """
+    entrez_urlopen = Entrez.urlopen
+    entrez_open_previous = Entrez._open.previous
+    uniprot_url = uniprot.UNIPROT_URL
+
+    def local_urlopen(request, *args, **kwargs):
+        if not rate_limit:
+            # pretend the last request was long ago, `Bio.Entrez._open` then does not wait
+            Entrez._open.previous = 0
+        url = request.full_url.replace(EUTILS_URL, server.url + 'eutils/')
+        return urllib.request.urlopen(
+            urllib.request.Request(url, data=request.data, headers=dict(request.header_items())), *args, **kwargs
+        )
+
+    Entrez.urlopen = local_urlopen
+    uniprot.UNIPROT_URL = server.url + 'uniprotkb/search'
+    try:
+        yield server
+    finally:
+        Entrez.urlopen = entrez_urlopen
+        Entrez._open.previous = entrez_open_previous
+        uniprot.UNIPROT_URL = uniprot_url
+
+
+class FixtureNERPipe(BasePipe):
+    """
+    Stand-in for `pymedgraph.dataextraction.entityrecognition.NERPipe`, which returns the recorded entities and UMLS
+    links of the passed abstracts. Builds the same NodeTables as the NERPipe.
+    """
+
+    def __init__(self, store: FixtureStore, nlp_model: str = None, entity_linker: str = None, depends_on=None):
+        super().__init__('NERPipe', depends_on)
+        self.entities = pd.DataFrame(store.ner['entities'], columns=[self.SOURCE_COL, 'text', self.NODEL_LABEL_COL])
+        self.links = pd.DataFrame(
+            store.ner['links'], columns=[self.SOURCE_COL, 'CUI', 'kb_score', 'name', 'Definition']
+        )
+        self.links[self.NODEL_LABEL_COL] = 'UMLS'
+
+    def _run_pipe(self, abstracts: pd.DataFrame, id_col: str, abstract_col: str) -> PipeOutput:
+        output = PipeOutput(self.name)
+        df_entities = self.entities[self.entities[self.SOURCE_COL].isin(abstracts[id_col])].copy()
+        output.add(NodeTable(
+            name='Entities',
+            df=df_entities,
+            source_node='Paper',
+            source_node_attr='pubmedID',
+            source_col=self.SOURCE_COL,
+            node_label=list(df_entities[self.NODEL_LABEL_COL].unique()),
+            id_attribute='text',
+            attribute_cols=''
+        ))
+        df_links = self.links[self.links[self.SOURCE_COL].isin(df_entities['text'])].copy()
+        if not df_links.empty:
+            output.add(NodeTable(
+                name='UmlsLinks',
+                df=df_links,
+                source_node=list(df_entities[self.NODEL_LABEL_COL].unique()),
+                source_node_attr='text',
+                source_col=self.SOURCE_COL,
+                node_label='UMLS',
+                id_attribute='CUI',
+                attribute_cols=['name', 'Definition']
+            ))
+        return output
+
+
+class StandInNeo4jConnector(Neo4jConnector):
+    """
+    `Neo4jConnector` without neo4j driver. The queries are built as usual, but `query()` only counts queries and rows.
+    With `row_cost` the write time of neo4j can be simulated.
+    """
+
+    def __init__(self, row_cost: float = 0., logger=None, manifest: bool = False):
+        """
+        :param row_cost: float - seconds per uploaded row
+        :param manifest: bool - flag to upload only new or changed rows with an in-memory `UploadManifest`
+        :param logger: logging.logger
+        """
+        self.driver = None
+        self.logger = logger
+        self.unique_constraints = False
+        self.single_pass = False
+        self.writer = None
+        self._indexed = set()
+        self.reachability = ReachabilityIndex()
+        self.set_algebra = SetAlgebra(self.reachability)
+        self.registry = None
+        self.manifest = UploadManifest() if manifest else None
+        self.row_cost = row_cost
+        self.queries = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def query(self, query, parameters):
+        n_rows = len(parameters['rows']) if parameters and 'rows' in parameters else 0
+        with self._lock:
+            self.queries += 1
+            self.rows += n_rows
+        if self.row_cost:
+            time.sleep(self.row_cost * n_rows)
+        if query.startswith('MATCH (s:SearchTerm {label: $disease})'):
+            return list()
+        return [{'total': n_rows}]
+
+    def update_reachability(self, search_terms, propagate: bool = True, batch_size: int = 10000) -> list:
+        # the stand-in has no graph to collect the subgraph from
+        return list()
+
+    def close(self):
+        pass
+
+
+def generate_fixtures(path: str, n_articles: int, seed: int = 0, term: str = 'synthetic disease'):
+    """
+    Method writes synthetic fixtures for `n_articles` articles. Entities, UMLS links, MedGen concepts and UniProt
+    entries are drawn from fixed vocabularies, so the sizes of the tables grow with the number of articles like for
+    real search terms.
+
+    :param path: str - fixture directory
+    :param n_articles: int - number of articles
+    :param seed: int - random seed
+    :param term: str - search term the articles are returned for
+    """
+    rnd = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    diseases = [f'disease {i}' for i in range(400)]
+    chemicals = [f'chemical {i}' for i in range(300)]
+    genes = [f'GENE{i}' for i in range(200)]
+    cuis = [f'C{i:07d}' for i in range(1000)]
+
+    # articles and their entities
+    ids = [str(30000000 + i) for i in range(n_articles)]
+    articles = list()
+    entities = list()
+    for uid in ids:
+        ents = rnd.sample(diseases, rnd.randint(1, 6)) + rnd.sample(chemicals, rnd.randint(0, 4))
+        abstract = ' '.join(f'We report findings on {e} in a cohort of {rnd.randint(10, 900)} patients.' for e in ents)
+        mesh = ''.join(
+            f'<MeshHeading><DescriptorName UI="D{rnd.randint(1, 999):06d}" MajorTopicYN="N">{m}</DescriptorName>'
+            f'</MeshHeading>' for m in rnd.sample(diseases, 2)
+        )
+        articles.append(
+            f'<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM"><PMID Version="1">{uid}</PMID>'
+            f'<Article PubModel="Print"><ArticleTitle>Study {uid} on {ents[0]}</ArticleTitle>'
+            f'<Abstract><AbstractText>{abstract}</AbstractText></Abstract></Article>'
+            f'<MeshHeadingList>{mesh}</MeshHeadingList></MedlineCitation>'
+            f'<PubmedData><ArticleIdList><ArticleId IdType="pubmed">{uid}</ArticleId></ArticleIdList></PubmedData>'
+            f'</PubmedArticle>'
+        )
+        entities += [[f'pubmed~{uid}', e, 'DISEASE' if e.startswith('disease') else 'CHEMICAL'] for e in ents]
+    links = list()
+    for e in diseases + chemicals:
+        for cui in rnd.sample(cuis, rnd.randint(1, 3)):
+            links.append([e, cui, round(rnd.uniform(0.8, 1.), 4), f'concept {cui}', f'Definition of {cui}.'])
+
+    # MedGen concepts
+    medgen_uids = {cui: str(100000 + i) for i, cui in enumerate(cuis)}
+    summaries = list()
+    for cui, uid in medgen_uids.items():
+        gene_xml = ''.join(f'<Gene gene_id="{g[4:]}">{g}</Gene>' for g in rnd.sample(genes, rnd.randint(0, 3)))
+        snomed_xml = ''.join(
+            f'<Name SAUI="{rnd.randint(10 ** 6, 10 ** 7)}" SCUI="{rnd.randint(10 ** 6, 10 ** 7)}" '
+            f'SAB="SNOMEDCT_US">snomed {cui} {j}</Name>' for j in range(rnd.randint(0, 2))
+        )
+        cf_xml = ''.join(
+            f'<ClinicalFeature CUI="{c}"><Name>feature {c}</Name><SemanticType>Finding</SemanticType>'
+            f'<Definition>Definition of feature {c}.</Definition></ClinicalFeature>'
+            for c in rnd.sample(cuis, rnd.randint(0, 4))
+        )
+        summaries.append(
+            f'<DocumentSummary uid="{uid}"><ConceptId>{cui}</ConceptId><ConceptMeta>'
+            f'<AssociatedGenes>{gene_xml}</AssociatedGenes><SNOMEDCT>{snomed_xml}</SNOMEDCT>'
+            f'<ClinicalFeatures>{cf_xml}</ClinicalFeatures></ConceptMeta></DocumentSummary>'
+        )
+
+    # UniProt entries
+    rows = list()
+    for i, gene in enumerate(genes):
+        go = '; '.join(f'go term {j} [GO:{j:07d}]' for j in rnd.sample(range(5000), 3))
+        rows.append([
+            f'P{i:05d}', f'{gene}_HUMAN', 'reviewed', f'Protein of {gene} (EC 1.1.1.1)', f'{gene} ALT{i}', gene,
+            'Homo sapiens (Human)', f'FUNCTION: Function of {gene}.', f'NP_{i:06d}.1;', go, go, go
+        ])
+
+    _write_fixtures(path, {term.lower(): ids, '*': ids}, PUBMED_HEADER + '<PubmedArticleSet>' + ''.join(articles) +
+                    '</PubmedArticleSet>', medgen_uids, '<eSummaryResult><DocumentSummarySet status="OK">' +
+                    ''.join(summaries) + '</DocumentSummarySet></eSummaryResult>',
+                    pd.DataFrame(rows, columns=UNIPROT_LABELS), {'entities': entities, 'links': links})
+
+
+def record_fixtures(path: str, term: str, n_articles: int, email: str, nlp_model: str = 'en_ner_bc5cdr_md',
+                    n_entities: int = 200):
+    """
+    Method records real responses for `term` into a fixture directory. Requires network access and the scispacy model.
+    MedGen is requested for the UMLS concepts of the `n_entities` most frequent DISEASE entities, which covers the
+    concepts selected by the MedGenPipe for every subset of the recorded articles.
+
+    :param path: str - fixture directory
+    :param term: str - search term
+    :param n_articles: int - number of articles to record
+    :param email: str - contact email for the NCBI requests
+    :param nlp_model: str - scispacy model of the NERPipe
+    :param n_entities: int - number of DISEASE entities, whose concepts are recorded
+    """
+    from pymedgraph.input.fetch_ncbi import NCBIFetcher
+    from pymedgraph.dataextraction import StandardPubMedPipe, NERPipe
+
+    fetcher = NCBIFetcher(email=email, tool_name='pymedgraph-benchmark', max_articles=n_articles)
+    ids = [str(i) for i in fetcher.search_pubmed(term, n_articles)]
+    articles = list()
+    for i in range(0, len(ids), 500):
+        handle = Entrez.efetch(db='pubmed', id=ids[i:i + 500], retmode='xml')
+        articles += [ET.tostring(a, encoding='unicode') for a in ET.fromstring(handle.read()).findall('PubmedArticle')]
+        handle.close()
+    articles_xml = PUBMED_HEADER + '<PubmedArticleSet>' + ''.join(articles) + '</PubmedArticleSet>'
+
+    # NER output of the recorded articles
+    paper = Entrez.read(BytesIO(articles_xml.encode('utf-8')))['PubmedArticle']
+    df_paper = StandardPubMedPipe().run(paper=paper, search_term=term, node_label='Paper').get_table('pubmedPaper')
+    ner_output = NERPipe(nlp_model=nlp_model, entity_linker='umls').run(
+        abstracts=df_paper, id_col='pubmedID', abstract_col='abstract'
+    )
+    df_entities = ner_output.get_table('Entities')
+    df_links = ner_output.get_table('UmlsLinks')
+
+    # MedGen concepts of the most frequent entities
+    top = df_entities[df_entities['node_label'] == 'DISEASE']['text'].value_counts()[:n_entities].index
+    cuis = df_links[df_links['source'].isin(top) & (df_links['kb_score'] > 0.85)]['CUI'].unique().tolist()
+    medgen_uids = dict()
+    for cui in cuis:
+        uids = fetcher.get_medgen_uids([cui])
+        if uids:
+            medgen_uids[cui] = uids[0]
+    summaries = ET.fromstring(fetcher.get_medgen_summaries(list(medgen_uids.keys())))
+    genes = sorted(set(g.text for g in summaries.findall('DocumentSummarySet/DocumentSummary/ConceptMeta/'
+                                                         'AssociatedGenes/Gene')))
+    df_uniprot = uniprot.get_uniprot_results(genes) if genes else pd.DataFrame(columns=UNIPROT_LABELS)
+
+    _write_fixtures(
+        path, {term.lower(): ids, '*': ids}, articles_xml, medgen_uids, ET.tostring(summaries, encoding='unicode'),
+        df_uniprot, {
+            'entities': df_entities[['source', 'text', 'node_label']].values.tolist(),
+            'links': df_links[['source', 'CUI', 'kb_score', 'name', 'Definition']].values.tolist()
+        }
+    )
+
+
+def _write_fixtures(path: str, pubmed_ids: dict, articles_xml: str, medgen_uids: dict, summaries_xml: str,
+                    df_uniprot: pd.DataFrame, ner: dict):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'pubmed_ids.json'), 'w') as fh:
+        json.dump(pubmed_ids, fh)
+    with open(os.path.join(path, 'pubmed_articles.xml'), 'w') as fh:
+        fh.write(articles_xml)
+    with open(os.path.join(path, 'medgen_uids.json'), 'w') as fh:
+        json.dump(medgen_uids, fh)
+    with open(os.path.join(path, 'medgen_summaries.xml'), 'w') as fh:
+        fh.write(summaries_xml)
+    df_uniprot.to_csv(os.path.join(path, 'uniprot.tsv'), sep='\t', index=False)
+    with open(os.path.join(path, 'ner.json'), 'w') as fh:
+        json.dump(ner, fh)
@@ -1,11 +1,15 @@
+import sys
 import json
-from flask import Flask, request, abort
+from flask import Flask, request, abort, Response, stream_with_context
 from flask_cors import CORS, cross_origin
 from dotenv import load_dotenv
 import os
 
-from pymedgraph.manager import MedGraphManager
+from pymedgraph.manager import MedGraphManager, RequestParser
 from pymedgraph import Neo4jConnector
+from pymedgraph.graph.uploadworker import UploadWorker
+from pymedgraph.metrics import REGISTRY, start_trace
+from pymedgraph.jobs import JobQueue, QueueFullError, BuildExecutor, ResourcePool, request_key
 
 import logging
 from logging.handlers import TimedRotatingFileHandler
@@ -29,10 +33,53 @@ logger.setLevel(logging.INFO)
 
 # init api
 app = Flask(__name__)
-# init classes
-manager = MedGraphManager(config_path='localconfig.json', logger=logger)
-neo4j_cfg = manager.cfg.get('Neo4j')
-neo4j = Neo4jConnector(neo4j_cfg['url'], neo4j_cfg['user'], neo4j_cfg['pw'], logger=logger)
+# init classes, the requests are checked without the pipelines of a manager
+parser = RequestParser(config_path='localconfig.json', logger=logger)
+cfg = parser.cfg
+neo4j_cfg = cfg.get('Neo4j')
+neo4j = Neo4jConnector(
+    neo4j_cfg['url'], neo4j_cfg['user'], neo4j_cfg['pw'], logger=logger,
+    unique_constraints=neo4j_cfg.get('unique_constraints', False),
+    single_pass=neo4j_cfg.get('single_pass', False), writer=neo4j_cfg.get('writer'),
+    reachability=neo4j_cfg.get('reachability'), registry=neo4j_cfg.get('registry'),
+    manifest=neo4j_cfg.get('manifest')
+)
+
+
+def run_job(job, build_manager: MedGraphManager):
+    """ Runs a build, refresh or resume `pymedgraph.jobs.Job`, raises a RuntimeError if it failed
+
+    :param job:
+        Job with the request specs and kind 'build', 'refresh' or 'resume'.
+
+    :param build_manager:
+        Manager lent to the job by the `managers` pool.
+
+    :return result:
+        Message and build id of the job.
+    """
+    build_id = None
+    if job.kind == 'refresh':
+        msg = refresh_request(job.request, build_manager)
+    elif job.kind == 'resume':
+        msg = resume_request(job.request['build_id'], build_manager, upload_only=job.request.get('upload_only', False))
+    else:
+        # the job id is used as build id, so a failed job can be resumed with `/resumeBuild`
+        build_id = job.id if build_manager.checkpoints is not None else None
+        msg = send_request(job.request, build_manager, batch='diseases' in job.request, progress=job, build_id=build_id)
+    if msg != 'success':
+        raise RuntimeError(f'{job.kind.capitalize()} of graph failed, see logs.')
+    return {'msg': msg, 'buildId': build_id}
+
+
+# one manager per worker of the job queue, a manager is not safe to use from several threads at once. The managers
+# are created on first use and shared with the build workers of the async api, so the NER model is loaded once per
+# manager
+jobs_cfg = cfg.get('jobs', {})
+managers = ResourcePool(
+    lambda: MedGraphManager(config_path=cfg, logger=logger), size=jobs_cfg.get('max_workers', 1), logger=logger
+)
+job_queue = JobQueue(run_job, resources=managers, logger=logger, **jobs_cfg)
 
 
 def configure():
@@ -47,40 +94,142 @@ def configure():
 @cross_origin()
 def build_graph():
     """
-    Takes and checks an postrequest from the caller and passes it to the backend.
+    Takes and checks an postrequest from the caller and queues the build. Returns the id of the job right away, the
+    progress can be requested under `/jobs/<job_id>`. An identical request, which is still queued or running, is
+    merged into the existing job. With `"wait": true` the request waits for the build and returns its message.
     """
     logger.info('Got \'buildGraph\' request.')
     # check request
     req_json = _get_request_json(request, ['request_specs','token'])
+    return _queue_build(req_json)
+
+
+@app.route("/buildGraphBatch", methods=["POST"])
+@cross_origin()
+def build_graph_batch():
+    """
+    Takes a postrequest with a list of search terms under `request_specs['diseases']` and queues the build of the graph
+    for all of them in one batch, like `/buildGraph`.
+    """
+    logger.info('Got \'buildGraphBatch\' request.')
+    # check request
+    req_json = _get_request_json(request, ['request_specs','token'])
+    if not isinstance(req_json['request_specs'], dict) or 'diseases' not in req_json['request_specs']:
+        logger.error('400: Missing diseases in request_specs.')
+        abort(400, 'Missing diseases in request_specs.')
+    return _queue_build(req_json)
+
+
+def _queue_build(req_json: dict):
+    """ Queues the build of the request specs, returns the job id or the message of the build with `wait` """
     req_specs = req_json['request_specs']
-    # start backend processing
-    logger.info(f'*** STARTING to process request \'{req_specs}\'. ***')
-    # build tables for nodes and node relations
-    disease, outputs, delete_graph = manager.construct_med_graph(req_specs)
-    if outputs:
-        try:
-            # upload tables to neo4j database
-            neo4j.build_biomed_graph(disease, outputs, delete_graph)
-            logger.info(f'Successfully uploaded graph with search term \'{disease}\' to neo4j.')
-            msg = 'success'
-        except RuntimeError:
-            logger.error('RuntimeError, while upload of graph to neo4j.')
-            msg = 'fail'
-    else:
-        logger.error('Received empty list of outputs from pymedgraph.manager.construct_med_graph().')
-        msg = 'fail'
-    return msg
+    try:
+        key = request_key(*parser.parse_request(req_specs))
+    except RuntimeError as ex:
+        logger.error(f'400: Invalid request specs: {ex}')
+        abort(400, f'Invalid request specs: {ex}')
+    job, merged = _submit_job(req_specs, key, 'build')
+    if req_json.get('wait'):
+        return _job_message(job)
+    return Response(json.dumps({'jobId': job.id, 'status': job.status, 'merged': merged}), status=202,
+                    mimetype='application/json')
+
+
+def _submit_job(req_specs: dict, key: str, kind: str) -> tuple:
+    """ Submits job to the queue, aborts with 429 if the queue is full """
+    try:
+        return job_queue.submit(req_specs, key, kind=kind)
+    except QueueFullError as ex:
+        logger.error(f'429: {ex}')
+        abort(Response(json.dumps({'msg': str(ex)}), status=429, mimetype='application/json',
+                       headers={'Retry-After': '60'}))
+
+
+def _job_message(job) -> str:
+    """ Waits for the job and returns 'success' or 'fail' """
+    job.wait()
+    return 'success' if job.status == job.DONE else 'fail'
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+@cross_origin()
+def get_job(job_id):
+    """
+    API returns status, stage progress, timings and result of a job queued by `/buildGraph` or `/buildGraphBatch`
+    """
+    _check_get_args(request.args, ['token'])
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404, f'Unknown job \'{job_id}\'.')
+    return json.dumps(job.to_dict())
+
+
+@app.route("/refreshGraph", methods=["POST"])
+@cross_origin()
+def refresh_graph():
+    """
+    Takes a postrequest like `/buildGraph` and adds only the articles to the graph, which were published since the last
+    build of the search term (or within `request_specs['reldate']` days).
+    """
+    logger.info('Got \'refreshGraph\' request.')
+    # check request
+    req_json = _get_request_json(request, ['request_specs','token'])
+    req_specs = req_json['request_specs']
+    if not isinstance(req_specs, dict) or not req_specs.get('disease'):
+        logger.error('400: Missing disease in request_specs.')
+        abort(400, 'Missing disease in request_specs.')
+    # queued like builds, the refresh uses the manager of a worker of the job queue
+    job, _ = _submit_job(req_specs, f'refresh:{req_specs["disease"].lower()}', 'refresh')
+    return _job_message(job)
+
+
+@app.route("/resumeBuild", methods=["POST"])
+@cross_origin()
+def resume_build():
+    """
+    Takes a postrequest with `request_specs['build_id']` and resumes the failed build from its checkpoint. If
+    `request_specs['upload_only']` is set, only the upload is repeated.
+    """
+    logger.info('Got \'resumeBuild\' request.')
+    # check request
+    req_json = _get_request_json(request, ['request_specs','token'])
+    req_specs = req_json['request_specs']
+    if 'build_id' not in req_specs:
+        logger.error('400: Missing build_id in request_specs.')
+        abort(400, 'Missing build_id in request_specs.')
+    # queued like builds, the resume uses the manager of a worker of the job queue
+    job, _ = _submit_job(req_specs, f'resume:{req_specs["build_id"]}', 'resume')
+    return _job_message(job)
+
+
+@app.route("/deleteSearchTerm", methods=["POST"])
+@cross_origin()
+def delete_search_term():
+    """
+    Takes a postrequest with `searchTerm` and deletes the SearchTerm node with all nodes, which are only related to this
+    search term. Nodes shared with other search terms are kept.
+    """
+    logger.info('Got \'deleteSearchTerm\' request.')
+    req_json = _get_request_json(request, ['searchTerm', 'token'])
+    try:
+        result = neo4j.delete_search_term(req_json['searchTerm'].lower(), batch_size=req_json.get('batch_size', 10000))
+    except RuntimeError as ex:
+        return json.dumps({'status': 'fail', 'msg': str(ex)})
+    return json.dumps({'status': 'success', **result})
 
 
 @app.route("/searchTerms",  methods=["GET"])
 @cross_origin()
 def get_searchterms():
     """
-    Api returns list of SearchTerm Nodes in Graph
+    Api returns list of SearchTerm Nodes in Graph, with `details=true` also the number of directly related nodes and
+    the last build time of each search term
     """
     logger.info('Got \'searchTerms\' request.')
     # check if request is OK
     _check_get_args(request.args, ['token'])
+    if request.args.get('details', 'false').lower() == 'true':
+        return json.dumps({'searchTerms': neo4j.get_search_term_info()})
     search_terms = neo4j.get_search_terms()
     return json.dumps({'searchTerms': search_terms})
 
@@ -96,6 +245,69 @@ def get_intersections():
     result = neo4j.get_intersection(request.args.get('searchTerms'), request.args.get('level'))
     return json.dumps(result)
 
+
+@app.route("/intersectionMatrix", methods=["GET"])
+@cross_origin()
+def get_intersection_matrix():
+    """
+    API returns json with intersection, union and Jaccard matrices of the passed search terms for all KG levels, or only
+    for the comma separated `levels`. With `approximate=true` the matrices are estimated from MinHash signatures.
+    """
+    logger.info('Got \'intersectionMatrix\' request.')
+    _check_get_args(request.args, ['searchTerms', 'token'])
+    status, result = neo4j.get_intersection_matrix(
+        request.args.get('searchTerms'), request.args.get('levels'),
+        approximate=request.args.get('approximate', 'false').lower() == 'true'
+    )
+    if status != 'success':
+        return json.dumps([status, result])
+    return json.dumps(result)
+
+
+@app.route("/similarSearchTerms", methods=["GET"])
+@cross_origin()
+def get_similar_search_terms():
+    """
+    API returns the `k` search terms with the most similar nodes to the passed search term on the passed KG level
+    """
+    logger.info('Got \'similarSearchTerms\' request.')
+    _check_get_args(request.args, ['searchTerm', 'level', 'token'])
+    result = neo4j.get_similar_search_terms(
+        request.args.get('searchTerm'), request.args.get('level'), k=_get_positive_int_arg(request.args, 'k', 10)
+    )
+    return json.dumps(result)
+
+
+@app.route("/subgraph", methods=["GET"])
+@cross_origin()
+def get_subgraph():
+    """
+    API streams the nodes and edges of a search term up to the passed KG level as JSON lines, one page of `limit` nodes
+    per request. The last line contains the `cursor` of the next page.
+    """
+    logger.info('Got \'subgraph\' request.')
+    _check_get_args(request.args, ['searchTerm', 'token'])
+    status, result = neo4j.get_subgraph(
+        request.args.get('searchTerm'), request.args.get('level'), cursor=request.args.get('cursor'),
+        limit=_get_positive_int_arg(request.args, 'limit', 10000)
+    )
+    if status != 'success':
+        return json.dumps([status, result])
+    return Response(
+        stream_with_context(json.dumps(record) + '\n' for record in result), mimetype='application/x-ndjson'
+    )
+
+
+@app.route("/metrics", methods=["GET"])
+@cross_origin()
+def get_metrics():
+    """
+    API returns wall time, rows, bytes and memory of the instrumented steps in the Prometheus text format
+    """
+    _check_get_args(request.args, ['token'])
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
 def _check_get_args(request_args, required_args: list = None):
     """
     Method checks get request for parameters
@@ -116,6 +328,24 @@ def _check_get_args(request_args, required_args: list = None):
         abort(403, 'Token is invalid.')
 
 
+def _get_positive_int_arg(request_args, name: str, default: int) -> int:
+    """
+    Method returns the get request parameter `name` as positive int, aborts with 400 otherwise
+    :param request_args: werkzeug.datastructures.MultiDict
+    :param name: str - name of the parameter
+    :param default: int - value, if the parameter is not passed
+    """
+    value = request_args.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = 0
+    if value < 1:
+        logger.error(f'400: Parameter \'{name}\' must be a positive integer, got \'{request_args.get(name)}\'.')
+        abort(400, f'Parameter \'{name}\' must be a positive integer.')
+    return value
+
+
 def _get_request_json(sent_request: request, required_keys: list = None):
     # build list of required keys
     if required_keys is None:
@@ -142,33 +372,169 @@ def _get_request_json(sent_request: request, required_keys: list = None):
         abort(405)
 
 
-def send_request(req_specs):
+def send_request(req_specs, build_manager: MedGraphManager, batch: bool = False, progress=None, build_id: str = None):
     """ Creates a MedGraph based on the input of the user.
 
     :param req_specs:
         Userinput passed via Postrequest.
 
+    :param build_manager:
+        Manager of the build, lent by the `managers` pool.
+
+    :param batch:
+        Flag if request contains a list of search terms, see `MedGraphManager.construct_med_graph_batch()`.
+        Single requests with `chunk_size` are built in chunks, see `MedGraphManager.construct_med_graph_chunked()`.
+
+    :param progress:
+        Receives started and finished stages, see `pymedgraph.jobs.Job`.
+
+    :param build_id:
+        Id of the checkpoint, if checkpoints are configured, see `MedGraphManager.construct_med_graph()`.
+
     :return msg:
         A message about failure or success of the building MedGraph.
     """
     logger.info(f'*** STARTING to process request \'{req_specs}\'. ***')
-    # build tables for nodes and node relations
-    disease, outputs, delete_graph = manager.construct_med_graph(req_specs)
-    if outputs:
+    # build tables for nodes and node relations, each output is uploaded to neo4j as soon as its pipe is finished
+    chunked = not batch and isinstance(req_specs, dict) and bool(req_specs.get('chunk_size'))
+    # chunked builds wait for the upload of previous chunks, so at most two chunks are held in memory
+    uploader = UploadWorker(neo4j, logger=logger, max_pending=2 if chunked else 0)
+    # trace includes the uploads, which are still running after the manager returned
+    with start_trace('buildGraphBatch' if batch else 'buildGraph', logger):
         try:
-            # upload tables to neo4j database
-            neo4j.build_biomed_graph(disease, outputs, delete_graph)
-            logger.info(f'Successfully uploaded graph with search term \'{disease}\' to neo4j.')
-            msg =  'success'
-        except RuntimeError:
-            logger.error('RuntimeError, while upload of graph to neo4j.')
-            msg = 'fail'
-    else:
+            if chunked:
+                disease, outputs, delete_graph = build_manager.construct_med_graph_chunked(
+                    req_specs, uploader=uploader, progress=progress
+                )
+            elif batch:
+                disease, outputs, delete_graph = build_manager.construct_med_graph_batch(
+                    req_specs, uploader=uploader, progress=progress, build_id=build_id
+                )
+            else:
+                disease, outputs, delete_graph = build_manager.construct_med_graph(
+                    req_specs, uploader=uploader, progress=progress, build_id=build_id
+                )
+        finally:
+            try:
+                uploaded = uploader.finish()
+                upload_failed = False
+            except RuntimeError:
+                logger.error('RuntimeError, while upload of graph to neo4j.')
+                uploaded = list()
+                upload_failed = True
+    # chunks are only handed to the uploader, the outputs of chunked builds contain only MedGen and UniProt
+    if chunked and not uploaded and not upload_failed:
+        logger.error('No chunk was uploaded by manager.construct_med_graph_chunked().')
+        msg = 'fail'
+    elif not chunked and not outputs:
         logger.error('Received empty list of outputs from manager.construct_med_graph().')
         msg = 'fail'
+    elif upload_failed:
+        msg = 'fail'
+    else:
+        logger.info(f'Successfully uploaded graph with search term \'{disease}\' to neo4j.')
+        msg = 'success'
     return msg
 
 
-if __name__ == "__main__":
+def resume_request(build_id: str, build_manager: MedGraphManager, upload_only: bool = False):
+    """ Resumes a failed build from its checkpoint.
+
+    :param build_id:
+        Id of the build, see `MedGraphManager.resume_med_graph()`.
+
+    :param build_manager:
+        Manager of the resume, lent by the `managers` pool.
+
+    :param upload_only:
+        Flag to only repeat the upload of the checkpoint.
+
+    :return msg:
+        A message about failure or success of the resume.
+    """
+    logger.info(f'*** STARTING to resume build \'{build_id}\'. ***')
+    uploader = UploadWorker(neo4j, logger=logger)
+    with start_trace('resumeBuild', logger):
+        try:
+            disease, outputs, delete_graph = build_manager.resume_med_graph(
+                build_id, uploader=uploader, upload_only=upload_only
+            )
+        except RuntimeError as ex:
+            logger.error(f'Resume of build \'{build_id}\' failed with {ex}')
+            outputs = list()
+        finally:
+            try:
+                uploader.finish()
+                upload_failed = False
+            except RuntimeError:
+                logger.error('RuntimeError, while upload of graph to neo4j.')
+                upload_failed = True
+    if not outputs or upload_failed:
+        return 'fail'
+    logger.info(f'Successfully resumed build \'{build_id}\' with search term \'{disease}\'.')
+    return 'success'
+
+
+def refresh_request(req_specs, build_manager: MedGraphManager):
+    """ Refreshes the graph of an existing search term with newly published articles.
+
+    :param req_specs:
+        Userinput passed via Postrequest.
+
+    :param build_manager:
+        Manager of the refresh, lent by the `managers` pool.
+
+    :return msg:
+        A message about failure or success of the refresh.
+    """
+    logger.info(f'*** STARTING to process refresh request \'{req_specs}\'. ***')
+    search_term_state = neo4j.get_search_term_state(req_specs['disease'].lower())
+    uploader = UploadWorker(neo4j, logger=logger)
+    with start_trace('refreshGraph', logger):
+        try:
+            disease, outputs, new_ids = build_manager.refresh_med_graph(req_specs, search_term_state, uploader=uploader)
+        finally:
+            try:
+                uploader.finish()
+                upload_failed = False
+            except RuntimeError:
+                logger.error('RuntimeError, while upload of graph to neo4j.')
+                upload_failed = True
+    if upload_failed:
+        return 'fail'
+    logger.info(f'Successfully refreshed graph with search term \'{disease}\' with {len(new_ids)} new articles.')
+    return 'success'
+
+
+def create_asgi_app():
+    """ Returns the app of the async serving mode, see `pymedgraph.asgi`. Read requests use the async neo4j driver,
+    builds run on a bounded pool of workers with the `managers` of the job queue, all other routes are served by the
+    Flask app.
+    """
+    # imported here, the async neo4j driver needs neo4j>=5, while the Flask app runs with the pinned driver
+    from pymedgraph.graph.asyncreader import AsyncGraphReader
+    from pymedgraph.asgi import AsyncAPI, WSGIFallback
+
+    global tokens
     tokens = configure()
-    app.run(port=8050, debug=False)
+    asgi_cfg = dict(cfg.get('asgi', {}))
+    # a shorter switch interval of the GIL lets the event loop run more often, while builds run python code
+    switch_interval = asgi_cfg.pop('switch_interval', None)
+    if switch_interval:
+        sys.setswitchinterval(switch_interval)
+    fallback = WSGIFallback(app, max_workers=asgi_cfg.pop('fallback_workers', 8))
+    reader = AsyncGraphReader(neo4j, neo4j_cfg['url'], neo4j_cfg['user'], neo4j_cfg['pw'], logger=logger)
+    builds = BuildExecutor(managers, logger=logger, **asgi_cfg)
+    return AsyncAPI(
+        reader, builds, lambda build_manager, req_specs, batch: send_request(req_specs, build_manager, batch=batch),
+        tokens, fallback=fallback, logger=logger
+    )
+
+
+if __name__ == "__main__":
+    if '--asgi' in sys.argv:
+        import uvicorn
+        uvicorn.run(create_asgi_app(), port=8050)
+    else:
+        tokens = configure()
+        app.run(port=8050, debug=False)
@@ -0,0 +1,318 @@
+"""
+Async serving mode of the api. `AsyncAPI` is an ASGI app, which can be served by an ASGI server, e.g.
+
+    uvicorn --factory pymedgraph.app:create_asgi_app --port 8050
+
+- read requests `/searchTerms` and `/intersection` are answered on the event loop with the async neo4j driver, see
+`pymedgraph.graph.asyncreader.AsyncGraphReader`
+- builds `/buildGraph` and `/buildGraphBatch` with `"wait": true` run on a bounded pool of worker threads, see
+`pymedgraph.jobs.BuildExecutor`. A slow build does not block other requests, builds beyond the limit are rejected
+with 429. Builds without `wait` are queued as jobs by the Flask app, which returns the job id
+- all other routes are passed to the Flask app of `pymedgraph.app` on a bounded pool of worker threads, see
+`WSGIFallback`
+"""
+import io
+import sys
+import json
+import asyncio
+import threading
+from concurrent import futures
+from urllib.parse import parse_qs
+
+from pymedgraph.jobs import QueueFullError
+
+
+class AsyncAPI(object):
+    """
+    ASGI app with the async read and build routes of the api, requests to other routes are passed to `fallback`.
+
+    Usage:
+        api = AsyncAPI(reader, builds, lambda manager, specs, batch: send_request(specs, manager, batch=batch),
+                       tokens, fallback=WSGIFallback(app))
+    """
+
+    def __init__(self, reader, builds, build_func, tokens: list, fallback=None, logger=None):
+        """
+        :param reader: pymedgraph.graph.asyncreader.AsyncGraphReader
+        :param builds: pymedgraph.jobs.BuildExecutor
+        :param build_func: callable - called with the resource of the worker thread, the request specs and the batch
+        flag, returns the message of the build
+        :param tokens: list - valid api tokens
+        :param fallback: ASGI app for all other routes, answers 404 if None
+        :param logger: logging.logger
+        """
+        self.reader = reader
+        self.builds = builds
+        self.build_func = build_func
+        self.tokens = tokens
+        self.fallback = fallback
+        self.logger = logger
+        self.routes = {
+            '/searchTerms': ('GET', self.get_search_terms),
+            '/intersection': ('GET', self.get_intersection),
+            '/buildGraph': ('POST', self.build_graph),
+            '/buildGraphBatch': ('POST', self.build_graph_batch)
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        route = self.routes.get(scope.get('path'))
+        if route is None:
+            if self.fallback is not None:
+                return await self.fallback(scope, receive, send)
+            return await _respond(send, 404, 'Not found.', 'text/plain')
+        method, handler = route
+        if scope['method'] != method:
+            self._log_error(f'405: Not a {method} request.')
+            return await _respond(send, 405, f'Not a {method} request.', 'text/plain')
+        try:
+            response = await handler(scope, receive, send)
+        except Exception as ex:
+            self._log_error(f'500: Request to \'{scope["path"]}\' failed with {ex}')
+            response = 500, f'Internal server error: {ex}'
+        if response is None:
+            # request was answered by the fallback
+            return
+        status, body = response
+        if isinstance(body, tuple):
+            return await _respond(send, status, *body)
+        await _respond(send, status, body, 'application/json' if status < 400 else 'text/plain')
+
+    async def get_search_terms(self, scope, receive, send) -> tuple:
+        """ Same as `/searchTerms` of `pymedgraph.app` """
+        self._log_info('Got \'searchTerms\' request.')
+        args = _query_args(scope)
+        error = self._check_args(args, ['token'])
+        if error:
+            return error
+        if args.get('details', 'false').lower() == 'true':
+            return 200, json.dumps({'searchTerms': await self.reader.get_search_term_info()})
+        return 200, json.dumps({'searchTerms': await self.reader.get_search_terms()})
+
+    async def get_intersection(self, scope, receive, send) -> tuple:
+        """ Same as `/intersection` of `pymedgraph.app` """
+        self._log_info('Got \'intersection\' request.')
+        args = _query_args(scope)
+        error = self._check_args(args, ['searchTerms', 'level', 'token'])
+        if error:
+            return error
+        return 200, json.dumps(await self.reader.get_intersection(args['searchTerms'], args['level']))
+
+    async def build_graph(self, scope, receive, send) -> tuple or None:
+        self._log_info('Got \'buildGraph\' request.')
+        return await self._build(scope, receive, send, batch=False)
+
+    async def build_graph_batch(self, scope, receive, send) -> tuple or None:
+        self._log_info('Got \'buildGraphBatch\' request.')
+        return await self._build(scope, receive, send, batch=True)
+
+    async def _build(self, scope, receive, send, batch: bool) -> tuple or None:
+        body = await _read_body(receive)
+        try:
+            req_json = json.loads(body)
+        except ValueError:
+            req_json = None
+        if not isinstance(req_json, dict):
+            self._log_error('415: No json in request.')
+            return 415, 'No json in request.'
+        missing_keys = [k for k in ['request_specs', 'token'] if k not in req_json]
+        if missing_keys:
+            self._log_error(f'400: JSON data is missing: {missing_keys}')
+            return 400, f'JSON data is missing: {missing_keys}'
+        if req_json['token'] not in self.tokens:
+            self._log_error('403: Invalid token.')
+            return 403, 'Token is invalid.'
+        if not req_json.get('wait') and self.fallback is not None:
+            # the build is queued as job by the Flask app, which returns the job id right away
+            await self.fallback(scope, _replay(body), send)
+            return None
+        try:
+            msg = await self.builds.run(self.build_func, req_json['request_specs'], batch)
+        except QueueFullError as ex:
+            self._log_error(f'429: {ex}')
+            return 429, (json.dumps({'msg': str(ex)}), 'application/json', [(b'retry-after', b'60')])
+        return 200, (msg, 'text/html; charset=utf-8')
+
+    def _check_args(self, args: dict, required_args: list) -> tuple or None:
+        """ Same checks as `_check_get_args()` of `pymedgraph.app`, returns status and message if the check failed """
+        missing_args = [a for a in required_args if a not in args]
+        if missing_args:
+            self._log_error(f'400: Missing parameter: {missing_args}')
+            return 400, f'Missing parameter: {missing_args}'
+        if args['token'] not in self.tokens:
+            self._log_error('403: Invalid token.')
+            return 403, 'Token is invalid.'
+        return None
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.builds.shutdown(wait=False)
+                if isinstance(self.fallback, WSGIFallback):
+                    self.fallback.shutdown(wait=False)
+                await self.reader.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _log_info(self, msg: str):
+        if self.logger:
+            self.logger.info(msg)
+
+    def _log_error(self, msg: str):
+        if self.logger:
+            self.logger.error(msg)
+
+
+class WSGIFallback(object):
+    """
+    ASGI app, which runs a WSGI app (the Flask app of `pymedgraph.app`) on a bounded pool of worker threads, one
+    thread per request. Requests beyond `max_workers` wait for a free thread. The response is passed to the event loop
+    chunk by chunk, so streamed responses like `/subgraph` are not held in memory. If the client disconnects, the
+    worker thread stops iterating the response and closes it.
+    """
+
+    def __init__(self, wsgi_app, max_chunks: int = 16, max_workers: int = 8):
+        """
+        :param wsgi_app: WSGI callable
+        :param max_chunks: int - number of response chunks buffered before the worker thread waits for the client
+        :param max_workers: int - number of requests served by the WSGI app at the same time
+        """
+        self.wsgi_app = wsgi_app
+        self.max_chunks = max_chunks
+        self._pool = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pymedgraph-wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        environ = _environ(scope, await _read_body(receive))
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=self.max_chunks)
+        response = dict()
+        cancelled = threading.Event()
+
+        def put(item) -> bool:
+            """ Passes item to the event loop, returns False if the response is not sent anymore """
+            if cancelled.is_set():
+                return False
+            try:
+                asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+            except (RuntimeError, futures.CancelledError):
+                # event loop is closed
+                return False
+            return True
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        def run():
+            # the whole response is iterated on one thread, Flask keeps the request context in thread local state
+            try:
+                result = self.wsgi_app(environ, start_response)
+                try:
+                    for chunk in result:
+                        if chunk and not put(chunk):
+                            return
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+                put(None)
+            except Exception as ex:
+                put(ex)
+
+        # not awaited, the response is read from the queue while the worker thread iterates it
+        loop.run_in_executor(self._pool, run)
+        started = False
+        try:
+            while True:
+                item = await chunks.get()
+                if isinstance(item, Exception):
+                    if not started:
+                        await _respond(send, 500, f'Internal server error: {item}', 'text/plain')
+                    return
+                if not started:
+                    await send({'type': 'http.response.start', 'status': response['status'],
+                                'headers': response['headers']})
+                    started = True
+                if item is None:
+                    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                    return
+                await send({'type': 'http.response.body', 'body': item, 'more_body': True})
+        finally:
+            # e.g. `send` failed after a disconnect of the client: the worker thread stops at its next chunk and the
+            # queue is drained, so a thread waiting for space in the full queue is released
+            cancelled.set()
+            while not chunks.empty():
+                chunks.get_nowait()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+async def _respond(send, status: int, body: str or bytes, content_type: str, headers: list = None):
+    body = body.encode('utf-8') if isinstance(body, str) else body
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(b'content-type', content_type.encode('latin-1')),
+                    (b'content-length', str(len(body)).encode('latin-1'))] + (headers or list())
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _replay(body: bytes):
+    """ Returns an ASGI receive callable, which returns a body that was already read """
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    return receive
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            return body
+
+
+def _query_args(scope) -> dict:
+    """ Returns the first value of each query parameter """
+    return {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+
+
+def _environ(scope, body: bytes) -> dict:
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', list()):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            key = f'HTTP_{key}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import uuid
+
+import pandas as pd
+
+from pymedgraph.dataextraction.basepipe import NodeTable, PipeOutput
+
+try:
+    import pyarrow  # noqa: F401 - parquet engine of pandas
+except ImportError:
+    pyarrow = None
+
+
+MANIFEST = 'manifest.json'
+
+
+def write_pipe_outputs(outputs: list, path: str, info: dict = None):
+    """
+    Method writes `pymedgraph.dataextraction.basepipe.PipeOutput` objects to a directory. The data of each NodeTable is
+    stored as parquet file, the NodeTable meta data and the order of the outputs in a `manifest.json`.
+
+    :param outputs: list - PipeOutput objects
+    :param path: str - directory, is created if it does not exist
+    :param info: dict - additional info stored in the manifest
+    """
+    if pyarrow is None:
+        raise RuntimeError('Writing pipe outputs requires the package \'pyarrow\'.')
+    os.makedirs(path, exist_ok=True)
+    manifest = {'created': time.time(), 'info': info or dict(), 'outputs': list()}
+    for i, output in enumerate(outputs):
+        tables = list()
+        for j, node_table in enumerate(output.node_tables):
+            file_name = f'{i}_{j}_{node_table.name}.parquet'
+            node_table.data.to_parquet(os.path.join(path, file_name), index=False)
+            tables.append({'file': file_name, 'meta': node_table.meta})
+        manifest['outputs'].append({'pipe': output.pipe, 'tables': tables})
+    with open(os.path.join(path, MANIFEST), 'w') as fh:
+        json.dump(manifest, fh)
+
+
+def read_pipe_outputs(path: str) -> list:
+    """
+    Method reads the PipeOutput objects written by `write_pipe_outputs()`. The NodeTables were checked before they
+    were written, so they are not checked again. Categorical columns are restored from the parquet dictionary columns.
+
+    :param path: str - directory
+    :return: list - PipeOutput objects
+    """
+    if pyarrow is None:
+        raise RuntimeError('Reading pipe outputs requires the package \'pyarrow\'.')
+    with open(os.path.join(path, MANIFEST), 'r') as fh:
+        manifest = json.load(fh)
+    outputs = list()
+    for output_info in manifest['outputs']:
+        output = PipeOutput(output_info['pipe'])
+        for table_info in output_info['tables']:
+            meta = table_info['meta']
+            output.add(NodeTable(
+                name=meta['table_name'],
+                df=pd.read_parquet(os.path.join(path, table_info['file'])),
+                source_node=meta['source_node'],
+                source_node_attr=meta['source_node_attr'],
+                source_col=meta['source_column'],
+                node_label=meta['node_label'],
+                id_attribute=meta['id_attribute'],
+                attribute_cols=meta['attribute_cols'],
+                copy=False,
+                validate=False
+            ))
+        outputs.append(output)
+    return outputs
+
+
+class ResultCache(object):
+    """
+    Class caches the outputs of `pymedgraph.manager.MedGraphManager.construct_med_graph()` on local disk.
+
+    The cache key is build from the parsed request (search term, number of articles and pipe flags), so identical
+    requests skip fetching, NER and the enrichment pipes. Each entry is a directory written by `write_pipe_outputs()`.
+
+    Entries are removed if they are older than `ttl` seconds. If the cache grows beyond `max_bytes`, the least recently
+    used entries are removed.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_bytes: int = 10 * 1024 ** 3, logger=None):
+        """
+        :param path: str - cache directory
+        :param ttl: float - time to live of an entry in seconds
+        :param max_bytes: int - maximum size of the cache directory
+        :param logger: logging.logger
+        """
+        if pyarrow is None:
+            raise RuntimeError('ResultCache requires the package \'pyarrow\'.')
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.logger = logger
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(disease, pipe_cfg: dict) -> str:
+        """
+        Method builds the cache key from the parsed request. Flags, which do not change the outputs (e.g. deletion of
+        the existing graph), are ignored.
+
+        :param disease: str or list - search term(s)
+        :param pipe_cfg: dict - parsed request, see `RequestParser._parse_request()`
+        :return: str - sha256 hex digest
+        """
+        ignored = ['delete_existing_graph', 'use_cache']
+        request = {
+            'disease': disease,
+            'cfg': {k: v for k, v in pipe_cfg.items() if k not in ignored}
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> list or None:
+        """ Returns cached outputs for key or None """
+        entry = os.path.join(self.path, key)
+        if not os.path.isfile(os.path.join(entry, MANIFEST)):
+            return None
+        if time.time() - os.path.getmtime(os.path.join(entry, MANIFEST)) > self.ttl:
+            self._remove(entry)
+            return None
+        try:
+            outputs = read_pipe_outputs(entry)
+        except Exception as ex:
+            if self.logger:
+                self.logger.error(f'Removing unreadable cache entry \'{key}\': {ex}')
+            self._remove(entry)
+            return None
+        # mark entry as recently used
+        os.utime(entry)
+        if self.logger:
+            self.logger.info(f'Cache hit for key \'{key}\'.')
+        return outputs
+
+    def put(self, key: str, outputs: list, info: dict = None):
+        """ Stores outputs under key and evicts entries if necessary """
+        # write to temporary directory first, so readers never see incomplete entries
+        tmp_entry = os.path.join(self.path, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            write_pipe_outputs(outputs, tmp_entry, info)
+        except Exception:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            raise
+        entry = os.path.join(self.path, key)
+        self._remove(entry)
+        os.replace(tmp_entry, entry)
+        self.evict()
+
+    def evict(self):
+        """ Removes expired entries and least recently used entries until cache size is below `max_bytes` """
+        entries = list()
+        now = time.time()
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if name.startswith('.tmp-') or not os.path.isdir(entry):
+                continue
+            manifest = os.path.join(entry, MANIFEST)
+            if not os.path.isfile(manifest) or now - os.path.getmtime(manifest) > self.ttl:
+                self._remove(entry)
+                continue
+            entries.append((os.path.getmtime(entry), self._size(entry), entry))
+        total = sum(e[1] for e in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(entry)
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            self._remove(os.path.join(self.path, name))
+
+    @staticmethod
+    def _size(entry: str) -> int:
+        return sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+
+    def _remove(self, entry: str):
+        if os.path.isdir(entry):
+            shutil.rmtree(entry, ignore_errors=True)
+            if self.logger:
+                self.logger.info(f'Removed cache entry \'{os.path.basename(entry)}\'.')
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import pickle
+import shutil
+import uuid
+
+from pymedgraph.dataextraction.basepipe import PipeOutput
+from pymedgraph.cache import write_pipe_outputs, read_pipe_outputs
+
+
+BUILD_FILE = 'build.json'
+
+
+class CheckpointStore(object):
+    """
+    Class stores the result of every finished stage of a build on local disk, so a failed build can be resumed with
+    `pymedgraph.manager.MedGraphManager.resume_med_graph()` instead of starting over.
+
+    Each build has its own directory named by the build id:
+        build.json          request info (mode, search terms, pipe config), status and names of finished stages
+        <stage>/            PipeOutput of a stage, written by `pymedgraph.cache.write_pipe_outputs()`
+        <stage>.pkl         other stage results, e.g. the fetched articles or the parsed MedGen summaries
+    """
+
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, path: str, logger=None):
+        """
+        :param path: str - checkpoint directory
+        :param logger: logging.logger
+        """
+        self.path = path
+        self.logger = logger
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def new_build_id() -> str:
+        return uuid.uuid4().hex
+
+    def create(self, build_id: str, info: dict):
+        """
+        Method creates the checkpoint of a new build. Raises a RuntimeError if the build id already exists.
+
+        :param build_id: str
+        :param info: dict - json serialisable info to rebuild the stage graph, see `MedGraphManager._build_info()`
+        """
+        build_dir = self._build_dir(build_id)
+        if os.path.isdir(build_dir):
+            raise RuntimeError(f'Checkpoint of build \'{build_id}\' already exists.')
+        os.makedirs(build_dir)
+        self._write_build(build_id, {
+            'build_id': build_id, 'created': time.time(), 'status': self.RUNNING, 'stages': dict(), 'info': info
+        })
+
+    def save_stage(self, build_id: str, name: str, result):
+        """ Stores the result of a finished stage and adds the stage to the finished stages """
+        build_dir = self._build_dir(build_id)
+        if isinstance(result, PipeOutput):
+            tmp_dir = os.path.join(build_dir, f'.tmp-{name}')
+            write_pipe_outputs([result], tmp_dir)
+            target = os.path.join(build_dir, name)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(tmp_dir, target)
+            kind = 'output'
+        else:
+            tmp_file = os.path.join(build_dir, f'.tmp-{name}.pkl')
+            with open(tmp_file, 'wb') as fh:
+                pickle.dump(result, fh)
+            os.replace(tmp_file, os.path.join(build_dir, f'{name}.pkl'))
+            kind = 'pickle'
+        build = self.get(build_id)
+        build['stages'][name] = {'kind': kind, 'saved': time.time()}
+        self._write_build(build_id, build)
+        if self.logger:
+            self.logger.info(f'Saved checkpoint of stage \'{name}\' for build \'{build_id}\'.')
+
+    def set_status(self, build_id: str, status: str, error: str = None):
+        build = self.get(build_id)
+        build['status'] = status
+        build['error'] = error
+        self._write_build(build_id, build)
+
+    def get(self, build_id: str) -> dict:
+        """ Returns content of `build.json`, raises a RuntimeError if the build id is unknown """
+        build_file = os.path.join(self._build_dir(build_id), BUILD_FILE)
+        if not os.path.isfile(build_file):
+            raise RuntimeError(f'Found no checkpoint for build \'{build_id}\'.')
+        with open(build_file, 'r') as fh:
+            return json.load(fh)
+
+    def load(self, build_id: str) -> tuple:
+        """
+        Method loads the checkpoint of a build.
+
+        :param build_id: str
+        :return: tuple - (content of `build.json`, dict stage name -> result)
+        """
+        build = self.get(build_id)
+        build_dir = self._build_dir(build_id)
+        results = dict()
+        for name, stage in build['stages'].items():
+            if stage['kind'] == 'output':
+                results[name] = read_pipe_outputs(os.path.join(build_dir, name))[0]
+            else:
+                with open(os.path.join(build_dir, f'{name}.pkl'), 'rb') as fh:
+                    results[name] = pickle.load(fh)
+        return build, results
+
+    def list(self) -> list:
+        """ Returns `build.json` content of all builds, latest build first """
+        builds = list()
+        for build_id in os.listdir(self.path):
+            if os.path.isfile(os.path.join(self._build_dir(build_id), BUILD_FILE)):
+                builds.append(self.get(build_id))
+        return sorted(builds, key=lambda b: b['created'], reverse=True)
+
+    def remove(self, build_id: str):
+        shutil.rmtree(self._build_dir(build_id), ignore_errors=True)
+
+    def _build_dir(self, build_id: str) -> str:
+        if not build_id or os.sep in build_id or build_id.startswith('.'):
+            raise RuntimeError(f'Invalid build id \'{build_id}\'.')
+        return os.path.join(self.path, build_id)
+
+    def _write_build(self, build_id: str, build: dict):
+        tmp_file = os.path.join(self._build_dir(build_id), f'.tmp-{BUILD_FILE}')
+        with open(tmp_file, 'w') as fh:
+            json.dump(build, fh)
+        os.replace(tmp_file, os.path.join(self._build_dir(build_id), BUILD_FILE))
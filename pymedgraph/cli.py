@@ -0,0 +1,294 @@
+"""
+Command line interface of `pymedgraph` to run builds without the flask api.
+
+Usage:
+    python -m pymedgraph.cli build-batch --config localconfig.json --terms phenylketonuria epilepsy --n-articles 100
+    python -m pymedgraph.cli build-batch --config localconfig.json --terms-file terms.txt --bulk-export export
+    python -m pymedgraph.cli build-chunked --config localconfig.json --term epilepsy --n-articles 50000 --chunk-size 2000
+    python -m pymedgraph.cli refresh --config localconfig.json --terms phenylketonuria
+    python -m pymedgraph.cli resume --config localconfig.json --build-id 3f2b9c0e --upload-only
+    python -m pymedgraph.cli delete --config localconfig.json --terms epilepsy
+    python -m pymedgraph.cli snapshot-export --config localconfig.json --terms phenylketonuria --path snapshot
+    python -m pymedgraph.cli snapshot-import --config localconfig.json --path snapshot
+"""
+import sys
+import json
+import argparse
+import logging
+
+from pymedgraph.manager import MedGraphManager
+from pymedgraph.graph.neo4jconnector import Neo4jConnector
+from pymedgraph.graph.uploadworker import UploadWorker
+from pymedgraph.graph.bulkexport import export_bulk
+
+
+PIPELINES = ['pubmed', 'ner', 'medGen', 'uniProt']
+
+
+def build_request(args) -> dict:
+    """ Builds request specs of `MedGraphManager` from parsed command line arguments """
+    pipelines = args.pipelines.split(',')
+    unknown = [p for p in pipelines if p not in PIPELINES]
+    if unknown:
+        raise RuntimeError(f'Unknown pipelines {unknown}. Expects any of {PIPELINES}.')
+    return {
+        'n_articles': args.n_articles,
+        'delete_graph': args.delete_graph,
+        'pipelines': {
+            'pubmed': {'run': 'pubmed' in pipelines, 'meshTerms': args.mesh_terms},
+            'ner': {'run': 'ner' in pipelines, 'entityLinks': True},
+            'medGen': {'run': 'medGen' in pipelines, 'Snomed': args.snomed, 'clinicalFeatures': args.clinical_features},
+            'uniProt': {'run': 'uniProt' in pipelines}
+        }
+    }
+
+
+def read_terms(args) -> list:
+    """ Collects search terms of `--terms` and `--terms-file` (one term per line) """
+    terms = list(args.terms) if args.terms else list()
+    if args.terms_file:
+        with open(args.terms_file, 'r') as fh:
+            terms += [line.strip() for line in fh.readlines() if line.strip()]
+    if not terms:
+        raise RuntimeError('No search terms passed. Use --terms or --terms-file.')
+    return terms
+
+
+def init_neo4j(manager: MedGraphManager, logger=None) -> Neo4jConnector:
+    neo4j_cfg = manager.cfg.get('Neo4j')
+    return Neo4jConnector(
+        neo4j_cfg['url'], neo4j_cfg['user'], neo4j_cfg['pw'], logger=logger,
+        unique_constraints=neo4j_cfg.get('unique_constraints', False),
+        single_pass=neo4j_cfg.get('single_pass', False), writer=neo4j_cfg.get('writer'),
+        reachability=neo4j_cfg.get('reachability'), registry=neo4j_cfg.get('registry'),
+        manifest=neo4j_cfg.get('manifest')
+    )
+
+
+def build_batch(args, logger) -> int:
+    """ Runs `MedGraphManager.construct_med_graph_batch()` and uploads or exports the outputs """
+    manager = MedGraphManager(config_path=args.config, logger=logger)
+    req_specs = build_request(args)
+    req_specs['diseases'] = read_terms(args)
+
+    manifest = None
+    if args.no_upload or args.bulk_export:
+        search_terms, outputs, _ = manager.construct_med_graph_batch(req_specs, build_id=args.build_id)
+        if args.bulk_export:
+            manifest = export_bulk(args.bulk_export, search_terms, outputs, logger=logger)
+    else:
+        neo4j = init_neo4j(manager, logger)
+        uploader = UploadWorker(neo4j, logger=logger)
+        try:
+            search_terms, outputs, _ = manager.construct_med_graph_batch(
+                req_specs, uploader=uploader, build_id=args.build_id
+            )
+        finally:
+            uploader.finish()
+            neo4j.close()
+    print(json.dumps({
+        'searchTerms': search_terms,
+        'buildId': manager.stage_report.get('build_id'),
+        'bulkExport': manifest,
+        'tables': {t.name: len(t.data) for o in outputs for t in o.node_tables},
+        'stages': {k: round(v['duration'], 3) for k, v in manager.stage_report['stages'].items()}
+    }, indent=2))
+    return 0
+
+
+def build_chunked(args, logger) -> int:
+    """ Runs `MedGraphManager.construct_med_graph_chunked()` and uploads each chunk """
+    manager = MedGraphManager(config_path=args.config, logger=logger)
+    req_specs = build_request(args)
+    req_specs['disease'] = args.term
+    req_specs['chunk_size'] = args.chunk_size
+
+    if args.no_upload:
+        disease, outputs, _ = manager.construct_med_graph_chunked(req_specs)
+    else:
+        neo4j = init_neo4j(manager, logger)
+        uploader = UploadWorker(neo4j, logger=logger, max_pending=2)
+        try:
+            disease, outputs, _ = manager.construct_med_graph_chunked(req_specs, uploader=uploader)
+        finally:
+            uploader.finish()
+            neo4j.close()
+    print(json.dumps({
+        'searchTerm': disease,
+        'chunks': manager.stage_report['chunks'],
+        'peakRss': manager.stage_report['peak_rss'],
+        'stages': {k: round(v['duration'], 3) for k, v in manager.stage_report['stages'].items()}
+    }, indent=2))
+    return 0
+
+
+def refresh(args, logger) -> int:
+    """ Runs `MedGraphManager.refresh_med_graph()` for each search term and uploads the new nodes """
+    manager = MedGraphManager(config_path=args.config, logger=logger)
+    neo4j = init_neo4j(manager, logger)
+    new_articles = dict()
+    try:
+        for term in read_terms(args):
+            req_specs = build_request(args)
+            req_specs['disease'] = term
+            if args.reldate:
+                req_specs['reldate'] = args.reldate
+            uploader = None if args.no_upload else UploadWorker(neo4j, logger=logger)
+            try:
+                disease, _, new_ids = manager.refresh_med_graph(
+                    req_specs, neo4j.get_search_term_state(term.lower()), uploader=uploader
+                )
+            finally:
+                if uploader:
+                    uploader.finish()
+            new_articles[disease] = len(new_ids)
+    finally:
+        neo4j.close()
+    print(json.dumps({'newArticles': new_articles}, indent=2))
+    return 0
+
+
+def resume(args, logger) -> int:
+    """ Runs `MedGraphManager.resume_med_graph()` and uploads the outputs """
+    manager = MedGraphManager(config_path=args.config, logger=logger)
+    if args.no_upload:
+        disease, outputs, _ = manager.resume_med_graph(args.build_id, upload_only=args.upload_only)
+    else:
+        neo4j = init_neo4j(manager, logger)
+        uploader = UploadWorker(neo4j, logger=logger)
+        try:
+            disease, outputs, _ = manager.resume_med_graph(
+                args.build_id, uploader=uploader, upload_only=args.upload_only
+            )
+        finally:
+            uploader.finish()
+            neo4j.close()
+    print(json.dumps({
+        'buildId': args.build_id,
+        'searchTerms': disease,
+        'tables': {t.name: len(t.data) for o in outputs for t in o.node_tables},
+        'stages': {k: round(v['duration'], 3) for k, v in manager.stage_report['stages'].items()}
+    }, indent=2))
+    return 0
+
+
+def delete(args, logger) -> int:
+    """ Deletes the subgraphs of search terms or the whole graph in batches """
+    manager = MedGraphManager(config_path=args.config, logger=logger)
+    neo4j = init_neo4j(manager, logger)
+    try:
+        if args.all:
+            result = {'graph': neo4j.delete_graph(batch_size=args.batch_size)}
+        else:
+            result = {term: neo4j.delete_search_term(term, batch_size=args.batch_size) for term in read_terms(args)}
+    finally:
+        neo4j.close()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def snapshot_export(args, logger) -> int:
+    """ Exports the subgraphs of search terms, or of all search terms, to a snapshot directory """
+    manager = MedGraphManager(config_path=args.config, logger=logger)
+    neo4j = init_neo4j(manager, logger)
+    try:
+        terms = read_terms(args) if args.terms or args.terms_file else None
+        manifest = neo4j.export_snapshot(args.path, terms, batch_size=args.batch_size)
+    finally:
+        neo4j.close()
+    summary = {k: manifest[k] for k in ['search_terms', 'counts', 'bytes', 'time', 'nodes_per_second']}
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+def snapshot_import(args, logger) -> int:
+    """ Imports a snapshot directory into the graph """
+    manager = MedGraphManager(config_path=args.config, logger=logger)
+    neo4j = init_neo4j(manager, logger)
+    try:
+        result = neo4j.import_snapshot(args.path, batch_size=args.batch_size)
+    finally:
+        neo4j.close()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def add_build_args(parser: argparse.ArgumentParser):
+    """ Adds arguments shared by the build commands """
+    parser.add_argument('--config', default='localconfig.json', help='path to config json')
+    parser.add_argument('--n-articles', type=int, default=None, help='number of articles per search term')
+    parser.add_argument('--pipelines', default=','.join(PIPELINES), help='comma separated list of pipelines to run')
+    parser.add_argument('--mesh-terms', action='store_true', help='extract MeSH terms of articles')
+    parser.add_argument('--snomed', action='store_true', help='extract SnomedConcepts from MedGen')
+    parser.add_argument('--clinical-features', action='store_true', help='extract ClinicalFeatures from MedGen')
+    parser.add_argument('--delete-graph', action='store_true', help='delete existing graph before upload')
+    parser.add_argument('--no-upload', action='store_true', help='only build tables, skip neo4j upload')
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pymedgraph', description='Build biomedical knowledge graphs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = subparsers.add_parser('build-batch', help='build graph for a list of search terms')
+    add_build_args(batch_parser)
+    batch_parser.add_argument('--terms', nargs='+', help='search terms')
+    batch_parser.add_argument('--terms-file', help='file with one search term per line')
+    batch_parser.add_argument('--build-id', default=None, help='id of checkpoint, if checkpoints are configured')
+    batch_parser.add_argument('--bulk-export', default=None,
+                              help='directory to export CSV files for neo4j-admin import instead of uploading')
+    batch_parser.set_defaults(func=build_batch)
+
+    chunked_parser = subparsers.add_parser('build-chunked', help='build graph of one search term in article chunks')
+    add_build_args(chunked_parser)
+    chunked_parser.add_argument('--term', required=True, help='search term')
+    chunked_parser.add_argument('--chunk-size', type=int, default=None,
+                                help='articles per chunk, default is taken from config')
+    chunked_parser.set_defaults(func=build_chunked)
+
+    refresh_parser = subparsers.add_parser('refresh', help='add newly published articles to existing search terms')
+    add_build_args(refresh_parser)
+    refresh_parser.add_argument('--terms', nargs='+', help='search terms')
+    refresh_parser.add_argument('--terms-file', help='file with one search term per line')
+    refresh_parser.add_argument('--reldate', type=int, default=None,
+                                help='fetch articles of the last n days instead of since the last build')
+    refresh_parser.set_defaults(func=refresh)
+
+    resume_parser = subparsers.add_parser('resume', help='resume a failed build from its checkpoint')
+    resume_parser.add_argument('--config', default='localconfig.json', help='path to config json')
+    resume_parser.add_argument('--build-id', required=True, help='id of checkpoint')
+    resume_parser.add_argument('--upload-only', action='store_true', help='only repeat the upload of the checkpoint')
+    resume_parser.add_argument('--no-upload', action='store_true', help='only build tables, skip neo4j upload')
+    resume_parser.set_defaults(func=resume)
+
+    delete_parser = subparsers.add_parser('delete', help='delete subgraphs of search terms, shared nodes are kept')
+    delete_parser.add_argument('--config', default='localconfig.json', help='path to config json')
+    delete_parser.add_argument('--terms', nargs='+', help='search terms')
+    delete_parser.add_argument('--terms-file', help='file with one search term per line')
+    delete_parser.add_argument('--all', action='store_true', help='delete the whole graph')
+    delete_parser.add_argument('--batch-size', type=int, default=10000, help='nodes deleted per transaction')
+    delete_parser.set_defaults(func=delete)
+
+    export_parser = subparsers.add_parser('snapshot-export', help='export subgraphs of search terms to parquet files')
+    export_parser.add_argument('--config', default='localconfig.json', help='path to config json')
+    export_parser.add_argument('--path', required=True, help='snapshot directory')
+    export_parser.add_argument('--terms', nargs='+', help='search terms, default are all search terms')
+    export_parser.add_argument('--terms-file', help='file with one search term per line')
+    export_parser.add_argument('--batch-size', type=int, default=10000, help='nodes per query')
+    export_parser.set_defaults(func=snapshot_export)
+
+    import_parser = subparsers.add_parser('snapshot-import', help='import snapshot of snapshot-export')
+    import_parser.add_argument('--config', default='localconfig.json', help='path to config json')
+    import_parser.add_argument('--path', required=True, help='snapshot directory')
+    import_parser.add_argument('--batch-size', type=int, default=10000, help='rows per query')
+    import_parser.set_defaults(func=snapshot_import)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = get_parser().parse_args(argv)
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s %(funcName)s -- %(message)s', level=logging.INFO)
+    return args.func(args, logging.getLogger('pymedgraph'))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import pandas as pd
+from pymedgraph.metrics import measure
 from pymedgraph.dataextraction.parser import get_pubmed_id, get_pubmed_title, get_mash_terms, parse_pubmed_article
 
 
@@ -17,7 +18,8 @@ class NodeTable(object):
     To ensure there are no syntax or logic errors between the dataframe and the metadata, which could break the upload
     to the neo4j instance, the dataframe is checked during the object initiation.
     """
-    def __init__(self, name, df, source_node, source_node_attr, source_col, node_label, id_attribute, attribute_cols):
+    def __init__(self, name, df, source_node, source_node_attr, source_col, node_label, id_attribute, attribute_cols,
+                 copy: bool = True, compact: bool = False, validate: bool = True):
         """
         This init requires a ton of parameters to build a useful meta data dictionary, used to upload the table into
         neo4j.
@@ -32,6 +34,11 @@ class NodeTable(object):
         :param node_label: str or list - labels fo node e.g. 'Gene'
         :param id_attribute: str - the node can be identified by this attribute
         :param attribute_cols: list - contains all node attribute columns of df
+        :param copy: bool - if False, missing values are filled in `df` itself instead of a copy. Used by pipes for
+        their own DataFrames to avoid holding large tables twice in memory.
+        :param compact: bool - flag to store repeated values as categorical columns, see `NodeTable.compact()`
+        :param validate: bool - if False, `df` is not checked again. Only for tables, which were checked before they
+        were stored, e.g. read from the result cache.
         """
         self.name = name
         self.meta = {
@@ -43,8 +50,35 @@ class NodeTable(object):
             'id_attribute': id_attribute,
             'attribute_cols': attribute_cols
         }
-        self._check_df(df)
-        self.data = df.fillna('')
+        with measure(name, kind='table', rows_in=len(df) if isinstance(df, pd.DataFrame) else 0) as m:
+            if validate:
+                self._check_df(df)
+            if copy:
+                self.data = df.fillna('')
+            else:
+                df.fillna('', inplace=True)
+                self.data = df
+            if compact:
+                self.compact()
+            m.rows_out = len(self.data)
+
+    def compact(self):
+        """
+        Method stores the `node_label` column and, if its values repeat, the source column as categorical columns.
+        Each distinct value is stored once and the rows only hold integer codes, which reduces the memory of large
+        tables and speeds up the filters of the upload. Categorical columns are kept as dictionary columns in parquet.
+
+        :return: NodeTable - self
+        """
+        cols = ['node_label']
+        source_col = self.meta['source_column']
+        if source_col and source_col in self.data.columns and source_col != self.meta['id_attribute'] and \
+                self.data[source_col].nunique() * 2 <= len(self.data):
+            cols.append(source_col)
+        for col in cols:
+            if not isinstance(self.data[col].dtype, pd.CategoricalDtype):
+                self.data[col] = self.data[col].astype('category')
+        return self
 
     @property
     def meta(self):
@@ -99,21 +133,23 @@ class NodeTable(object):
                     f'Column name \'{col}\' in table  \'{self.name}\' contains a \'-\', which is not allowed.'
                 )
         if len(df) > 0:
+            # unique labels are computed once, the column is scanned only one time
+            labels = list(df['node_label'].unique())
             if isinstance(self.meta['node_label'], list):
-                if list(df['node_label'].unique()) != self.meta['node_label']:
+                if labels != self.meta['node_label']:
                     raise RuntimeError(
                         'Found unexpected values in df["node_label"] {unq_vals}. Expected is \'{nl}\''.format(
-                            unq_vals=df['node_label'].unique(), nl=self.meta["node_label"]
+                            unq_vals=labels, nl=self.meta["node_label"]
                         )
                     )
             else:
-                if df['node_label'].nunique() > 1:
+                if len(labels) > 1:
                     raise RuntimeError('Found unexpected node labels {unq_vals}. Expects: {nl}'.format(
-                        unq_vals=df['node_label'].unique(), nl=self.meta["node_label"]
+                        unq_vals=labels, nl=self.meta["node_label"]
                     ))
-                if df['node_label'].unique()[0] != self.meta['node_label']:
+                if labels[0] != self.meta['node_label']:
                     raise RuntimeError('Found NodeLabel \'{fnl}\' is not expected node label: \'{nl}\''.format(
-                        fnl=df['node_label'].unique()[0], nl=self.meta['node_label']
+                        fnl=labels[0], nl=self.meta['node_label']
                     ))
 
 class PipeOutput(object):
@@ -161,10 +197,19 @@ class BasePipe(object):
         self.depends_on = depends_on
 
     def run(self, **kwargs) -> PipeOutput:
-        output = self._run_pipe(**kwargs)
-        self._check_output(output)
+        with measure(self.name, kind='pipe', rows_in=self._count_rows(kwargs)) as m:
+            output = self._run_pipe(**kwargs)
+            self._check_output(output)
+            m.rows_out = sum(len(t.data) for t in output.node_tables)
         return output
 
+    @staticmethod
+    def _count_rows(kwargs: dict) -> int:
+        """ Returns number of rows of all DataFrame and list arguments, which are not options like `tables` """
+        return sum(
+            len(v) for k, v in kwargs.items() if isinstance(v, (pd.DataFrame, list)) and k not in ['tables']
+        )
+
     def _run_pipe(self, **kwargs) -> PipeOutput:
         pass
 
@@ -213,9 +258,13 @@ class StandardPubMedPipe(BasePipe):
         super().__init__(pipe_name='StandardPubMedPipe')
         self._attribute_columns = ['pubmedID', 'title', 'abstract']
 
-    def _run_pipe(self, search_term: str, node_label: str, paper: list, mesh_terms=False) -> PipeOutput:
+    def _run_pipe(self, search_term: str, node_label: str, paper: list, mesh_terms=False,
+                  paper_terms: dict = None) -> PipeOutput:
         """
         Extract info from PubMed Api Response of found and fetched articles.
+
+        If the articles were fetched for multiple search terms, `paper_terms` maps the PubMed UID of each article to
+        the list of search terms it was found for. The table then contains one row per article and search term.
         """
         output = PipeOutput(self.name)
         paper_entries = list()
@@ -234,7 +283,11 @@ class StandardPubMedPipe(BasePipe):
             df = pd.DataFrame(paper_entries, columns=self._attribute_columns)
 
         # add required data information
-        df[self.SOURCE_COL] = search_term
+        if paper_terms:
+            df[self.SOURCE_COL] = df['pubmedID'].apply(lambda x: paper_terms[x.split('~')[-1]])
+            df = df.explode(self.SOURCE_COL, ignore_index=True)
+        else:
+            df[self.SOURCE_COL] = search_term
         df[self.NODEL_LABEL_COL] = node_label
 
         # init NodeTable object and add to Output object
@@ -246,6 +299,47 @@ class StandardPubMedPipe(BasePipe):
             source_col=self.SOURCE_COL,
             node_label=node_label,
             id_attribute='pubmedID',
-            attribute_cols=self._attribute_columns
+            attribute_cols=self._attribute_columns,
+            copy=False
         ))
         return output
+
+    def extract_mesh_terms(self, paper: list) -> dict:
+        """
+        Method extracts the MeSH terms of the articles independent of `StandardPubMedPipe.run()`, so the extraction can
+        run while the paper table is already processed by the following pipes.
+
+        :param paper: list - fetched PubMed articles
+        :return: dict - PubMed id -> list of MeSH terms
+        """
+        with measure('MeSH', kind='pipe', rows_in=len(paper)) as m:
+            mesh_terms = {get_pubmed_id(pap): get_mash_terms(pap) for pap in paper}
+            m.rows_out = len(mesh_terms)
+        return mesh_terms
+
+    def add_mesh_terms(self, output: PipeOutput, mesh_terms: dict) -> PipeOutput:
+        """
+        Method returns a new output with the MeSH column, as returned by `StandardPubMedPipe.run(mesh_terms=True)`.
+
+        :param output: PipeOutput - output of `StandardPubMedPipe.run()` without MeSH terms
+        :param mesh_terms: dict - returned by `StandardPubMedPipe.extract_mesh_terms()`
+        :return: PipeOutput
+        """
+        node_table = output.node_tables[0]
+        df = node_table.data
+        meta = node_table.meta
+        mesh_output = PipeOutput(self.name)
+        mesh_output.add(NodeTable(
+            name=meta['table_name'],
+            # only the column of object pointers is copied, not the abstracts
+            df=df.assign(MeSH=df['pubmedID'].map(lambda x: mesh_terms.get(x, list()))),
+            source_node=meta['source_node'],
+            source_node_attr=meta['source_node_attr'],
+            source_col=meta['source_column'],
+            node_label=meta['node_label'],
+            id_attribute=meta['id_attribute'],
+            attribute_cols=meta['attribute_cols'],
+            copy=False,
+            validate=False
+        ))
+        return mesh_output
@@ -81,7 +81,8 @@ class NERPipe(BasePipe):
             source_col=self.SOURCE_COL,
             node_label=list(df_entities[self.NODEL_LABEL_COL].unique()),
             id_attribute='text',
-            attribute_cols=''
+            attribute_cols='',
+            copy=False
         ))
 
         if entity_links:
@@ -94,7 +95,8 @@ class NERPipe(BasePipe):
                 source_col=self.SOURCE_COL,
                 node_label='UMLS',
                 id_attribute='CUI',
-                attribute_cols=['name', 'Definition']
+                attribute_cols=['name', 'Definition'],
+                copy=False
             ))
 
         return output
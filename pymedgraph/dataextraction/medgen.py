@@ -67,8 +67,9 @@ class MedGenPipe(BasePipe):
             AttributeError('MedGenPipe.fetcher must be an pymedgraph.input.fetch_ncbi.NCBIFetcher instance.')
         self._fetcher = f
 
-    def _run_pipe(self, df_entities: pd.DataFrame, df_links: pd.DataFrame,
-                  snomed: bool = False, clinical_features:bool = False) -> PipeOutput:
+    def _run_pipe(self, df_entities: pd.DataFrame = None, df_links: pd.DataFrame = None,
+                  snomed: bool = False, clinical_features:bool = False, summaries: dict = None,
+                  tables: list = None) -> PipeOutput:
         """
         This method is the main class method and proceeds in the following steps:
         1. collects most frequent UMLS concept IDS (-> CUI`s) from `df_entities` and `df_links`
@@ -83,30 +84,34 @@ class MedGenPipe(BasePipe):
         :param df_links: pd.DataFrame - umls concepts, used to select concepts CUI for MedGen fetch
         :param snomed: bool - flag, if SnomedConcepts shall be extracted from MedGen response
         :param clinical_features: bool - flag, if ClinicalFeatures shall be extracted from MedGen response
+        :param summaries: dict - already parsed MedGen summaries (see `MedGenPipe.fetch_summaries()`), if set steps
+        1. to 3. are skipped
+        :param tables: list - names of NodeTables to build, default is all tables set by the flags
         :return: `pymedgraph.dataextraction.basepipe.PipeOutput` object
         """
         output = PipeOutput(self.name)
 
-        # select IDs
-        cuis = self._select_cui(df_entities, df_links)
-        # get data
-        medgenrecords = self.fetcher.get_medgen_summaries(cuis)
-        # parse xml records
-        medgen_summaries = parse_medgen(medgenrecords, snomed=snomed, clinical_features=clinical_features)
+        if summaries is None:
+            medgen_summaries = self.fetch_summaries(df_entities, df_links, snomed, clinical_features)
+        else:
+            medgen_summaries = summaries
+        if tables is None:
+            tables = ['Genes', 'Snomed', 'ClinicalFeats']
 
         # build DataFrames
-        df_gene = self._build_gene_df(medgen_summaries)
-        output.add(NodeTable(
-            name='Genes',
-            df=df_gene,
-            source_node='UMLS',
-            source_node_attr='CUI',
-            source_col=self.SOURCE_COL,
-            node_label='Gene',
-            id_attribute='gene',
-            attribute_cols=''
-        ))
-        if snomed:
+        if 'Genes' in tables:
+            df_gene = self._build_gene_df(medgen_summaries)
+            output.add(NodeTable(
+                name='Genes',
+                df=df_gene,
+                source_node='UMLS',
+                source_node_attr='CUI',
+                source_col=self.SOURCE_COL,
+                node_label='Gene',
+                id_attribute='gene',
+                attribute_cols=''
+            ))
+        if snomed and 'Snomed' in tables:
             df_snomed = self._build_snomed_df(medgen_summaries)
             output.add(NodeTable(
                 name='Snomed',
@@ -118,7 +123,7 @@ class MedGenPipe(BasePipe):
                 id_attribute='SAUI',
                 attribute_cols=['snomed_text', 'SCUI', 'SAB']
             ))
-        if clinical_features:
+        if clinical_features and 'ClinicalFeats' in tables:
             df_cf = self._build_clinical_features_df(medgen_summaries)
             output.add(NodeTable(
                 name='ClinicalFeats',
@@ -133,7 +138,44 @@ class MedGenPipe(BasePipe):
 
         return output
 
-    def _select_cui(self, df_entity: pd.DataFrame, df_links: pd.DataFrame, n_=15, cui_n=4) -> list:
+    def fetch_summaries(self, df_entities: pd.DataFrame, df_links: pd.DataFrame,
+                        snomed: bool = False, clinical_features: bool = False, entity_groups: list = None,
+                        entity_counts: pd.Series = None) -> dict:
+        """
+        Method selects CUI`s, makes the MedGen request and parses the XML response. The returned summaries can be
+        passed to `MedGenPipe.run()`, which allows to build the NodeTables of one response in separate steps.
+
+        If the entities of multiple search terms are passed, `entity_groups` contains for each search term the list of
+        its paper ids. The CUI`s are then selected for each search term separately and one request is made for the
+        union of all selected CUI`s.
+
+        :param df_entities: pd.DataFrame - contains entities, used to select n most mentioned entities
+        :param df_links: pd.DataFrame - umls concepts, used to select concepts CUI for MedGen fetch
+        :param snomed: bool - flag, if SnomedConcepts shall be extracted from MedGen response
+        :param clinical_features: bool - flag, if ClinicalFeatures shall be extracted from MedGen response
+        :param entity_groups: list - lists of paper ids (source of `df_entities`), one list per search term
+        :param entity_counts: pd.Series - number of mentions per DISEASE entity text, used instead of `df_entities`
+        (which can be None then) by chunked builds, which do not keep the entities of all articles
+        :return: dict - parsed summaries, see `pymedgraph.dataextraction.parser.parse_medgen()`
+        """
+        # select IDs
+        if entity_groups is None:
+            cuis = self._select_cui(df_entities, df_links, entity_counts=entity_counts)
+        else:
+            cuis = set()
+            for paper_ids in entity_groups:
+                df_group = df_entities[df_entities[self.SOURCE_COL].isin(paper_ids)]
+                cuis.update(self._select_cui(
+                    df_group, df_links[df_links[self.SOURCE_COL].isin(df_group['text'])]
+                ))
+            cuis = list(cuis)
+        # get data
+        medgenrecords = self.fetcher.get_medgen_summaries(cuis)
+        # parse xml records
+        return parse_medgen(medgenrecords, snomed=snomed, clinical_features=clinical_features)
+
+    def _select_cui(self, df_entity: pd.DataFrame, df_links: pd.DataFrame, n_=15, cui_n=4,
+                    entity_counts: pd.Series = None) -> list:
         """
         Filter for n CUI ids. Filtering is done by selecting most popular entities found in paper and then selecting
         `cui_n` UMLS concepts to request MedGen.
@@ -142,6 +184,7 @@ class MedGenPipe(BasePipe):
         :param df_links: pd.DataFrame - umls concepts, used to select concepts CUI for MedGen fetch
         :param n_: int - number of top n most entities, which will be selected for CUI selection
         :param cui_n: int - of `n_` entities cui_n are selected for actual MedGen request
+        :param entity_counts: pd.Series - mentions per DISEASE entity text, replaces the counts of `df_entity`
         :returns: list - containing CUI´s to make MedGen request
         """
 
@@ -151,7 +194,11 @@ class MedGenPipe(BasePipe):
         else:
             cuis = list()
             # select n most found entities
-            entities = df_entity[df_entity[self.NODEL_LABEL_COL] == 'DISEASE']['text'].value_counts()[:n_].index.tolist()
+            if entity_counts is None:
+                entity_counts = df_entity[df_entity[self.NODEL_LABEL_COL] == 'DISEASE']['text'].value_counts()
+            else:
+                entity_counts = entity_counts.sort_values(ascending=False, kind='stable')
+            entities = entity_counts[:n_].index.tolist()
             # get n cui ids for each entity
             for ent in entities:
                 links = df_links[
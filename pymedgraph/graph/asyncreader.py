@@ -0,0 +1,91 @@
+import asyncio
+from functools import partial
+
+from neo4j import AsyncGraphDatabase
+
+from pymedgraph.graph.registry import SearchTermRegistry
+
+
+class AsyncGraphReader(object):
+    """
+    Class answers the read requests `/searchTerms` and `/intersection` of the async api (see `pymedgraph.asgi`) with
+    the async neo4j driver, so the event loop is not blocked while neo4j answers.
+
+    The reader shares the caches of a `Neo4jConnector`: search terms are taken from its `SearchTermRegistry`, only the
+    version counter and, if it changed, the search terms are queried. Intersections are counted on its
+    `ReachabilityIndex`. Search terms missing in the index or stale are rare (e.g. built by another process), they are
+    collected with the blocking `Neo4jConnector.update_reachability()` on a worker thread.
+
+    Usage:
+        reader = AsyncGraphReader(neo4j, 'bolt://localhost:7687', 'neo4j', 'pw')
+        status, result = await reader.get_intersection('phenylketonuria,epilepsy', 'Gene')
+    """
+
+    def __init__(self, connector, uri, user, password, logger=None):
+        """
+        :param connector: pymedgraph.graph.neo4jconnector.Neo4jConnector - provides registry and reachability index
+        :param uri: str - neo4j connection url
+        :param user: str - username to connect to neo4j instance
+        :param password: str - user password to connect to neo4j instance
+        :param logger: logging.logger
+        """
+        self.connector = connector
+        self.driver = AsyncGraphDatabase.driver(uri, auth=(user, password))
+        self.logger = logger
+
+    async def query(self, query: str, parameters: dict = None) -> list or None:
+        """ Runs query with the async driver, returns the records or None if the query failed """
+        try:
+            async with self.driver.session() as session:
+                result = await session.run(query, parameters)
+                return [record async for record in result]
+        except Exception as ex:
+            if self.logger:
+                self.logger.error(f'Async query failed. query: \'{query}\'. {ex}')
+            return None
+
+    async def get_search_terms(self) -> list:
+        return [info['label'] for info in await self.get_search_term_info()]
+
+    async def get_search_term_info(self) -> list:
+        """ Returns label, number of directly related nodes and last build time of the SearchTerm nodes """
+        registry = self.connector.registry
+        if registry is None:
+            result = await self.query(SearchTermRegistry.LOAD_QUERY)
+            return [
+                {'label': r['label'], 'nodes': r['nodes'], 'last_build': r['last_build']} for r in result or list()
+            ]
+        info = registry.cached_info()
+        if info is not None:
+            return info
+        response = await self.query(registry.VERSION_QUERY)
+        info = registry.validate(response)
+        if info is not None:
+            return info
+        return registry.load(await self.query(registry.LOAD_QUERY), response)
+
+    async def get_intersection(self, search_terms: str, level: str) -> tuple:
+        """ Same as `Neo4jConnector.get_intersection()` """
+        req_search_terms = search_terms.split(',')
+        try:
+            search_terms_in_db = await self.get_search_terms()
+        except RuntimeError as ex:
+            return 'fail', str(ex)
+        msg = self.connector._check_intersection_args(req_search_terms, search_terms_in_db, level)
+        if msg:
+            return 'fail', msg
+        registry = self.connector.registry
+        if registry is not None:
+            # the version counter was checked by `get_search_terms()`
+            self.connector.reachability.sync(registry.version, registry.changed_version)
+        missing = self.connector.reachability.missing(req_search_terms)
+        if missing:
+            failed = await asyncio.get_running_loop().run_in_executor(
+                None, partial(self.connector.update_reachability, missing, propagate=False)
+            )
+            if failed:
+                return 'fail', 'Reachable nodes of search terms could not be collected.'
+        return 'success', self.connector._intersection_counts(req_search_terms, level)
+
+    async def close(self):
+        await self.driver.close()
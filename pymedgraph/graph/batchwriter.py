@@ -0,0 +1,139 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from pymedgraph.metrics import measure
+
+
+def to_records(df: pd.DataFrame, columns: list = None) -> list:
+    """
+    Method converts the rows of `df` to the list of dicts passed to the neo4j driver. Compared to
+    `df.to_dict('records')` it only converts the given `columns` and iterates the rows as plain tuples, values of
+    categorical columns are returned as their categories.
+
+    :param df: pd.DataFrame
+    :param columns: list - columns referenced by the query, default are all columns
+    :return: list - dict per row
+    """
+    if columns is not None:
+        df = df[columns]
+    cols = list(df.columns)
+    return [dict(zip(cols, row)) for row in df.itertuples(index=False, name=None)]
+
+
+class BatchWriter(object):
+    """
+    Class writes the rows of an UNWIND query in batches with managed write transactions of the neo4j driver. The
+    driver retries a managed transaction on transient errors, e.g. deadlocks or a lost leader, so a batch either is
+    written completely or the write raises a RuntimeError after the retries.
+
+    - each worker uses one session for all of its batches
+    - with `parallel=True` up to `max_workers` batches are written at the same time. This is only safe for batches,
+    which do not lock the same nodes, e.g. MERGE of deduplicated nodes. Relation queries are written by one worker
+    - the batch size is adapted to the latency of the batches: it is halved if a batch takes longer than
+    `target_latency` seconds and doubled if it takes less than half of it. The learned size is kept for the next write
+
+    Usage:
+        writer = BatchWriter(driver, max_workers=4)
+        result = writer.write(query, df, columns=['gene'], name='Genes:nodes', parallel=True)
+        result['rows_per_second']
+    """
+
+    def __init__(self, driver, max_workers: int = 4, batch_size: int = 2000, min_batch_size: int = 100,
+                 max_batch_size: int = 20000, target_latency: float = 1., logger=None):
+        """
+        :param driver: neo4j.Driver
+        :param max_workers: int - number of concurrent sessions for parallel writes
+        :param batch_size: int - initial number of rows per batch
+        :param min_batch_size: int - lower limit of adapted batch size
+        :param max_batch_size: int - upper limit of adapted batch size
+        :param target_latency: float - seconds per batch the batch size is adapted to
+        :param logger: logging.logger
+        """
+        self.driver = driver
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self.logger = logger
+        self._lock = threading.Lock()
+
+    def write(self, query: str, rows: pd.DataFrame, columns: list = None, name: str = None,
+              parallel: bool = False) -> dict:
+        """
+        Method writes all rows with the query, which must contain `UNWIND $rows AS row` and return `total`.
+
+        :param query: str - cypher query
+        :param rows: pd.DataFrame - rows of the query
+        :param columns: list - columns referenced by the query, see `to_records()`
+        :param name: str - name of upload step in `pymedgraph.metrics`
+        :param parallel: bool - flag if batches can be written concurrently
+        :return: dict - total, batches, time, rows_per_second and final batch_size
+        """
+        state = {'pos': 0, 'total': 0, 'batches': 0, 'error': None}
+        n_workers = min(self.max_workers, max(1, -(-len(rows) // self.batch_size))) if parallel else 1
+        start = time.time()
+
+        def work():
+            with self.driver.session() as session:
+                # neo4j >= 5 renamed `write_transaction` to `execute_write`
+                write_tx = getattr(session, 'execute_write', None) or session.write_transaction
+                while True:
+                    with self._lock:
+                        if state['error'] is not None or state['pos'] >= len(rows):
+                            return
+                        size = self.batch_size
+                        batch_start = state['pos']
+                        state['pos'] += size
+                    batch_time = time.time()
+                    try:
+                        total = write_tx(self._run, query, to_records(rows.iloc[batch_start:batch_start + size], columns))
+                    except Exception as ex:
+                        with self._lock:
+                            state['error'] = ex
+                        return
+                    latency = time.time() - batch_time
+                    with self._lock:
+                        state['total'] += total
+                        state['batches'] += 1
+                        self._adapt(size, latency)
+
+        with measure(name or 'insert_data', kind='upload', rows_in=len(rows)) as m:
+            if n_workers == 1:
+                work()
+            else:
+                with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='pymedgraph-writer') as pool:
+                    for future in [pool.submit(work) for _ in range(n_workers)]:
+                        future.result()
+            if state['error'] is not None:
+                if self.logger:
+                    self.logger.error(f'Write of \'{name}\' failed after {state["batches"]} batches: {state["error"]}')
+                raise RuntimeError(f'Write of \'{name}\' failed: {state["error"]}')
+            m.rows_out = state['total']
+
+        seconds = time.time() - start
+        result = {
+            'total': state['total'],
+            'batches': state['batches'],
+            'time': seconds,
+            'rows_per_second': len(rows) / seconds if seconds > 0 else None,
+            'batch_size': self.batch_size
+        }
+        if self.logger:
+            self.logger.info('Successfully uploaded data: {r}'.format(r=result))
+        return result
+
+    def _adapt(self, size: int, latency: float):
+        """ Adapts batch size to the latency of a finished batch of `size` rows """
+        if latency > self.target_latency and size > self.min_batch_size:
+            self.batch_size = max(self.min_batch_size, size // 2)
+        elif latency < self.target_latency / 2 and size >= self.batch_size:
+            self.batch_size = min(self.max_batch_size, size * 2)
+
+    @staticmethod
+    def _run(tx, query: str, rows: list) -> int:
+        record = tx.run(query, rows=rows).single()
+        return record['total'] if record is not None else 0
@@ -0,0 +1,194 @@
+import os
+import csv
+import json
+
+import pandas as pd
+
+
+RELATIONSHIP_TYPE = 'CONTAINS'
+RELATIONSHIP_FILE = 'relationships.csv'
+MANIFEST = 'manifest.json'
+
+
+def node_id(label: str, key) -> str:
+    """ Returns stable id of a node in the import files, e.g. 'Gene:PAH' """
+    return f'{label}:{key}'
+
+
+class BulkExporter(object):
+    """
+    Class writes `pymedgraph.dataextraction.basepipe.PipeOutput` objects to CSV files for the offline importer of
+    neo4j, which is much faster than the transactional upload for the first load of a large graph:
+
+        cd export
+        neo4j-admin import --database=neo4j --multiline-fields=true \
+            --nodes=nodes_SearchTerm.csv --nodes=nodes_Paper.csv ... --relationships=relationships.csv
+
+    The arguments are listed in the returned manifest of `BulkExporter.finish()`, relative to the export directory.
+
+    The exported graph is the graph of the transactional upload (see `pymedgraph.graph.neo4jconnector`):
+    - one node file per label with the id attribute and the attribute columns of the NodeTable. Each node gets the
+    stable import id `<label>:<id attribute value>` and is written once, with the attributes of its first row
+    - one relationship file with a `CONTAINS` relation from the source node to the node. A relation is only written
+    once and only if its source node was exported before, like the MATCH of the upload
+    - the SearchTerm nodes with their label
+
+    The rows are streamed to disk as outputs are added, only the ids of written nodes and relations are kept in memory.
+    Outputs have to be added in upload order, i.e. nodes of a source table before the relations pointing to them.
+    The files only depend on the added outputs and their order, so exports of the same outputs are byte-for-byte equal.
+
+    Usage:
+        exporter = BulkExporter('export', search_terms=['phenylketonuria'])
+        for output in outputs:
+            exporter.add(output)
+        manifest = exporter.finish()
+    """
+
+    def __init__(self, path: str, search_terms: list, logger=None):
+        """
+        :param path: str - export directory, is created if it does not exist
+        :param search_terms: list - search terms of the outputs, exported as SearchTerm nodes
+        :param logger: logging.logger
+        """
+        self.path = path
+        self.search_terms = list(dict.fromkeys(search_terms))
+        self.logger = logger
+        os.makedirs(self.path, exist_ok=True)
+        # label -> (file handle, csv writer, property columns)
+        self._node_files = dict()
+        self._node_ids = set(node_id('SearchTerm', t) for t in self.search_terms)
+        self._relations = set()
+        self._counts = {'nodes': {'SearchTerm': len(self.search_terms)}, 'relationships': 0}
+        self._rel_fh = open(os.path.join(self.path, RELATIONSHIP_FILE), 'w', newline='', encoding='utf-8')
+        self._rel_writer = csv.writer(self._rel_fh, lineterminator='\n')
+        self._rel_writer.writerow([':START_ID', ':END_ID', ':TYPE'])
+
+    def add(self, pipe_output):
+        """ Writes the nodes and relations of all NodeTables of a PipeOutput """
+        for node_table in pipe_output.node_tables:
+            self.add_table(node_table)
+
+    def add_table(self, node_table):
+        """ Writes the nodes and relations of a NodeTable """
+        meta = node_table.meta
+        id_col = meta['id_attribute']
+        columns = [id_col] + [c for c in (meta['attribute_cols'] or []) if c != id_col]
+        source_col = meta['source_column']
+        if not source_col or not meta['source_node']:
+            source_labels = list()
+        elif isinstance(meta['source_node'], list):
+            source_labels = meta['source_node']
+        else:
+            source_labels = [meta['source_node']]
+        labels = meta['node_label'] if isinstance(meta['node_label'], list) else [meta['node_label']]
+        df = node_table.data
+
+        for label in labels:
+            rows = df[df['node_label'] == label] if len(labels) > 1 else df
+            if rows.empty:
+                continue
+            writer, label_columns = self._node_writer(label, rows, columns)
+            new_nodes = 0
+            for values in rows[columns].itertuples(index=False, name=None):
+                nid = node_id(label, values[0])
+                if nid in self._node_ids:
+                    continue
+                self._node_ids.add(nid)
+                record = dict(zip(columns, values))
+                writer.writerow([nid] + [self._format(record.get(c, '')) for c in label_columns] + [label])
+                new_nodes += 1
+            self._counts['nodes'][label] = self._counts['nodes'].get(label, 0) + new_nodes
+            if not source_labels:
+                continue
+            for source, key in rows[[source_col, id_col]].itertuples(index=False, name=None):
+                end_id = node_id(label, key)
+                for source_label in source_labels:
+                    start_id = node_id(source_label, source)
+                    if start_id not in self._node_ids or (start_id, end_id) in self._relations:
+                        continue
+                    self._relations.add((start_id, end_id))
+                    self._rel_writer.writerow([start_id, end_id, RELATIONSHIP_TYPE])
+                    self._counts['relationships'] += 1
+
+    def finish(self) -> dict:
+        """
+        Method writes the SearchTerm nodes, closes all files and writes the manifest.
+
+        :return: dict - files, node and relationship counts and the arguments of `neo4j-admin import`
+        """
+        self._write_search_terms()
+        for fh, _, _ in self._node_files.values():
+            fh.close()
+        self._rel_fh.close()
+        node_files = ['nodes_SearchTerm.csv'] + [f'nodes_{label}.csv' for label in self._node_files]
+        manifest = {
+            'nodes': node_files,
+            'relationships': [RELATIONSHIP_FILE],
+            'counts': self._counts,
+            # paths are relative to the export directory, so the manifest does not depend on its location
+            'import_args': ['--multiline-fields=true'] + [f'--nodes={f}' for f in node_files] +
+                           [f'--relationships={RELATIONSHIP_FILE}']
+        }
+        with open(os.path.join(self.path, MANIFEST), 'w') as fh:
+            json.dump(manifest, fh, indent=2, sort_keys=True)
+        if self.logger:
+            self.logger.info('Exported {n} nodes and {r} relationships to \'{p}\'.'.format(
+                n=sum(self._counts['nodes'].values()), r=self._counts['relationships'], p=self.path
+            ))
+        return manifest
+
+    def _node_writer(self, label: str, rows: pd.DataFrame, columns: list) -> tuple:
+        """ Returns csv writer and property columns of the node file of a label, the file is opened on first use """
+        if label not in self._node_files:
+            fh = open(os.path.join(self.path, f'nodes_{label}.csv'), 'w', newline='', encoding='utf-8')
+            writer = csv.writer(fh, lineterminator='\n')
+            writer.writerow([':ID'] + [self._header(c, rows[c]) for c in columns] + [':LABEL'])
+            self._node_files[label] = (fh, writer, columns)
+        elif self.logger:
+            missing = [c for c in self._node_files[label][2] if c not in columns]
+            if missing:
+                self.logger.warning(f'Table for \'{label}\' nodes misses columns {missing}, they are exported empty.')
+        _, writer, label_columns = self._node_files[label]
+        return writer, label_columns
+
+    def _write_search_terms(self):
+        with open(os.path.join(self.path, 'nodes_SearchTerm.csv'), 'w', newline='', encoding='utf-8') as fh:
+            writer = csv.writer(fh, lineterminator='\n')
+            writer.writerow([':ID', 'label', ':LABEL'])
+            for term in self.search_terms:
+                writer.writerow([node_id('SearchTerm', term), term, 'SearchTerm'])
+
+    @staticmethod
+    def _header(column: str, values: pd.Series) -> str:
+        """ Returns header of a property column with neo4j-admin type, strings have no type """
+        if pd.api.types.is_bool_dtype(values):
+            return f'{column}:boolean'
+        if pd.api.types.is_integer_dtype(values):
+            return f'{column}:long'
+        if pd.api.types.is_float_dtype(values):
+            return f'{column}:double'
+        return column
+
+    @staticmethod
+    def _format(value) -> str:
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (list, tuple)):
+            return ';'.join(str(v) for v in value)
+        return str(value)
+
+
+def export_bulk(path: str, search_terms: list, outputs: list, logger=None) -> dict:
+    """
+    Method exports PipeOutputs for `neo4j-admin import`, see `pymedgraph.graph.bulkexport.BulkExporter`.
+
+    :param path: str - export directory
+    :param search_terms: list or str - search term(s) of the outputs
+    :param outputs: list - PipeOutput objects in upload order
+    :param logger: logging.logger
+    :return: dict - manifest of export
+    """
+    exporter = BulkExporter(path, [search_terms] if isinstance(search_terms, str) else search_terms, logger=logger)
+    for output in outputs:
+        exporter.add(output)
+    return exporter.finish()
@@ -0,0 +1,410 @@
+import os
+import time
+import pickle
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from pymedgraph.metrics import measure
+from pymedgraph.graph.neo4jconnector import Neo4jConnector
+from pymedgraph.graph.reachability import ReachabilityIndex
+from pymedgraph.graph.setalgebra import SetAlgebra
+
+
+# relations are stored as sorted int64 keys `start << 32 | end`
+_ID_BITS = np.int64(32)
+_ID_MASK = np.int64((1 << 32) - 1)
+
+
+class InMemoryGraph(Neo4jConnector):
+    """
+    Graph store in the python process, which implements the upload and read methods of the `Neo4jConnector` with the
+    same semantics as the Cypher queries, without a neo4j instance. Is used by tests, benchmarks and small deployments.
+
+    - nodes have integer ids. Per label the attributes are stored in columns, the key attributes used by MERGE and
+    MATCH get a hash index value -> node id on first use
+    - relations are stored as one sorted array of keys `start id << 32 | end id`, which is at the same time the edge
+    list sorted by start node and the MERGE lookup, and is read with an index array per start node (CSR)
+    - the graph can be stored to and loaded from a snapshot file with `InMemoryGraph.save_snapshot()` and
+    `InMemoryGraph.load_snapshot()`
+
+    Cypher queries can not be run, `InMemoryGraph.query()` raises a RuntimeError.
+
+    Usage:
+        graph = InMemoryGraph()
+        graph.build_biomed_graph('phenylketonuria', outputs)
+        graph.get_intersection('phenylketonuria,epilepsy', 'Gene')
+        graph.save_snapshot('graph.pkl')
+    """
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, logger=None):
+        """
+        :param logger: logging.logger
+        """
+        self.driver = None
+        self.logger = logger
+        self.unique_constraints = False
+        self.single_pass = False
+        self.writer = None
+        self._indexed = set()
+        self.reachability = ReachabilityIndex(logger=logger)
+        self.set_algebra = SetAlgebra(self.reachability)
+        # search terms are read from the hash index of the SearchTerm nodes
+        self.registry = None
+        # merges are already local, uploads are not diffed
+        self.manifest = None
+        self._reset()
+
+    def _reset(self):
+        # node id -> label code, row in the table of the label and flag if the node exists
+        self._labels = list()
+        self._label_codes = dict()
+        self._node_label = array('h')
+        self._node_row = array('q')
+        self._alive = array('b')
+        # label -> {'ids': node id per row, 'columns': attribute -> list of values per row}
+        self._tables = dict()
+        # (label, attribute) -> value -> node id
+        self._keys = dict()
+        self._edge_keys = np.empty(0, dtype=np.int64)
+        self._csr = None
+
+    def query(self, query, parameters):
+        raise RuntimeError('InMemoryGraph does not run Cypher queries.')
+
+    def close(self):
+        pass
+
+    def _init_new_neo4j_graph(self, disease: str or list, delete_existing_graph=True):
+        """ Method deletes graph and adds SearchTerm node for disease, or one node per disease if a list is passed """
+        if delete_existing_graph:
+            self.delete_graph()
+        diseases = disease if isinstance(disease, list) else [disease]
+        self._merge_nodes('SearchTerm', pd.DataFrame({'label': diseases}), ['label'])
+
+    def upload_nodetable(self, node_table):
+        """
+        Method adds the nodes and relations of a node table like the queries of `Neo4jConnector.upload_nodetable()`:
+        nodes are merged on their id attribute with the attributes of their first row, relations are merged from all
+        existing source nodes with the source attribute value of a row.
+
+        :param node_table: pymedgraph.dataextraction.basepipe.NodeTable
+        """
+        meta = node_table.meta
+        if not meta['source_column'] or not meta['source_node']:
+            source_nodes = list()
+        elif isinstance(meta['source_node'], list):
+            source_nodes = meta['source_node']
+        else:
+            source_nodes = [meta['source_node']]
+        id_col = meta['id_attribute']
+        for node_label, df in self._label_groups(node_table):
+            with measure(f'{node_table.name}:{node_label}', kind='upload', rows_in=len(df)) as m:
+                self._merge_nodes(node_label, df.drop_duplicates(subset=[id_col]), self._node_columns(meta))
+                for source_node in source_nodes:
+                    starts = df[meta['source_column']].astype(object).map(
+                        self._key_index(source_node, meta['source_node_attr'])
+                    )
+                    ends = df[id_col].astype(object).map(self._key_index(node_label, id_col))
+                    found = starts.notna().to_numpy() & ends.notna().to_numpy()
+                    m.rows_out += self._merge_relations(
+                        starts.to_numpy()[found].astype(np.int64), ends.to_numpy()[found].astype(np.int64)
+                    )
+
+    def record_search_term_build(self, node_table):
+        """ Stores the build time on the SearchTerm nodes, like the `Neo4jConnector` """
+        build_time = time.time()
+        index = self._key_index('SearchTerm', 'label')
+        for term in node_table.data[node_table.meta['source_column']].drop_duplicates():
+            node_id = index.get(term)
+            if node_id is not None:
+                self._set_value(node_id, 'last_build', build_time)
+
+    def get_search_term_state(self, disease: str, id_attribute: str = 'pubmedID') -> dict or None:
+        node_id = self._key_index('SearchTerm', 'label').get(disease)
+        if node_id is None:
+            return None
+        _, children = self._children(np.array([node_id], dtype=np.int64))
+        ids = [self._get_value(int(c), id_attribute) for c in children]
+        return {'ids': [i for i in ids if i is not None], 'last_build': self._get_value(node_id, 'last_build')}
+
+    def get_search_terms(self) -> list:
+        return list(self._key_index('SearchTerm', 'label'))
+
+    def get_search_term_info(self) -> list:
+        info = list()
+        for term, node_id in self._key_index('SearchTerm', 'label').items():
+            starts, _ = self._children(np.array([node_id], dtype=np.int64))
+            info.append({'label': term, 'nodes': len(starts), 'last_build': self._get_value(node_id, 'last_build')})
+        return info
+
+    def delete_graph(self, batch_size: int = 10000) -> dict:
+        """ Deletes all nodes, `batch_size` is ignored """
+        start = time.time()
+        deleted = int(np.frombuffer(self._alive, dtype=np.int8).sum()) if len(self._alive) else 0
+        self._reset()
+        self.reachability.clear()
+        return self._delete_result(deleted, 1 if deleted else 0, start)
+
+    def delete_search_term(self, term: str, batch_size: int = 10000) -> dict:
+        """
+        Deletes the SearchTerm node of `term` and all nodes, which can only be reached from it, see
+        `Neo4jConnector.delete_search_term()`. `batch_size` is ignored.
+        """
+        start = time.time()
+        root, _, children, _ = self._collect_subgraph(term)
+        region = np.zeros(len(self._node_label), dtype=bool)
+        region[children] = True
+        region[root] = True
+        # nodes with a parent outside of the subgraph and all nodes below them are kept
+        starts, ends = self._edges()
+        seeds = np.unique(ends[region[ends] & ~region[starts]])
+        kept = np.zeros(len(region), dtype=bool)
+        frontier = seeds
+        while frontier.size:
+            kept[frontier] = True
+            _, next_nodes = self._children(frontier)
+            frontier = np.unique(next_nodes[region[next_nodes] & ~kept[next_nodes]])
+        deleted = self._delete_nodes(np.flatnonzero(region & ~kept))
+        self.reachability.remove(term)
+        result = self._delete_result(deleted, 1, start)
+        result['kept'] = int((kept & region).sum())
+        return result
+
+    def _collect_subgraph(self, term: str, batch_size: int = 10000, max_depth: int = None) -> tuple:
+        """ Collects the subgraph of a search term, see `Neo4jConnector._collect_subgraph()` """
+        root = self._search_term_id(term)
+        visited = np.zeros(len(self._node_label), dtype=bool)
+        visited[root] = True
+        parents, children = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        frontier = np.array([root], dtype=np.int64)
+        depth = 0
+        while frontier.size and (max_depth is None or depth < max_depth):
+            starts, ends = self._children(frontier)
+            parents.append(starts)
+            children.append(ends)
+            frontier = np.unique(ends[~visited[ends]])
+            visited[frontier] = True
+            depth += 1
+        parents, children = np.concatenate(parents), np.concatenate(children)
+        labels = np.array(self._labels, dtype=object)[np.frombuffer(self._node_label, dtype=np.int16)[children]] \
+            if children.size else np.empty(0, dtype=object)
+        return root, parents, children, labels
+
+    def _ensure_index(self, label: str, attribute: str, unique: bool = False):
+        # hash indexes are built on first use, see `InMemoryGraph._key_index()`
+        pass
+
+    def _snapshot_nodes(self, node_ids: list) -> list:
+        return [(self._labels[self._node_label[node_id]], self._properties(node_id)) for node_id in node_ids]
+
+    def _snapshot_relations(self, node_ids: list) -> list:
+        starts, ends = self._children(np.asarray(node_ids, dtype=np.int64))
+        relations = list()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            start_label, end_label = self._labels[self._node_label[start]], self._labels[self._node_label[end]]
+            relations.append({
+                'start_label': start_label,
+                'start_key': self._get_value(start, self.NODE_KEYS.get(start_label, 'text')),
+                'end_label': end_label,
+                'end_key': self._get_value(end, self.NODE_KEYS.get(end_label, 'text'))
+            })
+        return relations
+
+    def _snapshot_merge_nodes(self, label: str, key: str, rows: list) -> int:
+        # properties missing in a row are left unchanged, like `SET n += row`
+        for row in rows:
+            node_id = self._get_or_create(label, key, row[key])
+            for attribute, value in row.items():
+                self._set_value(node_id, attribute, value)
+        return len(rows)
+
+    def _snapshot_merge_relations(self, start_label: str, start_key: str, end_label: str, end_key: str,
+                                  rows: list) -> int:
+        start_index, end_index = self._key_index(start_label, start_key), self._key_index(end_label, end_key)
+        pairs = [(start_index.get(r['start_key']), end_index.get(r['end_key'])) for r in rows]
+        pairs = np.array([p for p in pairs if p[0] is not None and p[1] is not None], dtype=np.int64).reshape(-1, 2)
+        self._merge_relations(pairs[:, 0], pairs[:, 1])
+        return len(pairs)
+
+    def _search_term_id(self, term: str) -> int:
+        root = self._key_index('SearchTerm', 'label').get(term)
+        if root is None:
+            msg = f'Search term \'{term}\' is not in Knowledge Graph.'
+            if self.logger:
+                self.logger.error(msg)
+            raise RuntimeError(msg)
+        return root
+
+    def _subgraph_nodes(self, node_ids: list, fetch_size: int):
+        for node_id in node_ids:
+            yield node_id, self._labels[self._node_label[node_id]], self._properties(node_id)
+
+    def _subgraph_edges(self, node_ids: list, fetch_size: int):
+        starts, ends = self._children(np.asarray(node_ids, dtype=np.int64))
+        yield from zip(starts.tolist(), ends.tolist())
+
+    def count_nodes(self, label: str = None) -> int:
+        alive = np.frombuffer(self._alive, dtype=np.int8).astype(bool) if len(self._alive) else np.empty(0, bool)
+        if label is None:
+            return int(alive.sum())
+        if label not in self._label_codes:
+            return 0
+        return int((alive & (np.frombuffer(self._node_label, dtype=np.int16) == self._label_codes[label])).sum())
+
+    def count_relationships(self) -> int:
+        return len(self._edge_keys)
+
+    def get_node(self, label: str, attribute: str, value) -> dict or None:
+        """ Returns attributes of the node with `label` and attribute value, or None """
+        node_id = self._key_index(label, attribute).get(value)
+        if node_id is None:
+            return None
+        return self._properties(node_id)
+
+    def save_snapshot(self, path: str):
+        """ Stores the graph in a file, the hash indexes and the reachability index are rebuilt on load """
+        snapshot = {
+            'version': self.SNAPSHOT_VERSION,
+            'labels': self._labels,
+            'node_label': self._node_label,
+            'node_row': self._node_row,
+            'alive': self._alive,
+            'tables': self._tables,
+            'edge_keys': self._edge_keys
+        }
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'wb') as fh:
+            pickle.dump(snapshot, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, path)
+        if self.logger:
+            self.logger.info(f'Saved snapshot of {self.count_nodes()} nodes to \'{path}\'.')
+
+    @classmethod
+    def load_snapshot(cls, path: str, logger=None):
+        """ Returns graph of snapshot file, raises a RuntimeError if the snapshot version is not supported """
+        with open(path, 'rb') as fh:
+            snapshot = pickle.load(fh)
+        if snapshot.get('version') != cls.SNAPSHOT_VERSION:
+            raise RuntimeError(f'Snapshot \'{path}\' has unsupported version {snapshot.get("version")}.')
+        graph = cls(logger=logger)
+        graph._labels = snapshot['labels']
+        graph._label_codes = {label: i for i, label in enumerate(graph._labels)}
+        graph._node_label = snapshot['node_label']
+        graph._node_row = snapshot['node_row']
+        graph._alive = snapshot['alive']
+        graph._tables = snapshot['tables']
+        graph._edge_keys = snapshot['edge_keys']
+        return graph
+
+    def _table(self, label: str) -> dict:
+        if label not in self._tables:
+            self._label_codes[label] = len(self._labels)
+            self._labels.append(label)
+            self._tables[label] = {'ids': array('q'), 'columns': dict()}
+        return self._tables[label]
+
+    def _key_index(self, label: str, attribute: str) -> dict:
+        """ Returns hash index value -> node id of the nodes with label, the index is built on first use """
+        key = (label, attribute)
+        if key not in self._keys:
+            index = dict()
+            table = self._tables.get(label)
+            if table is not None and attribute in table['columns']:
+                for node_id, value in zip(table['ids'], table['columns'][attribute]):
+                    if value is not None and self._alive[node_id] and value not in index:
+                        index[value] = node_id
+            self._keys[key] = index
+        return self._keys[key]
+
+    def _merge_nodes(self, label: str, df: pd.DataFrame, columns: list):
+        """ Merges nodes on the first column and sets the other columns, like `MERGE (n {id: row.id}) SET n.a = row.a` """
+        for values in df[columns].itertuples(index=False, name=None):
+            node_id = self._get_or_create(label, columns[0], values[0])
+            for attribute, value in zip(columns, values):
+                self._set_value(node_id, attribute, value)
+
+    def _get_or_create(self, label: str, key: str, value) -> int:
+        """ Returns id of the node with label and key value, the node is added if it does not exist """
+        table = self._table(label)
+        index = self._key_index(label, key)
+        node_id = index.get(value)
+        if node_id is None:
+            node_id = len(self._node_label)
+            self._node_label.append(self._label_codes[label])
+            self._node_row.append(len(table['ids']))
+            self._alive.append(1)
+            table['ids'].append(node_id)
+            index[value] = node_id
+        return node_id
+
+    def _properties(self, node_id: int) -> dict:
+        """ Returns attributes of a node, without attributes which are not set """
+        columns = self._tables[self._labels[self._node_label[node_id]]]['columns']
+        row = self._node_row[node_id]
+        return {a: c[row] for a, c in columns.items() if row < len(c) and c[row] is not None}
+
+    def _get_value(self, node_id: int, attribute: str):
+        column = self._tables[self._labels[self._node_label[node_id]]]['columns'].get(attribute, ())
+        row = self._node_row[node_id]
+        return column[row] if row < len(column) else None
+
+    def _set_value(self, node_id: int, attribute: str, value):
+        label = self._labels[self._node_label[node_id]]
+        column = self._tables[label]['columns'].setdefault(attribute, list())
+        row = self._node_row[node_id]
+        if row >= len(column):
+            column.extend([None] * (row + 1 - len(column)))
+        old = column[row]
+        column[row] = value
+        index = self._keys.get((label, attribute))
+        if index is not None and old != value:
+            if old is not None and index.get(old) == node_id:
+                del index[old]
+            index.setdefault(value, node_id)
+
+    def _merge_relations(self, starts: np.ndarray, ends: np.ndarray) -> int:
+        """ Adds relations, which do not exist yet, returns number of added relations """
+        keys = np.unique((starts << _ID_BITS) | ends)
+        pos = np.searchsorted(self._edge_keys, keys)
+        exists = pos < len(self._edge_keys)
+        exists[exists] = self._edge_keys[pos[exists]] == keys[exists]
+        new_keys = keys[~exists]
+        if new_keys.size:
+            self._edge_keys = np.union1d(self._edge_keys, new_keys)
+            self._csr = None
+        return int(new_keys.size)
+
+    def _edges(self) -> tuple:
+        return self._edge_keys >> _ID_BITS, self._edge_keys & _ID_MASK
+
+    def _children(self, nodes: np.ndarray) -> tuple:
+        """ Returns (start ids, end ids) of all relations of the nodes """
+        if self._csr is None or len(self._csr) != len(self._node_label) + 1:
+            starts, _ = self._edges()
+            self._csr = np.searchsorted(starts, np.arange(len(self._node_label) + 1))
+        first, last = self._csr[nodes], self._csr[nodes + 1]
+        lengths = last - first
+        positions = np.repeat(first - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.repeat(nodes, lengths), self._edge_keys[positions] & _ID_MASK
+
+    def _delete_nodes(self, node_ids: np.ndarray) -> int:
+        """ Deletes nodes with their relations and removes them from the hash indexes """
+        if not node_ids.size:
+            return 0
+        for node_id in node_ids:
+            self._alive[node_id] = 0
+            label = self._labels[self._node_label[node_id]]
+            for (index_label, attribute), index in self._keys.items():
+                if index_label == label:
+                    value = self._get_value(node_id, attribute)
+                    if value is not None and index.get(value) == node_id:
+                        del index[value]
+        deleted = np.zeros(len(self._node_label), dtype=bool)
+        deleted[node_ids] = True
+        starts, ends = self._edges()
+        self._edge_keys = self._edge_keys[~(deleted[starts] | deleted[ends])]
+        self._csr = None
+        return int(node_ids.size)
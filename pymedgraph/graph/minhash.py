@@ -0,0 +1,178 @@
+import math
+import threading
+
+import numpy as np
+
+
+# mersenne prime of the hash functions, products of two values below it fit into uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def _mix(ids: np.ndarray) -> np.ndarray:
+    """ splitmix64 finalizer, spreads consecutive node ids over the whole uint64 range """
+    x = ids.astype(np.uint64)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xbf58476d1ce4e5b9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94d049bb133111eb)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+class MinHashIndex(object):
+    """
+    Class holds a MinHash signature of the nodes reachable from a search term per search term and node label, plus an
+    LSH index of the signatures to find similar search terms without comparing all pairs.
+
+    The signature is the minimum of `num_perm` hash functions over the node ids. The share of equal signature values of
+    two search terms is an estimate of the Jaccard similarity of their nodes, with an error below
+    `MinHashIndex.error()` with 95% probability. The signature of a union is the element-wise minimum of the
+    signatures, so nodes added to a search term are merged without the nodes it already has.
+
+    For the LSH index the signature is split into `bands` bands, search terms with an equal band share a bucket. The
+    candidates of `MinHashIndex.top_k()` are the search terms sharing at least one bucket, which finds pairs with a
+    Jaccard similarity above about `(1 / bands) ** (1 / rows)` with high probability.
+
+    The index is filled by `pymedgraph.graph.reachability.ReachabilityIndex` whenever the nodes of a search term change.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        """
+        :param num_perm: int - number of hash functions, the error decreases with `1 / sqrt(num_perm)`
+        :param bands: int - number of LSH bands, has to divide `num_perm`
+        :param seed: int - seed of the hash functions
+        """
+        if num_perm % bands:
+            raise RuntimeError(f'Number of LSH bands {bands} does not divide number of hash functions {num_perm}.')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+        # (search term, label) -> signature
+        self._signatures = dict()
+        # (label, band, band values) -> search terms
+        self._buckets = dict()
+        self._lock = threading.RLock()
+
+    def signature(self, ids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """ Returns MinHash signature of node ids, the signature of no ids has all values at the maximum """
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        x = _mix(np.asarray(ids, dtype=np.int64)) % _PRIME
+        for start in range(0, len(x), chunk_size):
+            hashes = (self._a * x[None, start:start + chunk_size] + self._b) % _PRIME
+            signature = np.minimum(signature, hashes.min(axis=1))
+        return signature
+
+    def set_term(self, term: str, sets: dict):
+        """ Replaces the signatures of a search term by the signatures of `sets`, dict label -> node ids """
+        with self._lock:
+            for key in [k for k in self._signatures if k[0] == term]:
+                self._set(key, None)
+            for label, ids in sets.items():
+                self._set((term, label), self.signature(ids))
+
+    def add(self, term: str, label: str, ids: np.ndarray):
+        """ Merges node ids into the signature of a search term """
+        signature = self.signature(ids)
+        with self._lock:
+            old = self._signatures.get((term, label))
+            self._set((term, label), signature if old is None else np.minimum(old, signature))
+
+    def remove(self, term: str):
+        self.set_term(term, dict())
+
+    def clear(self):
+        with self._lock:
+            self._signatures = dict()
+            self._buckets = dict()
+
+    def error(self, confidence: float = 0.95) -> float:
+        """ Returns bound of the absolute error of the estimated Jaccard similarity (Hoeffding) """
+        return math.sqrt(math.log(2 / (1 - confidence)) / (2 * self.num_perm))
+
+    def jaccard(self, terms: list, label: str) -> np.ndarray:
+        """ Returns matrix of estimated Jaccard similarities of search terms, 0 if a search term has no nodes """
+        with self._lock:
+            signatures = np.stack([self._get(t, label) for t in terms]) if terms else np.empty((0, self.num_perm))
+        empty = (signatures == _PRIME).all(axis=1)
+        matrix = np.zeros((len(terms), len(terms)))
+        for i in range(len(terms)):
+            matrix[i] = (signatures == signatures[i]).mean(axis=1)
+        matrix[empty, :] = 0.
+        matrix[:, empty] = 0.
+        return matrix
+
+    def estimate(self, terms: list, label: str, sizes: list) -> dict:
+        """
+        Method estimates the Jaccard similarity and the number of shared nodes of all pairs of search terms. The number
+        of shared nodes is derived from the Jaccard similarity J and the sizes: J / (1 + J) * (|A| + |B|).
+
+        :param terms: list - search terms
+        :param label: str - node label
+        :param sizes: list - number of nodes of each search term
+        :return: dict - matrices 'jaccard' and 'intersection' with lower and upper bounds, and 'jaccard_error'
+        """
+        error = self.error()
+        jaccard = self.jaccard(terms, label)
+        total = np.add.outer(np.asarray(sizes, dtype=float), np.asarray(sizes, dtype=float))
+
+        def shared(j):
+            return np.rint(j / (1 + j) * total).astype(np.int64)
+
+        return {
+            'size': list(sizes),
+            'jaccard': jaccard.round(6).tolist(),
+            'jaccard_error': round(error, 6),
+            'intersection': shared(jaccard).tolist(),
+            'intersection_low': shared(np.clip(jaccard - error, 0., 1.)).tolist(),
+            'intersection_high': np.minimum(
+                shared(np.clip(jaccard + error, 0., 1.)), np.minimum.outer(sizes, sizes)
+            ).tolist()
+        }
+
+    def top_k(self, term: str, label: str, k: int = 10) -> list:
+        """
+        Method returns the search terms with the highest estimated Jaccard similarity to `term` among the search
+        terms sharing an LSH bucket with it.
+
+        :param term: str - search term
+        :param label: str - node label
+        :param k: int - maximum number of search terms
+        :return: list - (search term, estimated Jaccard similarity) tuples, most similar first
+        """
+        with self._lock:
+            signature = self._signatures.get((term, label))
+            if signature is None:
+                return list()
+            candidates = set()
+            for key in self._band_keys(label, signature):
+                candidates.update(self._buckets.get(key, ()))
+            candidates.discard(term)
+            scores = [(c, float((self._signatures[(c, label)] == signature).mean())) for c in candidates]
+        return sorted(scores, key=lambda s: (-s[1], s[0]))[:k]
+
+    def _get(self, term: str, label: str) -> np.ndarray:
+        signature = self._signatures.get((term, label))
+        return np.full(self.num_perm, _PRIME, dtype=np.uint64) if signature is None else signature
+
+    def _set(self, key: tuple, signature):
+        term, label = key
+        old = self._signatures.pop(key, None)
+        if old is not None:
+            for band_key in self._band_keys(label, old):
+                self._buckets[band_key].discard(term)
+                if not self._buckets[band_key]:
+                    del self._buckets[band_key]
+        # search terms without nodes are not similar to anything
+        if signature is None or (signature == _PRIME).all():
+            return
+        self._signatures[key] = signature
+        for band_key in self._band_keys(label, signature):
+            self._buckets.setdefault(band_key, set()).add(term)
+
+    def _band_keys(self, label: str, signature: np.ndarray) -> list:
+        return [
+            (label, band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)
+        ]
@@ -1,7 +1,16 @@
 import time
+import numpy as np
 import pandas as pd
 from neo4j import GraphDatabase
 
+from pymedgraph.metrics import measure
+from pymedgraph.graph.batchwriter import BatchWriter, to_records
+from pymedgraph.graph.reachability import ReachabilityIndex
+from pymedgraph.graph.setalgebra import SetAlgebra
+from pymedgraph.graph.registry import SearchTermRegistry
+from pymedgraph.graph.uploadmanifest import UploadManifest
+from pymedgraph.graph.snapshot import SnapshotWriter, SnapshotReader
+
 
 class Neo4jConnector(object):
     """
@@ -13,40 +22,96 @@ class Neo4jConnector(object):
 
     Source for batch upload: https://towardsdatascience.com/create-a-graph-database-in-neo4j-using-python-4172d40f89c4
     """
+    # number of relations between SearchTerm node and nodes of label
+    GRAPH_LEVEL_LIMIT = {
+        'DISEASE': 2,
+        'CHEMICAL': 2,
+        'UMLS': 3,
+        'Gene': 4,
+        'Protein': 5,
+        'SnomedConcept': 4,
+        'ClinicalFeature': 4,
+        'GO': 6
+    }
+    # key attribute of the nodes of a label, nodes of other labels are named entities with key `text`
+    NODE_KEYS = {
+        'SearchTerm': 'label',
+        'Paper': 'pubmedID',
+        'UMLS': 'CUI',
+        'Gene': 'gene',
+        'Protein': 'Entry',
+        'SnomedConcept': 'SAUI',
+        'ClinicalFeature': 'CUI',
+        'GO': 'GoID'
+    }
 
-    def __init__(self, uri, user, password, logger=None):
+    def __init__(self, uri, user, password, logger=None, unique_constraints: bool = False,
+                 single_pass: bool = False, writer: dict = None, reachability: str = None, registry: dict = None,
+                 manifest: str = None):
         """ Initializes Neo4jBuilder and constructs Neo4J driver based on credentials.
 
         :param uri: str - neo4j connection url
         :param user: str - username to connect to neo4j instance
         :param password: str - user password to connect to neo4j instance
         :param logger: logging.logger
+        :param unique_constraints: bool - flag to create uniqueness constraints instead of indexes for the node keys,
+        see `Neo4jConnector.ensure_indexes()`
+        :param single_pass: bool - flag to upload nodes and their relations with one query per table and label, see
+        `Neo4jConnector.upload_nodetable()`
+        :param writer: dict - kwargs of `pymedgraph.graph.batchwriter.BatchWriter`, if set the data is written with
+        managed transactions, concurrent sessions and adaptive batch size instead of one query per batch
+        :param reachability: str - file to persist the reachable nodes per search term, see
+        `Neo4jConnector.update_reachability()`
+        :param registry: dict - kwargs of `pymedgraph.graph.registry.SearchTermRegistry`, which caches the search terms
+        :param manifest: str - sqlite file of the `pymedgraph.graph.uploadmanifest.UploadManifest`. If set, only new or
+        changed nodes and missing relations are uploaded
         """
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
         self.logger = logger
+        self.unique_constraints = unique_constraints
+        self.single_pass = single_pass
+        self.writer = BatchWriter(self.driver, logger=logger, **writer) if writer is not None else None
+        # (label, attribute) pairs with existing index or constraint
+        self._indexed = set()
+        self.reachability = ReachabilityIndex(reachability, logger=logger)
+        self.set_algebra = SetAlgebra(self.reachability)
+        self.registry = SearchTermRegistry(self, logger=logger, **(registry or dict()))
+        self.manifest = UploadManifest(manifest, logger=logger) if manifest else None
 
     def build_biomed_graph(self, disease: str, pipe_outputs, delete_graph: bool = False):
         """
         Wrapper method to build new graph for disease and pipe output tables.
 
-        :param disease: str - name of search term
+        :param disease: str or list - name of search term or list of search terms of a batch build
         :param pipe_outputs: list - contains pymedgraph.dataextraction.basepipe.PipeOutput objects
         :param delete_graph: bool - flag if existing graph shall be deleted or not
         """
         self._init_new_neo4j_graph(disease, delete_graph)
         for output in pipe_outputs:
-            if self.logger:
-                self.logger.info('*** Start processing output for pipe \'{p}\'. ***'.format(p=output.pipe))
-            for node_table in output.node_tables:
-                try:
-                    self.upload_nodetable(node_table)
-                    if self.logger:
-                        self.logger.info('Successfully uploaded node table \'{nt}\'.'.format(nt=node_table.name))
-                except Exception as ex:
-                    if self.logger:
-                        self.logger.error('Failed upload for node table \'{n}\' with {ex}'.format(
-                            n=node_table.name, ex=ex))
-                    raise RuntimeError(ex)
+            self.upload_pipe_output(output)
+        self.update_reachability(disease)
+
+    def upload_pipe_output(self, output):
+        """
+        Method uploads all node tables of one pipe output. The node tables are uploaded in their order, because later
+        tables of a pipe can relate to nodes of previous tables.
+
+        :param output: pymedgraph.dataextraction.basepipe.PipeOutput
+        """
+        if self.logger:
+            self.logger.info('*** Start processing output for pipe \'{p}\'. ***'.format(p=output.pipe))
+        for node_table in output.node_tables:
+            try:
+                self.upload_nodetable(node_table)
+                if node_table.meta['source_node'] == 'SearchTerm':
+                    self.record_search_term_build(node_table)
+                if self.logger:
+                    self.logger.info('Successfully uploaded node table \'{nt}\'.'.format(nt=node_table.name))
+            except Exception as ex:
+                if self.logger:
+                    self.logger.error('Failed upload for node table \'{n}\' with {ex}'.format(
+                        n=node_table.name, ex=ex))
+                raise RuntimeError(ex)
 
     def upload_nodetable(self, node_table):
         """
@@ -62,53 +127,131 @@ class Neo4jConnector(object):
         3. Building a query string for the node relations with `Neo4jBuilder._create_node_relation_query`
         4. Passing the query to upload data `Neo4jBuilder.insert_data`
 
+        In `single_pass` mode nodes and relations are uploaded together with the query of
+        `Neo4jBuilder._create_node_upsert_query`. The rows are grouped by node first, so each node is sent once with
+        the list of its source ids, see `Neo4jConnector._group_sources()`.
+
+        Tables with multiple node labels are split by label once, before the upload.
+
+        If a `manifest` is set, the rows are compared with the hashes of the uploaded nodes and the uploaded relations
+        first, and only new or changed nodes and missing relations are sent, see
+        `pymedgraph.graph.uploadmanifest.UploadManifest`.
+
         :param node_table: pymedgraph.dataextraction.basepipe.NodeTable
         """
-        # determine if node table contains multiple node labels
-        if isinstance(node_table.meta['node_label'], list):
-            for node_label in node_table.meta['node_label']:
-                # get query for table
-                query = self._create_node_query(node_table.meta, node_label)
-                # do upload
+        self.ensure_indexes([node_table])
+        meta = node_table.meta
+        if not meta['source_column'] or not meta['source_node']:
+            source_nodes = list()
+        elif isinstance(meta['source_node'], list):
+            source_nodes = meta['source_node']
+        else:
+            source_nodes = [meta['source_node']]
+        multi_label = isinstance(meta['node_label'], list)
+
+        for node_label, df in self._label_groups(node_table):
+            name = f'{node_table.name}:{node_label}' if multi_label else node_table.name
+            diff = None
+            nodes, relations = df.drop_duplicates(subset=[meta['id_attribute']]), df
+            if self.manifest is not None:
+                with measure(f'{name}:diff', kind='diff', rows_in=len(df)) as m:
+                    diff = self.manifest.diff(df, meta, node_label, source_nodes)
+                    df, nodes, relations = diff['rows'], diff['nodes'], diff['relations']
+                    m.rows_out = len(df)
+                if self.logger:
+                    self.logger.info(f'Upload manifest: {len(df)} of {m.rows_in} rows of \'{name}\' changed.')
+            if self.single_pass:
+                if source_nodes:
+                    rows, columns = self._group_sources(df, meta), self._node_columns(meta) + ['sources']
+                else:
+                    rows, columns = nodes, self._node_columns(meta)
                 self.insert_data(
-                    query,
-                    self.filter_node_data(node_table, filter_label=node_label, drop_duplicates=True)
+                    self._create_node_upsert_query(meta, node_label, source_nodes), rows, name=f'{name}:upsert',
+                    columns=columns, parallel=not source_nodes
                 )
-                if isinstance(node_table.meta['source_node'], list):
-                    for source_node in node_table.meta['source_node']:
-                        # get query for relations
-                        query = self._create_node_relation_query(node_table.meta, node_label, source_node)
-                        # do upload
-                        self.insert_data(
-                            query,
-                            self.filter_node_data(node_table, filter_label=node_label, drop_duplicates=False)
-                        )
-                else:
-                    query = self._create_node_relation_query(
-                        node_table.meta, node_label, node_table.meta['source_node']
-                    )
-                    # do upload
-                    self.insert_data(
-                        query,
-                        self.filter_node_data(node_table, filter_label=node_label, drop_duplicates=False)
-                    )
-        else:
-            # get query for table
-            query = self._create_node_query(node_table.meta, node_table.meta['node_label'])
-            # do upload
-            self.insert_data(query, self.filter_node_data(node_table, drop_duplicates=True))
-            if isinstance(node_table.meta['source_node'], list):
-                for source_node in node_table.meta['source_node']:
-                    # get query for relations
-                    query = self._create_node_relation_query(node_table.meta, node_table.meta['node_label'], source_node)
-                    # do upload
-                    self.insert_data(query, self.filter_node_data(node_table))
             else:
-                query = self._create_node_relation_query(
-                    node_table.meta, node_table.meta['node_label'], node_table.meta['source_node']
+                # upload nodes
+                self.insert_data(
+                    self._create_node_query(meta, node_label), nodes, name=f'{name}:nodes',
+                    columns=self._node_columns(meta), parallel=True
                 )
-                # do upload
-                self.insert_data(query, node_table.data)
+                # upload relations to each source node label
+                for source_node in source_nodes:
+                    self.insert_data(
+                        self._create_node_relation_query(meta, node_label, source_node), relations,
+                        name=f'{name}:relations', columns=self._relation_columns(meta)
+                    )
+            if diff is not None:
+                self.manifest.commit(diff)
+
+    @staticmethod
+    def _group_sources(df: pd.DataFrame, meta: dict) -> pd.DataFrame:
+        """
+        Method groups the rows of a table by node for `Neo4jConnector._create_node_upsert_query()`. The returned table
+        has one row per id attribute with the node attributes of its first row and the list of unique source ids in
+        column `sources`.
+        """
+        id_col = meta['id_attribute']
+        attribute_cols = [c for c in Neo4jConnector._node_columns(meta) if c != id_col]
+        df = df.drop_duplicates(subset=[id_col, meta['source_column']])
+        grouped = df.groupby(id_col, sort=False)
+        rows = grouped[attribute_cols].first() if attribute_cols else pd.DataFrame(index=grouped.size().index)
+        rows['sources'] = grouped[meta['source_column']].agg(list)
+        return rows.reset_index()
+
+    @staticmethod
+    def _label_groups(node_table) -> list:
+        """ Returns list of (node label, rows of label) in the label order of the table meta """
+        if not isinstance(node_table.meta['node_label'], list):
+            return [(node_table.meta['node_label'], node_table.data)]
+        groups = dict(tuple(node_table.data.groupby('node_label', observed=True, sort=False)))
+        return [(label, groups[label]) for label in node_table.meta['node_label'] if label in groups]
+
+    def ensure_indexes(self, node_tables: list):
+        """
+        Method creates the indexes for the keys used by the upload queries of the node tables, if they do not exist
+        yet. Without index every MERGE and MATCH scans all nodes of a label, so uploads get slower with the size of the
+        graph.
+
+        - node key (`node_label`, `id_attribute`): index, or uniqueness constraint if `unique_constraints` is set
+        - source key (`source_node`, `source_node_attr`): index, unless it is a node key with constraint
+
+        Each pair is only provisioned once per connector. If a uniqueness constraint cannot be created (e.g. because
+        the graph already contains duplicated keys), an index is created instead.
+
+        :param node_tables: list - pymedgraph.dataextraction.basepipe.NodeTable objects
+        """
+        for node_table in node_tables:
+            meta = node_table.meta
+            labels = meta['node_label'] if isinstance(meta['node_label'], list) else [meta['node_label']]
+            for label in labels:
+                self._ensure_index(label, meta['id_attribute'], unique=self.unique_constraints)
+            if meta['source_node'] and meta['source_node_attr']:
+                sources = meta['source_node'] if isinstance(meta['source_node'], list) else [meta['source_node']]
+                for source in sources:
+                    self._ensure_index(source, meta['source_node_attr'])
+
+    def _ensure_index(self, label: str, attribute: str, unique: bool = False):
+        if (label, attribute) in self._indexed:
+            return
+        name = f'{label}_{attribute}'.lower()
+        response = None
+        if unique:
+            response = self.query(
+                f'CREATE CONSTRAINT {name}_unique IF NOT EXISTS FOR (n:{label}) REQUIRE n.{attribute} IS UNIQUE', None
+            )
+            if response is None and self.logger:
+                self.logger.warning(f'Could not create uniqueness constraint for {label}.{attribute}, creating index.')
+        if response is None:
+            response = self.query(f'CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{attribute})', None)
+        if response is None:
+            # upload still works, but without index
+            if self.logger:
+                self.logger.error(f'Failed to create index for {label}.{attribute}.')
+            return
+        self._indexed.add((label, attribute))
+        if self.logger:
+            self.logger.info(f'Ensured {"constraint" if unique else "index"} for {label}.{attribute}.')
 
     @staticmethod
     def filter_node_data(node_table, filter_label=None, drop_duplicates=False) -> pd.DataFrame:
@@ -128,6 +271,20 @@ class Neo4jConnector(object):
             df = df.drop_duplicates(subset=[node_table.meta['id_attribute']])
         return df
 
+    @staticmethod
+    def _node_columns(node_table_meta: dict) -> list:
+        """ Returns columns referenced by `Neo4jConnector._create_node_query()` """
+        cols = [node_table_meta['id_attribute']]
+        if node_table_meta['attribute_cols']:
+            cols += [c for c in node_table_meta['attribute_cols'] if c not in cols]
+        return cols
+
+    @staticmethod
+    def _relation_columns(node_table_meta: dict) -> list:
+        """ Returns columns referenced by `Neo4jConnector._create_node_relation_query()` """
+        cols = [node_table_meta['source_column'], node_table_meta['id_attribute']]
+        return list(dict.fromkeys(c for c in cols if c))
+
     @staticmethod
     def _create_node_query(node_table_meta: dict, node_label: str) -> str:
         """
@@ -140,28 +297,32 @@ class Neo4jConnector(object):
         *** NOTE ***
             We us `MERGE` instead of `CREATE` in the Cypher query to avoid duplicates!
             This way the node is only going to be created, if it does not already exist`s.
+            The MERGE only matches the id attribute, which is indexed (see `Neo4jConnector.ensure_indexes()`), the
+            other attributes are set afterwards. This way a node with changed attributes is updated instead of
+            duplicated.
         ** END NOTE ***
 
         :param node_table_meta: dict - (pymedgraph.dataextraction.basepipe.NodeTable.meta) meta information about table,
          such as attribute columns and id
         :param node_label: str - Label of node, which will be created. E.g. "Gene" or "Paper" or "DISEASE"
         """
-        # collect columns
-        attribute_cols = [node_table_meta['id_attribute']]
-        if node_table_meta['attribute_cols']:
-            attribute_cols += node_table_meta['attribute_cols']
-        # build string for node attributes
-        node_attr_string = ''
-        for i, col in enumerate(attribute_cols):
-            node_attr_string += f'{col}: row.{col}'
-            if i + 1 != len(attribute_cols):
-                node_attr_string += ', '
-        # build node string
-        node_string = 'MERGE (n: {n} {{{attr}}})'.format(n=node_label, attr=node_attr_string)
         # build final query
-        query = 'UNWIND $rows AS row ' + node_string + ' RETURN count(*) as total'
+        query = 'UNWIND $rows AS row ' + Neo4jConnector._node_merge_clause(node_table_meta, node_label) + \
+                ' RETURN count(*) as total'
         return query
 
+    @staticmethod
+    def _node_merge_clause(node_table_meta: dict, node_label: str) -> str:
+        """ Returns MERGE clause of node `n` on its id attribute, which sets the other attributes """
+        id_col = node_table_meta['id_attribute']
+        # collect attribute columns
+        attribute_cols = [c for c in (node_table_meta['attribute_cols'] or []) if c != id_col]
+        # build node string
+        node_string = 'MERGE (n: {n} {{{id}: row.{id}}})'.format(n=node_label, id=id_col)
+        if attribute_cols:
+            node_string += ' SET ' + ', '.join(f'n.{col} = row.{col}' for col in attribute_cols)
+        return node_string
+
     @staticmethod
     def _create_node_relation_query(node_table_meta: dict, node_label: str, source_node_label: str):
         """
@@ -183,40 +344,84 @@ class Neo4jConnector(object):
         :param node_label: str - label of node, which was created
         :param source_node_label: str - label of source node, which is already in the database
          """
-        match_query = 'MATCH (a: {A}), (b: {B})'.format(A=source_node_label, B=node_label)
-        where_query = 'WHERE a.{a_attr} = row.{a_col} AND b.{b_attr_col} = row.{b_attr_col}'.format(
-            a_attr=node_table_meta['source_node_attr'], a_col=node_table_meta['source_column'],
-            b_attr_col=node_table_meta['id_attribute']
+        # two separate MATCH clauses on the indexed keys, instead of a filtered cartesian product
+        match_query = 'MATCH (a: {A} {{{a_attr}: row.{a_col}}}) MATCH (b: {B} {{{b_attr}: row.{b_attr}}})'.format(
+            A=source_node_label, a_attr=node_table_meta['source_node_attr'], a_col=node_table_meta['source_column'],
+            B=node_label, b_attr=node_table_meta['id_attribute']
         )
-        query = 'UNWIND $rows AS row ' + match_query + ' ' + where_query + \
-                ' MERGE (a)-[:CONTAINS]->(b) RETURN count(*) as total'
+        query = 'UNWIND $rows AS row ' + match_query + ' MERGE (a)-[:CONTAINS]->(b) RETURN count(*) as total'
         return query
 
-    def insert_data(self, query: str, rows: pd.DataFrame, batch_size: int = 2000):
+    @staticmethod
+    def _create_node_upsert_query(node_table_meta: dict, node_label: str, source_node_labels: list) -> str:
         """
-        Wrapper method to call `Neo4jBuilder.query()` in batches to upload data to neo4j instance.
+        Build query to upload nodes together with their relations to the source nodes in one pass.
+
+        Each row contains one node and the list of its source ids in `sources`, see
+        `Neo4jConnector._group_sources()`. The node is merged on its id attribute as in
+        `Neo4jConnector._create_node_query()`. Afterwards for each source id the source node of each source label is
+        looked up by its key and the relation is merged, if the source node exists, e.g.
+
+            UNWIND $rows AS row MERGE (n: UMLS {CUI: row.CUI}) SET n.name = row.name
+            WITH n, row UNWIND row.sources AS source
+            WITH n, source OPTIONAL MATCH (a0: DISEASE {text: source})
+            FOREACH (_ IN CASE WHEN a0 IS NULL THEN [] ELSE [1] END | MERGE (a0)-[:CONTAINS]->(n))
+            RETURN count(*) as total
+
+        :param node_table_meta: dict - (pymedgraph.dataextraction.basepipe.NodeTable.meta)
+        :param node_label: str - label of node
+        :param source_node_labels: list - labels of source nodes, can be empty
+        """
+        query = 'UNWIND $rows AS row ' + Neo4jConnector._node_merge_clause(node_table_meta, node_label)
+        if source_node_labels:
+            query += ' WITH n, row UNWIND row.sources AS source'
+        for i, source_node_label in enumerate(source_node_labels):
+            query += (
+                ' WITH n, source OPTIONAL MATCH (a{i}: {A} {{{a_attr}: source}})'
+                ' FOREACH (_ IN CASE WHEN a{i} IS NULL THEN [] ELSE [1] END | MERGE (a{i})-[:CONTAINS]->(n))'
+            ).format(i=i, A=source_node_label, a_attr=node_table_meta['source_node_attr'])
+        return query + ' RETURN count(*) as total'
+
+    def insert_data(self, query: str, rows: pd.DataFrame, batch_size: int = 2000, name: str = None,
+                    columns: list = None, parallel: bool = False):
+        """
+        Wrapper method to call `Neo4jBuilder.query()` in batches to upload data to neo4j instance. If a `writer` is
+        configured, the rows are written by `pymedgraph.graph.batchwriter.BatchWriter.write()` instead.
+        Raises a RuntimeError if a batch fails.
 
         :param query: str - query must contain UNWIND statement and
         :param rows: pd.DataFrame - contains either nodes + attributes or node relations
         :param batch_size: int - size of batch to be uploaded per session
+        :param name: str - name of upload step in `pymedgraph.metrics`, e.g. 'Genes:nodes'
+        :param columns: list - columns referenced by the query, only these are sent to neo4j. Default are all columns
+        :param parallel: bool - flag if the batches do not conflict, e.g. MERGE of deduplicated nodes, and can be
+        written concurrently by the writer
         """
+        if self.writer is not None:
+            return self.writer.write(query, rows, columns=columns, name=name, parallel=parallel)
         total = 0
         batch = 0
         start = time.time()
         result = None
 
-        while batch * batch_size < len(rows):
-            res = self.query(
-                query,
-                parameters={'rows': rows[batch * batch_size:(batch + 1) * batch_size].to_dict('records')})
-            total += res[0]['total']
-            batch += 1
-            result = {"total": total,
-                      "batches": batch,
-                      "time": time.time() - start}
-            if self.logger:
-                self.logger.info('Successfully uploaded data: {r}'.format(r=result))
-            print(result)
+        with measure(name or 'insert_data', kind='upload', rows_in=len(rows)) as m:
+            while batch * batch_size < len(rows):
+                res = self.query(
+                    query,
+                    parameters={'rows': to_records(rows.iloc[batch * batch_size:(batch + 1) * batch_size], columns)})
+                if not res:
+                    raise RuntimeError(f'Upload of \'{name}\' failed in batch {batch}.')
+                total += res[0]['total']
+                batch += 1
+                elapsed = time.time() - start
+                result = {"total": total,
+                          "batches": batch,
+                          "time": elapsed,
+                          "rows_per_second": min(len(rows), batch * batch_size) / elapsed if elapsed > 0 else None}
+                if self.logger:
+                    self.logger.info('Successfully uploaded data: {r}'.format(r=result))
+                print(result)
+            m.rows_out = total
 
         return result
 
@@ -241,79 +446,604 @@ class Neo4jConnector(object):
                 session.close()
         return response
 
-    def _init_new_neo4j_graph(self, disease: str, delete_existing_graph=True):
-        """ Method deletes graph and build new node for disease """
+    def _init_new_neo4j_graph(self, disease: str or list, delete_existing_graph=True):
+        """ Method deletes graph and build new node for disease, or one node per disease if a list is passed """
         if delete_existing_graph:
-            delete_query = "MATCH (n) DETACH DELETE n"
-            response = self.query(delete_query, None)
-            if self.logger:
-                self.logger.info('Successfully deleted existing graph.')
-            print(response)
-        init_query = "MERGE (st:SearchTerm {label: $disease})"
-        response = self.query(init_query, {'disease': disease})
+            self.delete_graph()
+        self._ensure_index('SearchTerm', 'label', unique=self.unique_constraints)
+        if isinstance(disease, list):
+            init_query = "UNWIND $diseases AS disease MERGE (st:SearchTerm {label: disease})"
+            response = self.query(init_query, {'diseases': disease})
+        else:
+            init_query = "MERGE (st:SearchTerm {label: $disease})"
+            response = self.query(init_query, {'disease': disease})
         print(response)
+        if self.registry is not None:
+            self.registry.add(disease if isinstance(disease, list) else [disease])
+        if self.manifest is not None:
+            self.manifest.add_nodes('SearchTerm', 'label', disease if isinstance(disease, list) else [disease])
         if self.logger:
             self.logger.info(f'Successfully initiated graph with search term \'{disease}\'')
 
+    def delete_graph(self, batch_size: int = 10000) -> dict:
+        """
+        Method deletes all nodes of the graph in batches of `batch_size` nodes. Each batch is its own transaction, so
+        the delete of a large graph does not need the whole graph in the transaction state and does not block writers
+        until it is done. The version counter of the `SearchTermRegistry` is kept, so other processes notice the delete.
+
+        :param batch_size: int - number of nodes deleted per transaction
+        :return: dict - number of deleted nodes, batches, time and nodes per second
+        """
+        query = 'MATCH (n) WHERE NOT n:GraphVersion WITH n LIMIT $limit DETACH DELETE n RETURN count(*) AS total'
+        start = time.time()
+        deleted, batches = 0, 0
+        with measure('delete_graph', kind='delete') as m:
+            while True:
+                response = self.query(query, {'limit': batch_size})
+                if response is None:
+                    raise RuntimeError(f'Delete of graph failed after {deleted} nodes.')
+                total = response[0]['total'] if response else 0
+                if not total:
+                    break
+                deleted += total
+                batches += 1
+                if self.logger:
+                    self.logger.info('Deleted {n} nodes of graph ({r:.0f} nodes/s).'.format(
+                        n=deleted, r=deleted / max(time.time() - start, 1e-9)
+                    ))
+            m.rows_out = deleted
+        self.reachability.clear()
+        if self.registry is not None:
+            self.registry.clear()
+        if self.manifest is not None:
+            self.manifest.clear()
+        return self._delete_result(deleted, batches, start)
+
+    def delete_search_term(self, term: str, batch_size: int = 10000) -> dict:
+        """
+        Method deletes the SearchTerm node of `term` and all nodes, which can only be reached from it. Nodes, which are
+        also related to a node outside of the subgraph of the term (e.g. a Gene found for another search term), are kept
+        with all nodes below them.
+
+        The nodes are collected level by level along the `CONTAINS` relations first, then they are deleted in batches
+        of `batch_size` nodes, each batch in its own transaction.
+
+        :param term: str - label of SearchTerm node
+        :param batch_size: int - number of nodes per lookup and per delete transaction
+        :return: dict - number of deleted and kept nodes, batches, time and nodes per second
+        """
+        start = time.time()
+        # search terms are not used as metric names, each term would add a series to `/metrics`
+        with measure('delete_search_term', kind='delete') as m:
+            # 1. collect subgraph of search term, parent id -> child ids
+            root, parents, child_ids, _ = self._collect_subgraph(term, batch_size)
+            children = dict()
+            reachable = dict()
+            for parent, child in zip(parents, child_ids):
+                children.setdefault(parent, list()).append(child)
+                reachable[child] = None
+
+            # 2. keep nodes with a parent outside of the subgraph and all nodes below them
+            stack = [
+                r['child'] for r in self._query_ids(
+                    'UNWIND $ids AS i MATCH (p)-[:CONTAINS]->(n) WHERE id(n) = i RETURN id(p) AS parent, i AS child',
+                    list(reachable), batch_size
+                ) if r['parent'] != root and r['parent'] not in reachable
+            ]
+            kept = set()
+            while stack:
+                node = stack.pop()
+                if node in kept:
+                    continue
+                kept.add(node)
+                stack.extend(children.get(node, []))
+
+            # 3. delete in batches
+            ids = [n for n in reachable if n not in kept] + [root]
+            query = 'UNWIND $ids AS i MATCH (n) WHERE id(n) = i DETACH DELETE n RETURN count(*) AS total'
+            deleted, batches = 0, 0
+            for i in range(0, len(ids), batch_size):
+                response = self.query(query, {'ids': ids[i:i + batch_size]})
+                if response is None:
+                    raise RuntimeError(f'Delete of search term \'{term}\' failed after {deleted} nodes.')
+                deleted += response[0]['total'] if response else 0
+                batches += 1
+                if self.logger:
+                    self.logger.info('Deleted {n}/{t} nodes of search term \'{term}\' ({r:.0f} nodes/s).'.format(
+                        n=deleted, t=len(ids), term=term, r=deleted / max(time.time() - start, 1e-9)
+                    ))
+            m.rows_in = len(reachable) + 1
+            m.rows_out = deleted
+        # deleted nodes were only reachable from this search term
+        self.reachability.remove(term)
+        if self.registry is not None:
+            self.registry.remove(term)
+        # the keys of the deleted nodes are not known, all nodes are uploaded again
+        if self.manifest is not None:
+            self.manifest.clear()
+        result = self._delete_result(deleted, batches, start)
+        result['kept'] = len(kept)
+        return result
+
+    def update_reachability(self, search_terms: str or list, propagate: bool = True, batch_size: int = 10000) -> list:
+        """
+        Method collects the nodes reachable from the search terms and stores them in the `ReachabilityIndex`, which is
+        used by `Neo4jConnector.get_intersection()`. Is called after the upload of a build, the nodes added below nodes
+        of other search terms are added to these search terms, too. Search terms, which could not be collected, are
+        marked as stale and collected again on their next use.
+
+        :param search_terms: str or list - search term(s)
+        :param propagate: bool - flag to update other search terms, see `ReachabilityIndex.update()`
+        :param batch_size: int - number of node ids per query
+        :return: list - search terms, which could not be collected
+        """
+        failed = list()
+        for term in [search_terms] if isinstance(search_terms, str) else search_terms:
+            try:
+                with measure('reachability', kind='index') as m:
+                    root, parents, children, labels = self._collect_subgraph(
+                        term, batch_size, max(self.GRAPH_LEVEL_LIMIT.values())
+                    )
+                    self.reachability.update(term, root, parents, children, labels, propagate=propagate)
+                    m.rows_out = len(parents)
+                if self.logger:
+                    self.logger.info(f'Collected {len(parents)} relations of search term \'{term}\'.')
+            except RuntimeError as ex:
+                if self.logger:
+                    self.logger.error(f'Reachability of search term \'{term}\' failed: {ex}')
+                failed.append(term)
+        if failed:
+            # other search terms may miss nodes added below their nodes
+            self.reachability.invalidate(None if propagate else failed)
+        if self.registry is not None:
+            # the own writes are in the index now, the version counter is not queried again
+            self.reachability.sync(self.registry.version, self.registry.changed_version)
+        return failed
+
+    def _sync_reachability(self):
+        """ Marks the search terms of the `ReachabilityIndex` as stale, if another process changed the graph """
+        if self.registry is not None:
+            # checks the version counter at most every `check_interval` seconds
+            self.registry.terms()
+            self.reachability.sync(self.registry.version, self.registry.changed_version)
+
+    def _collect_subgraph(self, term: str, batch_size: int = 10000, max_depth: int = None) -> tuple:
+        """
+        Method collects the subgraph of a search term level by level along the `CONTAINS` relations. Raises a
+        RuntimeError if the search term is not in the graph.
+
+        :param term: str - label of SearchTerm node
+        :param batch_size: int - number of node ids per query
+        :param max_depth: int - number of levels, all levels if None
+        :return: tuple - (node id of SearchTerm node, node ids of the start nodes of the relations, node ids of the end
+        nodes and labels of the end nodes)
+        """
+        root = self._search_term_id(term)
+        parents, children, labels = list(), list(), list()
+        visited = {root}
+        frontier = [root]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            next_frontier = list()
+            for r in self._query_ids(
+                'UNWIND $ids AS i MATCH (a)-[:CONTAINS]->(n) WHERE id(a) = i '
+                'RETURN i AS parent, id(n) AS child, labels(n)[0] AS label',
+                frontier, batch_size
+            ):
+                parents.append(r['parent'])
+                children.append(r['child'])
+                labels.append(r['label'])
+                if r['child'] not in visited:
+                    visited.add(r['child'])
+                    next_frontier.append(r['child'])
+            frontier = next_frontier
+            depth += 1
+        return root, parents, children, labels
+
+    def _search_term_id(self, term: str) -> int:
+        """ Returns node id of the SearchTerm node, raises a RuntimeError if the search term is not in the graph """
+        response = self.query('MATCH (s:SearchTerm {label: $term}) RETURN id(s) AS id', {'term': term})
+        if not response:
+            msg = f'Search term \'{term}\' is not in Knowledge Graph.'
+            if self.logger:
+                self.logger.error(msg)
+            raise RuntimeError(msg)
+        return response[0]['id']
+
+    def _query_ids(self, query: str, ids: list, batch_size: int) -> list:
+        """ Sends query with the node ids as parameter `$ids` in batches and returns all records """
+        records = list()
+        for i in range(0, len(ids), batch_size):
+            response = self.query(query, {'ids': ids[i:i + batch_size]})
+            if response is None:
+                raise RuntimeError(f'Query failed: \'{query}\'')
+            records.extend(response)
+        return records
+
+    def _delete_result(self, deleted: int, batches: int, start: float) -> dict:
+        duration = time.time() - start
+        result = {
+            'deleted': deleted, 'batches': batches, 'time': duration,
+            'nodes_per_second': deleted / duration if duration > 0 else 0.
+        }
+        if self.logger:
+            self.logger.info('Deleted {n} nodes in {b} batches and {t:.2f}s.'.format(n=deleted, b=batches, t=duration))
+        return result
+
+    def export_snapshot(self, path: str, search_terms: list = None, batch_size: int = 10000) -> dict:
+        """
+        Method exports all nodes and relations reachable from search terms to a snapshot directory, see
+        `pymedgraph.graph.snapshot.SnapshotWriter`. The node properties and relations are read and written in batches,
+        only the node ids of the subgraphs are kept in memory.
+
+        :param path: str - snapshot directory
+        :param search_terms: list - search terms to export, all search terms if None
+        :param batch_size: int - number of node ids per query
+        :return: dict - manifest of the snapshot with counts, time and nodes_per_second
+        """
+        search_terms = list(search_terms) if search_terms else self.get_search_terms()
+        node_ids, parent_ids = list(), list()
+        for term in search_terms:
+            root, parents, children, _ = self._collect_subgraph(term, batch_size)
+            node_ids += [np.array([root], dtype=np.int64), np.asarray(children, dtype=np.int64)]
+            parent_ids.append(np.asarray(parents, dtype=np.int64))
+        node_ids = np.unique(np.concatenate(node_ids)).tolist() if node_ids else list()
+        parent_ids = np.unique(np.concatenate(parent_ids)).tolist() if parent_ids else list()
+
+        writer = SnapshotWriter(path, logger=self.logger)
+        with measure('snapshot_export', kind='snapshot', rows_in=len(node_ids)) as m:
+            for i in range(0, len(node_ids), batch_size):
+                labels = dict()
+                for label, properties in self._snapshot_nodes(node_ids[i:i + batch_size]):
+                    labels.setdefault(label, list()).append(properties)
+                for label, rows in labels.items():
+                    writer.add_nodes(label, self.NODE_KEYS.get(label, 'text'), rows)
+                    m.rows_out += len(rows)
+            for i in range(0, len(parent_ids), batch_size):
+                writer.add_relations(self._snapshot_relations(parent_ids[i:i + batch_size]))
+        return writer.finish(search_terms)
+
+    def import_snapshot(self, path: str, batch_size: int = 10000) -> dict:
+        """
+        Method imports a snapshot of `Neo4jConnector.export_snapshot()` in batches. Nodes are merged on their key
+        attribute and get all properties of the snapshot, relations are merged between existing nodes. The graph can
+        contain other nodes, e.g. a snapshot of one search term can be imported into the graph of another environment.
+
+        :param path: str - snapshot directory
+        :param batch_size: int - number of rows per query
+        :return: dict - nodes, relationships, time and nodes_per_second
+        """
+        start = time.time()
+        reader = SnapshotReader(path)
+        nodes, relations = 0, 0
+        with measure('snapshot_import', kind='snapshot') as m:
+            for label, key, rows in reader.nodes(batch_size):
+                self._ensure_index(label, key, unique=self.unique_constraints)
+                nodes += self._snapshot_merge_nodes(label, key, rows)
+            keys = reader.manifest['keys']
+            for rows in reader.relations(batch_size):
+                groups = dict()
+                for row in rows:
+                    groups.setdefault((row['start_label'], row['end_label']), list()).append(row)
+                for (start_label, end_label), group in groups.items():
+                    relations += self._snapshot_merge_relations(
+                        start_label, keys[start_label], end_label, keys[end_label], group
+                    )
+            m.rows_in = m.rows_out = nodes
+        # imported relations can extend the subgraphs of all search terms
+        self.reachability.invalidate()
+        if self.registry is not None:
+            self.registry.invalidate()
+        duration = time.time() - start
+        result = {
+            'nodes': nodes, 'relationships': relations, 'time': duration,
+            'nodes_per_second': nodes / duration if duration > 0 else None
+        }
+        if self.logger:
+            self.logger.info(f'Imported snapshot \'{path}\': {result}')
+        return result
+
+    def _snapshot_nodes(self, node_ids: list) -> list:
+        """ Returns (label, properties) of nodes """
+        return [(r['label'], r['properties']) for r in self._query_ids(
+            'UNWIND $ids AS i MATCH (n) WHERE id(n) = i RETURN labels(n)[0] AS label, properties(n) AS properties',
+            node_ids, len(node_ids)
+        )]
+
+    def _snapshot_relations(self, node_ids: list) -> list:
+        """ Returns label and key value of start and end node of the relations of nodes """
+        response = self.query(
+            'UNWIND $ids AS i MATCH (a)-[:CONTAINS]->(b) WHERE id(a) = i '
+            'RETURN labels(a)[0] AS start_label, a[coalesce($keys[labels(a)[0]], \'text\')] AS start_key, '
+            'labels(b)[0] AS end_label, b[coalesce($keys[labels(b)[0]], \'text\')] AS end_key',
+            {'ids': node_ids, 'keys': self.NODE_KEYS}
+        )
+        if response is None:
+            raise RuntimeError('Query of relations for snapshot failed.')
+        return [dict(r) for r in response]
+
+    def _snapshot_merge_nodes(self, label: str, key: str, rows: list) -> int:
+        query = f'UNWIND $rows AS row MERGE (n:{label} {{{key}: row.{key}}}) SET n += row RETURN count(*) AS total'
+        response = self.query(query, {'rows': rows})
+        if not response:
+            raise RuntimeError(f'Import of \'{label}\' nodes failed.')
+        return response[0]['total']
+
+    def _snapshot_merge_relations(self, start_label: str, start_key: str, end_label: str, end_key: str,
+                                  rows: list) -> int:
+        query = (
+            f'UNWIND $rows AS row MATCH (a:{start_label} {{{start_key}: row.start_key}}) '
+            f'MATCH (b:{end_label} {{{end_key}: row.end_key}}) MERGE (a)-[:CONTAINS]->(b) RETURN count(*) AS total'
+        )
+        response = self.query(query, {'rows': rows})
+        if response is None:
+            raise RuntimeError(f'Import of relations {start_label} -> {end_label} failed.')
+        return response[0]['total'] if response else 0
+
+    def record_search_term_build(self, node_table):
+        """
+        Method stores the build time on the SearchTerm nodes of the uploaded nodes. This is used by incremental
+        refreshes to fetch only new articles, see `Neo4jConnector.get_search_term_state()`. The ingested ids are not
+        stored, they are read from the relations of the SearchTerm node.
+
+        :param node_table: pymedgraph.dataextraction.basepipe.NodeTable - table with `source_node` SearchTerm
+        """
+        terms = node_table.data[node_table.meta['source_column']].drop_duplicates().tolist()
+        query = (
+            'UNWIND $terms AS term MATCH (s:SearchTerm {label: term}) SET s.last_build = $build_time '
+            'RETURN s.label AS label, size([(s)-[:CONTAINS]->() | 1]) AS nodes, s.last_build AS last_build'
+        )
+        response = self.query(query, {'terms': terms, 'build_time': time.time()})
+        if self.registry is not None:
+            for r in response or list():
+                self.registry.set_build(r['label'], r['nodes'], r['last_build'])
+
+    def get_search_term_state(self, disease: str, id_attribute: str = 'pubmedID') -> dict or None:
+        """
+        Method returns the ingested ids, i.e. the ids of the nodes directly related to the SearchTerm node, and the time
+        of the last build of a search term.
+
+        :param disease: str - name of search term
+        :param id_attribute: str - id attribute of the nodes directly related to the SearchTerm node
+        :return: dict - {'ids': list, 'last_build': float or None} or None, if search term is not in graph
+        """
+        query = (
+            'MATCH (s:SearchTerm {{label: $disease}}) OPTIONAL MATCH (s)-[:CONTAINS]->(n) WHERE n.{id} IS NOT NULL '
+            'RETURN collect(n.{id}) AS ids, s.last_build AS last_build'
+        ).format(id=id_attribute)
+        result = self.query(query, {'disease': disease})
+        if not result:
+            return None
+        return {'ids': result[0]['ids'] or list(), 'last_build': result[0]['last_build']}
+
     def get_search_terms(self) -> list:
-        """ Method to get existing Nodes with SearchTerm label in neo4j instance """
+        """ Method to get existing Nodes with SearchTerm label, from the `SearchTermRegistry` cache if it is set """
+        if self.registry is not None:
+            return self.registry.terms()
         query_string = "MATCH (s:SearchTerm) RETURN s"
         result = self.query(query_string, None)
-        search_terms =  [r.get('s').get('label') for r in result]
+        search_terms = [r.get('s').get('label') for r in result]
         if self.logger:
             self.logger.info(f'Neo4j Request with query \'{query_string}\' and response: {search_terms}')
         return search_terms
 
+    def get_search_term_info(self) -> list:
+        """ Method returns label, number of directly related nodes and last build time of the SearchTerm nodes """
+        if self.registry is not None:
+            return self.registry.info()
+        result = self.query(SearchTermRegistry.LOAD_QUERY, None)
+        return [{'label': r['label'], 'nodes': r['nodes'], 'last_build': r['last_build']} for r in result or list()]
+
     def get_intersection(self, search_terms: str, level: str) -> tuple:
         """
-        Method to make send query to neo4j instance, which calculates the node intersection between the given search
-        terms on the given level.
+        Method calculates the node intersection between the given search terms on the given level. The counts are set
+        operations on the nodes reachable from each search term, see `Neo4jConnector.update_reachability()`.
         :param search_terms: str - comma seperated list of terms e.g. -> 'hepatitis,follicular lymphoma,...'
         :param level: str - name of knowledge graph node label e.g. -> 'Gene'
         :return: tuple - (fail or success, results as json or error message)
         """
-        graph_level_limit = {
-            'DISEASE': 2,
-            'CHEMICAL': 2,
-            'UMLS': 3,
-            'Gene': 4,
-            'Protein': 5,
-            'SnomedConcept': 4,
-            'ClinicalFeature': 4,
-            'GO': 6
-        }
-        search_terms_in_db = self.get_search_terms()
         req_search_terms = search_terms.split(',')
-        if any([t for t in req_search_terms if t not in search_terms_in_db]):
+        msg = self._check_intersection_args(req_search_terms, self.get_search_terms(), level)
+        if msg:
+            return 'fail', msg
+        # collect search terms, which are not indexed yet or changed, e.g. built by another process
+        self._sync_reachability()
+        missing = self.reachability.missing(req_search_terms)
+        if missing and self.update_reachability(missing, propagate=False):
+            return 'fail', 'Reachable nodes of search terms could not be collected.'
+        return 'success', self._intersection_counts(req_search_terms, level)
+
+    def _check_intersection_args(self, search_terms: list, search_terms_in_db: list, level: str) -> str or None:
+        """ Returns error message, if a search term is not in the graph or the level is unknown """
+        if any([t for t in search_terms if t not in search_terms_in_db]):
             msg = 'Passed search term \'{term}\', which is not in Knowledge Graph.'.format(
-                term=[t for t in req_search_terms if t not in search_terms_in_db]
+                term=[t for t in search_terms if t not in search_terms_in_db]
             )
             if self.logger:
                 self.logger.error(msg)
-            return 'fail', msg
-        if level not in graph_level_limit.keys():
+            return msg
+        if level not in self.GRAPH_LEVEL_LIMIT.keys():
             msg = f'Passed unknown knwoledge graph label: {level}. Abort.'
             if self.logger:
                 self.logger.error(msg)
+            return msg
+        return None
+
+    def _intersection_counts(self, search_terms: list, level: str) -> str:
+        """ Returns intersection counts of indexed search terms as json records with keys e1, e2 and level """
+        df = pd.DataFrame(self.reachability.intersection_counts(search_terms, level), columns=['e1', 'e2', level])
+        return df.to_json(orient="records")
+
+    def get_intersection_matrix(self, search_terms: str or list, levels: str or list = None,
+                                approximate: bool = False) -> tuple:
+        """
+        Method calculates intersection, union and Jaccard matrices of the search terms for each level, see
+        `pymedgraph.graph.setalgebra.SetAlgebra`. Search terms are validated against the `ReachabilityIndex`, only
+        search terms missing in the index are looked up in neo4j.
+
+        :param search_terms: str or list - search terms, as list or comma seperated string
+        :param levels: str or list - node labels, as list or comma seperated string, all levels if None
+        :param approximate: bool - flag to estimate Jaccard similarity and intersection from the MinHash signatures
+        with error bounds instead, see `pymedgraph.graph.minhash.MinHashIndex.estimate()`
+        :return: tuple - (fail or success, dict with search terms and matrices per level or error message)
+        """
+        req_search_terms = search_terms.split(',') if isinstance(search_terms, str) else list(search_terms)
+        if levels is None:
+            levels = list(self.GRAPH_LEVEL_LIMIT)
+        elif isinstance(levels, str):
+            levels = levels.split(',')
+        msg = self._check_indexed(req_search_terms, levels)
+        if msg:
             return 'fail', msg
+        with measure('intersection_matrix', kind='query', rows_in=len(req_search_terms)):
+            if approximate:
+                matrices = {
+                    level: self.reachability.sketches.estimate(
+                        req_search_terms, level, [len(self.reachability.get(t, level)) for t in req_search_terms]
+                    ) for level in levels
+                }
+            else:
+                matrices = self.set_algebra.matrices(req_search_terms, levels)
+        return 'success', {'searchTerms': req_search_terms, 'levels': matrices}
 
-        cypher_query = """
-        WITH {st} AS list
-        UNWIND list AS ele1
-        MATCH (s:SearchTerm {{label: ele1}})-[*{n}]->(n:{la})
-        WITH collect(DISTINCT n) AS r1, ele1 AS ele1, list AS list
-        UNWIND list AS ele2
-        MATCH (s:SearchTerm {{label: ele2}})-[*{n}]->(n:{la})
-        WITH collect(DISTINCT n) AS r2, ele1 AS ele1, ele2 AS ele2, r1 AS r1
-        RETURN ele1, ele2, size(apoc.coll.intersection(r1, r2))
-        """.format(st=req_search_terms, n=graph_level_limit[level], la=level)
-        # send query to neo4j KnowledgeGraph
-        result = self.query(cypher_query, None)
-        if not result:
-            return 'fail', 'Cypher got no results..'
-        df = pd.DataFrame([dict(d) for d in result])
-        df.columns = ['e1', 'e2', level]
-        return 'success', df.to_json(orient="records")
+    def get_similar_search_terms(self, search_term: str, level: str, k: int = 10) -> tuple:
+        """
+        Method returns the `k` search terms with the most similar nodes on the given level, found with the LSH index
+        of the MinHash signatures, see `pymedgraph.graph.minhash.MinHashIndex.top_k()`.
+
+        :param search_term: str
+        :param level: str - name of knowledge graph node label e.g. -> 'Gene'
+        :param k: int - maximum number of search terms
+        :return: tuple - (fail or success, list of search terms with estimated Jaccard similarity or error message)
+        """
+        msg = self._check_indexed([search_term], [level])
+        if msg:
+            return 'fail', msg
+        # search terms built by another process have to be indexed first to be found
+        missing = self.reachability.missing([t for t in self.get_search_terms() if t != search_term])
+        if missing:
+            self.update_reachability(missing, propagate=False)
+        return 'success', [
+            {'searchTerm': term, 'jaccard': jaccard, 'jaccardError': round(self.reachability.sketches.error(), 6)}
+            for term, jaccard in self.reachability.sketches.top_k(search_term, level, k)
+        ]
+
+    def get_subgraph(self, search_term: str, level: str = None, cursor: str = None, limit: int = 10000,
+                     fetch_size: int = 1000) -> tuple:
+        """
+        Method returns a generator over one page of the subgraph of a search term, for the `/subgraph` endpoint. The
+        subgraph has the SearchTerm node and all nodes reachable from it, whose label is on `level` or above, see
+        `Neo4jConnector.GRAPH_LEVEL_LIMIT`. Labels without level (e.g. Paper) are always included.
+
+        The node ids are taken from the `ReachabilityIndex`, pages are ranges of sorted node ids. The nodes and their
+        relations are read in batches of `fetch_size` nodes while the generator is consumed, so neither the page nor
+        the subgraph are held in memory. The generator yields
+            {'type': 'node', 'id': int, 'label': str, 'properties': dict}
+            {'type': 'edge', 'start': int, 'end': int} - after its start node, if the end node is in the subgraph
+            {'type': 'page', 'nodes': int, 'edges': int, 'cursor': str or None} - last, cursor of the next page
+        Pages of a graph, which changes between the requests, can miss or repeat nodes.
+
+        :param search_term: str
+        :param level: str - name of knowledge graph node label e.g. -> 'Gene', all levels if None
+        :param cursor: str - cursor of the previous page, first page if None
+        :param limit: int - maximum number of nodes of the page
+        :param fetch_size: int - number of nodes per query and records fetched from neo4j at once
+        :return: tuple - (fail or success, generator or error message)
+        """
+        msg = self._check_indexed([search_term], [level] if level else list())
+        if msg:
+            return 'fail', msg
+        try:
+            after = int(cursor) if cursor else -1
+        except ValueError:
+            return 'fail', f'Invalid cursor \'{cursor}\'.'
+        depth = self.GRAPH_LEVEL_LIMIT[level] if level else max(self.GRAPH_LEVEL_LIMIT.values())
+        try:
+            root = self._search_term_id(search_term)
+        except RuntimeError as ex:
+            return 'fail', str(ex)
+        sets = [np.array([root], dtype=np.int64)] + [
+            self.reachability.get(search_term, label) for label in self.reachability.labels(search_term)
+            if self.GRAPH_LEVEL_LIMIT.get(label, 0) <= depth
+        ]
+        node_ids = np.unique(np.concatenate(sets))
+        page = node_ids[np.searchsorted(node_ids, after, side='right'):]
+        more = len(page) > limit
+        page = page[:limit]
+
+        def records():
+            n_edges = 0
+            with measure('subgraph', kind='query', rows_in=len(page)) as m:
+                for i in range(0, len(page), fetch_size):
+                    batch = page[i:i + fetch_size].tolist()
+                    for node_id, label, properties in self._subgraph_nodes(batch, fetch_size):
+                        yield {'type': 'node', 'id': node_id, 'label': label, 'properties': properties}
+                    for start, end in self._subgraph_edges(batch, fetch_size):
+                        pos = np.searchsorted(node_ids, end)
+                        if pos < len(node_ids) and node_ids[pos] == end:
+                            n_edges += 1
+                            yield {'type': 'edge', 'start': start, 'end': end}
+                m.rows_out = len(page) + n_edges
+            if self.logger:
+                self.logger.info(f'Streamed {len(page)} nodes and {n_edges} edges of search term \'{search_term}\'.')
+            yield {
+                'type': 'page', 'nodes': len(page), 'edges': n_edges,
+                'cursor': str(page[-1]) if more and len(page) else None
+            }
+
+        return 'success', records()
+
+    def _subgraph_nodes(self, node_ids: list, fetch_size: int):
+        """ Yields (id, label, properties) of nodes """
+        for r in self.stream(
+            'UNWIND $ids AS i MATCH (n) WHERE id(n) = i RETURN i AS id, labels(n)[0] AS label, '
+            'properties(n) AS properties', {'ids': node_ids}, fetch_size
+        ):
+            yield r['id'], r['label'], dict(r['properties'])
+
+    def _subgraph_edges(self, node_ids: list, fetch_size: int):
+        """ Yields (start id, end id) of the relations of nodes """
+        for r in self.stream(
+            'UNWIND $ids AS i MATCH (a)-[:CONTAINS]->(b) WHERE id(a) = i RETURN i AS start, id(b) AS end',
+            {'ids': node_ids}, fetch_size
+        ):
+            yield r['start'], r['end']
+
+    def stream(self, query: str, parameters: dict, fetch_size: int = 1000):
+        """
+        Method runs a query and yields its records. The driver fetches `fetch_size` records at once, so the result is
+        never held in memory as a whole. Raises a RuntimeError if the query fails.
+
+        :param query: str
+        :param parameters: dict
+        :param fetch_size: int - number of records per fetch
+        """
+        try:
+            with self.driver.session(fetch_size=fetch_size) as session:
+                for record in session.run(query, parameters):
+                    yield record
+        except Exception as ex:
+            if self.logger:
+                self.logger.error(f'Streamed query failed. query: \'{query}\'. {ex}')
+            raise RuntimeError(ex)
+
+    def _check_indexed(self, search_terms: list, levels: list) -> str or None:
+        """ Collects search terms missing in the `ReachabilityIndex`, returns error message if this fails """
+        unknown = [level for level in levels if level not in self.GRAPH_LEVEL_LIMIT]
+        if unknown:
+            msg = f'Passed unknown knwoledge graph labels: {unknown}. Abort.'
+            if self.logger:
+                self.logger.error(msg)
+            return msg
+        self._sync_reachability()
+        missing = self.reachability.missing(search_terms)
+        failed = self.update_reachability(missing, propagate=False) if missing else list()
+        if failed:
+            msg = f'Passed search terms {failed}, which are not in Knowledge Graph.'
+            if self.logger:
+                self.logger.error(msg)
+            return msg
+        return None
 
     @staticmethod
     def get_node_data(node_table):
@@ -322,3 +1052,5 @@ class Neo4jConnector(object):
     def close(self):
         # Don't forget to close the driver connection when you are finished with it
         self.driver.close()
+        if self.manifest is not None:
+            self.manifest.close()
@@ -0,0 +1,206 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+from pymedgraph.graph.minhash import MinHashIndex
+
+
+class ReachabilityIndex(object):
+    """
+    Class holds the ids of all nodes, which are reachable from a SearchTerm node, per search term and node label as
+    sorted numpy arrays of neo4j node ids. Intersections of search terms are then set operations on these arrays
+    instead of path queries on the graph.
+
+    The subgraph of a search term is collected with `Neo4jConnector.update_reachability()` after the upload of a build
+    and passed as edge arrays to `ReachabilityIndex.update()`. The relations added by a build are all inside the
+    subgraph of its search terms, so other search terms are updated incrementally: they get all nodes of the new
+    subgraph below the nodes they already reach.
+
+    If a path is set, the index is stored as `.npz` file after every change and loaded on init.
+
+    The node ids are only valid for the graph they were collected from. The index keeps the value of the version
+    counter of the graph (see `pymedgraph.graph.registry.SearchTermRegistry`), with which it was last synced. If
+    another process changed the graph since then, all search terms are stale, see `ReachabilityIndex.sync()`.
+
+    Every change is also applied to the MinHash signatures in `ReachabilityIndex.sketches`, which estimate the
+    similarity of search terms without comparing their nodes, see `pymedgraph.graph.minhash.MinHashIndex`.
+
+    Usage:
+        index = ReachabilityIndex('reachability.npz')
+        index.update('pku', root, parents, children, labels, propagate=True)
+        index.intersection_counts(['pku', 'epilepsy'], 'Gene')
+    """
+
+    def __init__(self, path: str = None, logger=None, minhash: dict = None):
+        """
+        :param path: str - file of persisted index, the index is only kept in memory if not set
+        :param logger: logging.logger
+        :param minhash: dict - kwargs of `pymedgraph.graph.minhash.MinHashIndex`
+        """
+        self.path = path
+        self.logger = logger
+        self.sketches = MinHashIndex(**(minhash or dict()))
+        # search term -> node label -> sorted array of node ids
+        self._sets = dict()
+        # search terms, which have to be collected again before use
+        self._stale = set()
+        # incremented on every change of the node ids, used to invalidate derived results
+        self.version = 0
+        # version counter of the graph, with which the index was synced last, None if never synced
+        self.graph_version = None
+        self._lock = threading.RLock()
+        if self.path and os.path.isfile(self.path):
+            self._load()
+
+    def terms(self) -> list:
+        with self._lock:
+            return list(self._sets)
+
+    def labels(self, term: str) -> list:
+        """ Returns labels of the nodes reachable from `term` """
+        with self._lock:
+            return list(self._sets.get(term, dict()))
+
+    def missing(self, terms: list) -> list:
+        """ Returns search terms, which are not in the index or stale """
+        with self._lock:
+            return [t for t in terms if t not in self._sets or t in self._stale]
+
+    def get(self, term: str, label: str) -> np.ndarray:
+        """ Returns sorted ids of nodes with `label` reachable from `term` """
+        with self._lock:
+            return self._sets.get(term, dict()).get(label, np.empty(0, dtype=np.int64))
+
+    def update(self, term: str, root: int, parents: np.ndarray, children: np.ndarray, labels: np.ndarray,
+               propagate: bool = False):
+        """
+        Method stores the subgraph of a search term.
+
+        :param term: str - label of SearchTerm node
+        :param root: int - node id of SearchTerm node
+        :param parents: np.ndarray - node ids of the start nodes of the relations in the subgraph
+        :param children: np.ndarray - node ids of the end nodes of the relations
+        :param labels: np.ndarray - node labels of the end nodes
+        :param propagate: bool - flag to add the nodes of the subgraph, which are reachable from the nodes of other
+        search terms, to these search terms. Required, if relations were added to the subgraph since it was collected
+        """
+        parents = np.asarray(parents, dtype=np.int64)
+        children = np.asarray(children, dtype=np.int64)
+        labels = np.asarray(labels, dtype=object)
+        node_ids, first = np.unique(children, return_index=True)
+        node_labels = labels[first]
+        with self._lock:
+            self._sets[term] = self._group(self._closure(parents, children, [root]), node_ids, node_labels)
+            self.sketches.set_term(term, self._sets[term])
+            self._stale.discard(term)
+            if propagate:
+                for other, sets in self._sets.items():
+                    if other == term:
+                        continue
+                    seeds = np.concatenate([np.empty(0, dtype=np.int64)] + list(sets.values()))
+                    new_nodes = self._group(self._closure(parents, children, seeds), node_ids, node_labels)
+                    for label, ids in new_nodes.items():
+                        sets[label] = np.union1d(sets.get(label, np.empty(0, dtype=np.int64)), ids)
+                        self.sketches.add(other, label, ids)
+            self.version += 1
+            self._save()
+
+    def invalidate(self, terms: list = None):
+        """ Marks search terms as stale, all search terms if `terms` is None """
+        with self._lock:
+            self._stale.update(self._sets if terms is None else terms)
+            self._save()
+
+    def sync(self, graph_version: int or None, changed_version: int or None):
+        """
+        Method marks all search terms as stale, if the graph was changed by another process since the last sync.
+
+        :param graph_version: int - current value of the version counter of the graph, nothing is done if None
+        :param changed_version: int - last value of the version counter, at which another process changed the graph
+        """
+        with self._lock:
+            if graph_version is None or graph_version == self.graph_version:
+                return
+            if self.graph_version is None or (changed_version is not None and changed_version > self.graph_version):
+                if self._sets and self.logger:
+                    self.logger.info(f'Graph changed since version {self.graph_version} of the reachability index, '
+                                     f'all search terms are collected again.')
+                self._stale.update(self._sets)
+            self.graph_version = graph_version
+            self._save()
+
+    def remove(self, term: str):
+        with self._lock:
+            self._sets.pop(term, None)
+            self.sketches.remove(term)
+            self._stale.discard(term)
+            self.version += 1
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._sets = dict()
+            self.sketches.clear()
+            self._stale = set()
+            self.version += 1
+            self._save()
+
+    def intersection_counts(self, terms: list, label: str) -> list:
+        """ Returns (term, term, number of shared nodes with `label`) for every ordered pair of search terms """
+        with self._lock:
+            sets = [self.get(t, label) for t in terms]
+        # counts are symmetric, each pair is intersected once
+        counts = dict()
+        for i, s1 in enumerate(sets):
+            for j in range(i, len(sets)):
+                counts[i, j] = counts[j, i] = int(np.intersect1d(s1, sets[j], assume_unique=True).size)
+        return [(e1, e2, counts[i, j]) for i, e1 in enumerate(terms) for j, e2 in enumerate(terms)]
+
+    @staticmethod
+    def _closure(parents: np.ndarray, children: np.ndarray, seeds) -> np.ndarray:
+        """ Returns sorted ids of all nodes below the seed nodes """
+        reached = np.empty(0, dtype=np.int64)
+        frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+        while frontier.size:
+            frontier = np.setdiff1d(np.unique(children[np.isin(parents, frontier)]), reached, assume_unique=True)
+            reached = np.union1d(reached, frontier)
+        return reached
+
+    @staticmethod
+    def _group(ids: np.ndarray, node_ids: np.ndarray, node_labels: np.ndarray) -> dict:
+        """ Splits sorted node ids by label, `node_ids` are the sorted ids with label `node_labels` """
+        if not ids.size:
+            return dict()
+        labels = node_labels[np.searchsorted(node_ids, ids)]
+        return {label: ids[labels == label] for label in sorted(set(labels))}
+
+    def _save(self):
+        if not self.path:
+            return
+        arrays, index = dict(), list()
+        for term, sets in self._sets.items():
+            for label, ids in sets.items():
+                arrays[f'a{len(index)}'] = ids
+                index.append([term, label])
+        meta = {
+            'index': index, 'terms': list(self._sets), 'stale': sorted(self._stale), 'graph_version': self.graph_version
+        }
+        tmp_file = self.path + '.tmp.npz'
+        np.savez(tmp_file, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_file, self.path)
+
+    def _load(self):
+        with np.load(self.path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            self._sets = {term: dict() for term in meta['terms']}
+            for i, (term, label) in enumerate(meta['index']):
+                self._sets[term][label] = data[f'a{i}']
+        for term, sets in self._sets.items():
+            self.sketches.set_term(term, sets)
+        self._stale = set(meta['stale'])
+        # files without graph version are stale on the first sync
+        self.graph_version = meta.get('graph_version')
+        if self.logger:
+            self.logger.info(f'Loaded reachability index of {len(self._sets)} search terms from \'{self.path}\'.')
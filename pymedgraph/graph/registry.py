@@ -0,0 +1,162 @@
+import time
+import threading
+
+
+class SearchTermRegistry(object):
+    """
+    Class caches the SearchTerm nodes of the graph with the number of their directly related nodes and their last build
+    time, so read requests do not query neo4j.
+
+    The `Neo4jConnector` writes through to the registry whenever it adds, builds or deletes search terms, and increments
+    a version counter in the graph (node `GraphVersion`). Other processes writing to the same graph (e.g. the command
+    line interface) increment the counter, too. Its value is compared at most every `check_interval` seconds, the cache
+    is reloaded if it changed.
+
+    Usage:
+        registry = SearchTermRegistry(neo4j)
+        registry.terms()
+    """
+    VERSION_QUERY = "MATCH (v:GraphVersion {name: 'pymedgraph'}) RETURN v.version AS version"
+    INCREMENT_QUERY = "MERGE (v:GraphVersion {name: 'pymedgraph'}) " \
+                      "SET v.version = coalesce(v.version, 0) + 1 RETURN v.version AS version"
+    LOAD_QUERY = "MATCH (s:SearchTerm) OPTIONAL MATCH (s)-[:CONTAINS]->(n) " \
+                 "RETURN s.label AS label, s.last_build AS last_build, count(n) AS nodes"
+
+    def __init__(self, connector, check_interval: float = 5., logger=None):
+        """
+        :param connector: pymedgraph.graph.neo4jconnector.Neo4jConnector - used to run the queries
+        :param check_interval: float - seconds between two checks of the version counter in the graph
+        :param logger: logging.logger
+        """
+        self.connector = connector
+        self.check_interval = check_interval
+        self.logger = logger
+        # search term -> {'label': str, 'nodes': int, 'last_build': float or None}
+        self._terms = None
+        self._version = None
+        # last version of the counter, at which another process changed the graph, None if not known yet
+        self.changed_version = None
+        self._checked = 0.
+        self._lock = threading.RLock()
+
+    def terms(self) -> list:
+        """ Returns labels of SearchTerm nodes """
+        with self._lock:
+            self._refresh()
+            return list(self._terms)
+
+    def info(self) -> list:
+        """ Returns label, number of directly related nodes and last build time of each search term """
+        with self._lock:
+            self._refresh()
+            return [dict(v) for v in self._terms.values()]
+
+    @property
+    def version(self) -> int or None:
+        """ Last known value of the version counter in the graph """
+        return self._version
+
+    def add(self, terms: list):
+        """ Adds search terms, which were merged into the graph """
+        with self._lock:
+            if self._terms is not None:
+                for term in terms:
+                    self._terms.setdefault(term, {'label': term, 'nodes': 0, 'last_build': None})
+            self._increment()
+
+    def set_build(self, term: str, nodes: int, last_build: float):
+        with self._lock:
+            if self._terms is not None and term in self._terms:
+                self._terms[term].update(nodes=nodes, last_build=last_build)
+            self._increment()
+
+    def remove(self, term: str):
+        with self._lock:
+            if self._terms is not None:
+                self._terms.pop(term, None)
+            self._increment()
+
+    def clear(self):
+        with self._lock:
+            if self._terms is not None:
+                self._terms = dict()
+            self._increment()
+
+    def invalidate(self):
+        """ Drops the cache, e.g. after an import changed many search terms """
+        with self._lock:
+            self._terms = None
+            self._increment()
+
+    def _increment(self):
+        """ Increments version counter in the graph. The cache is reloaded, if another process changed the graph """
+        response = self.connector.query(self.INCREMENT_QUERY, None)
+        version = response[0]['version'] if response else None
+        if version is None or self._version is None or version != self._version + 1:
+            self._terms = None
+            if version is not None:
+                self.changed_version = version - 1
+        self._version = version
+        self._checked = time.time()
+
+    def cached_info(self) -> list or None:
+        """ Returns `SearchTermRegistry.info()` without querying the graph, None if the cache has to be checked """
+        with self._lock:
+            if not self._fresh():
+                return None
+            return [dict(v) for v in self._terms.values()]
+
+    def validate(self, response) -> list or None:
+        """
+        Method compares the cache with the version counter read by another client, e.g. an async driver, see
+        `pymedgraph.graph.asyncreader.AsyncGraphReader`.
+
+        :param response: list - records of `SearchTermRegistry.VERSION_QUERY`, None if the query failed
+        :return: list - `SearchTermRegistry.info()`, None if the search terms have to be loaded with `LOAD_QUERY`
+        """
+        with self._lock:
+            if not self._check(response):
+                return None
+            return [dict(v) for v in self._terms.values()]
+
+    def load(self, result, response) -> list:
+        """
+        Method replaces the cache with search terms read by another client.
+
+        :param result: list - records of `SearchTermRegistry.LOAD_QUERY`
+        :param response: list - records of `SearchTermRegistry.VERSION_QUERY`, which was sent before `LOAD_QUERY`
+        :return: list - `SearchTermRegistry.info()`
+        """
+        with self._lock:
+            self._load(result, response)
+            return [dict(v) for v in self._terms.values()]
+
+    def _fresh(self) -> bool:
+        return self._terms is not None and time.time() - self._checked < self.check_interval
+
+    def _check(self, response) -> bool:
+        """ Marks the cache as checked, returns True if it is valid for the version counter in `response` """
+        self._checked = time.time()
+        version = response[0]['version'] if response else None
+        return self._terms is not None and response is not None and version == self._version
+
+    def _load(self, result, response):
+        if result is None:
+            raise RuntimeError('Search terms could not be loaded from the graph.')
+        self._terms = {
+            r['label']: {'label': r['label'], 'nodes': r['nodes'], 'last_build': r['last_build']} for r in result
+        }
+        version = response[0]['version'] if response else None
+        if version != self._version:
+            self.changed_version = version
+        self._version = version
+        if self.logger:
+            self.logger.info(f'Loaded {len(self._terms)} search terms of graph version {self._version}.')
+
+    def _refresh(self):
+        if self._fresh():
+            return
+        response = self.connector.query(self.VERSION_QUERY, None)
+        if self._check(response):
+            return
+        self._load(self.connector.query(self.LOAD_QUERY, None), response)
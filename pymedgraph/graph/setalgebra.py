@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# number of set bits of each byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+class SetAlgebra(object):
+    """
+    Class computes intersection, union and Jaccard matrices of search terms from a
+    `pymedgraph.graph.reachability.ReachabilityIndex`.
+
+    Per node label the ids of the reachable nodes are mapped to the positions in the sorted ids of all search terms, and
+    each search term is stored as bitmap with one bit per position, packed to bytes. The intersection counts of all
+    pairs are then computed block by block with one matrix product of the unpacked bitmaps, so the time grows with the
+    number of nodes and the square of the number of search terms, but not with the number of paths in the graph.
+
+    Bitmaps and matrices are cached and dropped as soon as `ReachabilityIndex.version` changes, i.e. after a build,
+    refresh or delete changed the nodes of a search term.
+
+    Usage:
+        algebra = SetAlgebra(neo4j.reachability)
+        algebra.matrices(['pku', 'epilepsy'], ['Gene', 'GO'])['Gene']['jaccard']
+    """
+
+    def __init__(self, index, block_size: int = 8192, max_cached: int = 32):
+        """
+        :param index: pymedgraph.graph.reachability.ReachabilityIndex
+        :param block_size: int - bytes of the bitmaps unpacked at once, the sum of a block has to be exact in float32
+        :param max_cached: int - number of cached results of `SetAlgebra.matrices()`
+        """
+        self.index = index
+        self.block_size = min(block_size, 2 ** 21)
+        self.max_cached = max_cached
+        self._version = None
+        # label -> (search term -> row, packed bitmaps)
+        self._bitmaps = dict()
+        self._matrices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matrices(self, terms: list, labels: list) -> dict:
+        """
+        Method returns the matrices of the search terms for each label. Row and column i belong to `terms[i]`.
+
+        :param terms: list - search terms, which are in the index
+        :param labels: list - node labels
+        :return: dict - label -> {'intersection': list, 'union': list, 'jaccard': list, 'size': list}
+        """
+        key = (tuple(terms), tuple(labels))
+        with self._lock:
+            self._check_version()
+            version = self._version
+            if key in self._matrices:
+                self._matrices.move_to_end(key)
+                return self._matrices[key]
+        result = {label: self._label_matrices(terms, label) for label in labels}
+        with self._lock:
+            # do not cache a result of nodes, which changed during the computation
+            if self.index.version != version:
+                return result
+            self._matrices[key] = result
+            while len(self._matrices) > self.max_cached:
+                self._matrices.popitem(last=False)
+        return result
+
+    def bitmaps(self, label: str) -> tuple:
+        """ Returns dict search term -> row and packed bitmaps of all search terms of the index for a label """
+        with self._lock:
+            self._check_version()
+            if label not in self._bitmaps:
+                terms = self.index.terms()
+                sets = [self.index.get(t, label) for t in terms]
+                positions = np.unique(np.concatenate([np.empty(0, dtype=np.int64)] + sets))
+                packed = np.zeros((len(terms), (len(positions) + 7) // 8), dtype=np.uint8)
+                for i, ids in enumerate(sets):
+                    bits = np.zeros(len(positions), dtype=bool)
+                    bits[np.searchsorted(positions, ids)] = True
+                    packed[i] = np.packbits(bits)
+                self._bitmaps[label] = ({t: i for i, t in enumerate(terms)}, packed)
+            return self._bitmaps[label]
+
+    def _label_matrices(self, terms: list, label: str) -> dict:
+        rows, packed = self.bitmaps(label)
+        bitmaps = packed[[rows[t] for t in terms]]
+        sizes = _POPCOUNT[bitmaps].sum(axis=1)
+        intersection = np.zeros((len(terms), len(terms)), dtype=np.int64)
+        for start in range(0, bitmaps.shape[1], self.block_size):
+            block = np.unpackbits(bitmaps[:, start:start + self.block_size], axis=1).astype(np.float32)
+            intersection += np.rint(block @ block.T).astype(np.int64)
+        union = sizes[:, None] + sizes[None, :] - intersection
+        jaccard = np.divide(intersection, union, out=np.zeros(union.shape), where=union > 0)
+        return {
+            'size': sizes.tolist(),
+            'intersection': intersection.tolist(),
+            'union': union.tolist(),
+            'jaccard': jaccard.round(6).tolist()
+        }
+
+    def _check_version(self):
+        if self._version != self.index.version:
+            self._bitmaps = dict()
+            self._matrices = OrderedDict()
+            self._version = self.index.version
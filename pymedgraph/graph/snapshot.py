@@ -0,0 +1,191 @@
+import os
+import json
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+MANIFEST = 'manifest.json'
+SNAPSHOT_VERSION = 1
+RELATIONSHIP_COLUMNS = ['start_label', 'start_key', 'end_label', 'end_key']
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError('Graph snapshots require the package \'pyarrow\'.')
+
+
+class SnapshotWriter(object):
+    """
+    Class streams the nodes and relations of a graph to compressed parquet files:
+
+        manifest.json               search terms, key attribute per label, files, counts and throughput
+        nodes_<label>.parquet       one row per node with all properties, one column per property
+        relationships.parquet       one row per `CONTAINS` relation with label and key of start and end node
+
+    Relations reference nodes by label and key attribute (see `Neo4jConnector.NODE_KEYS`) instead of internal node
+    ids, so a snapshot can be imported into any graph with `Neo4jConnector.import_snapshot()`.
+
+    Rows are written as row groups when they are added, only the open file writers are kept in memory. Parquet files
+    have a fixed schema: if the properties of a label change, e.g. a property appears that was not in the first rows, a
+    new file `nodes_<label>.<n>.parquet` is started.
+
+    Usage:
+        writer = SnapshotWriter('snapshot')
+        writer.add_nodes('Gene', 'gene', [{'gene': 'PAH'}])
+        writer.add_relations([{'start_label': 'UMLS', 'start_key': 'C1', 'end_label': 'Gene', 'end_key': 'PAH'}])
+        manifest = writer.finish(['phenylketonuria'])
+    """
+
+    def __init__(self, path: str, compression: str = 'zstd', logger=None):
+        """
+        :param path: str - snapshot directory, is created if it does not exist
+        :param compression: str - parquet compression codec
+        :param logger: logging.logger
+        """
+        _require_pyarrow()
+        self.path = path
+        self.compression = compression
+        self.logger = logger
+        os.makedirs(self.path, exist_ok=True)
+        # file name prefix -> open parquet writer and list of written files
+        self._writers = dict()
+        self._files = dict()
+        self._keys = dict()
+        self._counts = {'nodes': dict(), 'relationships': 0}
+        self._start = time.time()
+
+    def add_nodes(self, label: str, key: str, rows: list):
+        """ Writes nodes of a label, `rows` are dicts property -> value and contain the key attribute `key` """
+        if not rows:
+            return
+        self._keys[label] = key
+        self._write(f'nodes_{label}', rows)
+        self._counts['nodes'][label] = self._counts['nodes'].get(label, 0) + len(rows)
+
+    def add_relations(self, rows: list):
+        """ Writes relations, `rows` are dicts with the keys of `RELATIONSHIP_COLUMNS` """
+        if not rows:
+            return
+        self._write('relationships', rows)
+        self._counts['relationships'] += len(rows)
+
+    def finish(self, search_terms: list) -> dict:
+        """
+        Method closes all files and writes the manifest.
+
+        :param search_terms: list - search terms of the snapshot
+        :return: dict - manifest with files, counts, bytes, time and nodes_per_second
+        """
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = dict()
+        elapsed = time.time() - self._start
+        n_nodes = sum(self._counts['nodes'].values())
+        files = [f for prefix in self._files for f in self._files[prefix]]
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'created': time.time(),
+            'search_terms': list(search_terms),
+            'keys': self._keys,
+            'nodes': {label: self._files.get(f'nodes_{label}', list()) for label in self._keys},
+            'relationships': self._files.get('relationships', list()),
+            'counts': self._counts,
+            'bytes': sum(os.path.getsize(os.path.join(self.path, f)) for f in files),
+            'time': elapsed,
+            'nodes_per_second': n_nodes / elapsed if elapsed > 0 else None
+        }
+        with open(os.path.join(self.path, MANIFEST), 'w') as fh:
+            json.dump(manifest, fh, indent=2, sort_keys=True)
+        if self.logger:
+            self.logger.info('Exported snapshot of {n} nodes and {r} relationships to \'{p}\' in {t:.1f}s.'.format(
+                n=n_nodes, r=self._counts['relationships'], p=self.path, t=elapsed
+            ))
+        return manifest
+
+    def _write(self, prefix: str, rows: list):
+        table = self._to_table(rows)
+        writer = self._writers.get(prefix)
+        if writer is not None:
+            conformed = self._conform(table, writer.schema)
+            if conformed is None:
+                writer.close()
+                writer = None
+            else:
+                table = conformed
+        if writer is None:
+            files = self._files.setdefault(prefix, list())
+            file_name = f'{prefix}.parquet' if not files else f'{prefix}.{len(files)}.parquet'
+            files.append(file_name)
+            writer = pq.ParquetWriter(os.path.join(self.path, file_name), table.schema, compression=self.compression)
+            self._writers[prefix] = writer
+        writer.write_table(table)
+
+    @staticmethod
+    def _to_table(rows: list):
+        try:
+            return pa.Table.from_pylist(rows)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # values of mixed types in a column are stored as strings
+            columns = list(dict.fromkeys(c for row in rows for c in row))
+            return pa.table({c: [None if r.get(c) is None else str(r.get(c)) for r in rows] for c in columns})
+
+    @staticmethod
+    def _conform(table, schema):
+        """ Returns table with the columns and types of `schema`, None if it has other columns or types """
+        if table.schema.equals(schema):
+            return table
+        if not set(table.column_names) <= set(schema.names):
+            return None
+        try:
+            columns = [
+                table.column(field.name).cast(field.type) if field.name in table.column_names
+                else pa.nulls(len(table), type=field.type) for field in schema
+            ]
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+            return None
+        return pa.Table.from_arrays(columns, schema=schema)
+
+
+class SnapshotReader(object):
+    """
+    Class reads a snapshot written by `SnapshotWriter` in batches of rows.
+
+    Usage:
+        reader = SnapshotReader('snapshot')
+        for label, key, rows in reader.nodes(batch_size=10000):
+            ...
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: str - snapshot directory
+        """
+        _require_pyarrow()
+        self.path = path
+        with open(os.path.join(path, MANIFEST), 'r') as fh:
+            self.manifest = json.load(fh)
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise RuntimeError(f'Snapshot \'{path}\' has unsupported version {self.manifest.get("version")}.')
+
+    def nodes(self, batch_size: int = 10000):
+        """ Yields (label, key attribute, list of node property dicts), properties without value are left out """
+        for label, files in self.manifest['nodes'].items():
+            key = self.manifest['keys'][label]
+            for rows in self._batches(files, batch_size):
+                yield label, key, [{k: v for k, v in row.items() if v is not None} for row in rows]
+
+    def relations(self, batch_size: int = 10000):
+        """ Yields lists of relation dicts with the keys of `RELATIONSHIP_COLUMNS` """
+        yield from self._batches(self.manifest['relationships'], batch_size)
+
+    def _batches(self, files: list, batch_size: int):
+        for file_name in files:
+            parquet_file = pq.ParquetFile(os.path.join(self.path, file_name))
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                yield batch.to_pylist()
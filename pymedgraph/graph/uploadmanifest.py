@@ -0,0 +1,165 @@
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# separates source key and node key of a relation
+_SEP = '\x1f'
+
+
+class UploadManifest(object):
+    """
+    Class keeps a content hash of every node uploaded to the graph and the relations to its source nodes in a local
+    sqlite file, so `Neo4jConnector.upload_nodetable()` only sends new or changed nodes and missing relations.
+
+    - the hash of a node is computed from its key and attributes with `pd.util.hash_pandas_object()`
+    - a relation is recorded once its source node is known to exist, i.e. a node with the label and the key of the
+    source node was uploaded with the manifest or is a SearchTerm node added by the connector. Relations to unknown
+    source nodes are sent again on the next upload, because the relation query skips them if the source node does not
+    exist
+
+    The manifest describes one graph. It is cleared by `Neo4jConnector.delete_graph()` and
+    `Neo4jConnector.delete_search_term()`, and has to be cleared with `UploadManifest.clear()` if nodes are deleted in
+    another way.
+
+    Usage:
+        manifest = UploadManifest('upload_manifest.sqlite')
+        diff = manifest.diff(df, node_table.meta, 'Gene', ['DISEASE'])
+        # upload diff['nodes'] and diff['relations']
+        manifest.commit(diff)
+    """
+
+    def __init__(self, path: str = None, logger=None):
+        """
+        :param path: str - sqlite file of the manifest, the manifest is only kept in memory if not set
+        :param logger: logging.logger
+        """
+        self.path = path
+        self.logger = logger
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS nodes (label TEXT, key TEXT, hash INTEGER, PRIMARY KEY (label, key))'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS relations (source_label TEXT, label TEXT, pair TEXT, '
+            'PRIMARY KEY (source_label, label, pair))'
+        )
+        self._db.commit()
+        # `label.key attribute` -> key -> hash and (source label, label) -> pairs, loaded from the file on first use
+        self._nodes = dict()
+        self._relations = dict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def row_hashes(df: pd.DataFrame, columns: list) -> pd.Series:
+        """ Returns stable int64 hash of the values of `columns` per row, independent of the index and dtypes """
+        hashes = pd.util.hash_pandas_object(df[columns].astype(str), index=False)
+        return pd.Series(hashes.to_numpy().view(np.int64), index=df.index)
+
+    def diff(self, df: pd.DataFrame, meta: dict, node_label: str, source_nodes: list) -> dict:
+        """
+        Method compares the rows of a node label with the manifest.
+
+        :param df: pd.DataFrame - rows of the node label of a NodeTable
+        :param meta: dict - pymedgraph.dataextraction.basepipe.NodeTable.meta
+        :param node_label: str - node label of the rows
+        :param source_nodes: list - labels of the source nodes of the relations
+        :return: dict - 'nodes': first row of each new or changed node, 'relations': rows of missing relations,
+        'rows': all rows of new or changed nodes and missing relations, and the data to commit
+        """
+        id_col = meta['id_attribute']
+        columns = [id_col] + [c for c in (meta['attribute_cols'] or []) if c != id_col]
+        nodes = df.drop_duplicates(subset=[id_col])
+        keys = nodes[id_col].astype(str)
+        hashes = self.row_hashes(nodes, columns)
+        with self._lock:
+            known = self._load_nodes(f'{node_label}.{id_col}')
+            known_keys = pd.Index(list(known), dtype=object)
+            known_hashes = np.fromiter(known.values(), dtype=np.int64, count=len(known))
+        # hashes are compared as int64, a lookup with missing keys would cast them to float
+        positions = known_keys.get_indexer(keys)
+        changed = (positions < 0) | (known_hashes[np.maximum(positions, 0)] != hashes.to_numpy()) if len(known) \
+            else np.ones(len(keys), dtype=bool)
+
+        # a relation is missing, if it was not recorded for any source label. The source nodes of tables with multiple
+        # source labels have one of them, see `UploadManifest.commit()`
+        missing = np.full(len(df), bool(source_nodes))
+        pairs = None
+        if source_nodes:
+            pairs = df[meta['source_column']].astype(str) + _SEP + df[id_col].astype(str)
+            with self._lock:
+                for source_node in source_nodes:
+                    missing &= ~pairs.isin(self._load_relations(source_node, node_label)).to_numpy()
+        changed_keys = set(keys[changed])
+        rows = df[missing | df[id_col].astype(str).isin(changed_keys).to_numpy()]
+        return {
+            'label': f'{node_label}.{id_col}',
+            'relation_label': node_label,
+            'source_nodes': [f'{s}.{meta["source_node_attr"]}' for s in source_nodes],
+            'nodes': nodes[changed],
+            'relations': df[missing],
+            'rows': rows,
+            'hashes': (keys[changed].tolist(), hashes[changed].tolist()),
+            'pairs': pairs[missing] if pairs is not None else pd.Series([], dtype=object),
+            'source_keys': df.loc[missing, meta['source_column']].astype(str) if pairs is not None else None
+        }
+
+    def commit(self, diff: dict):
+        """ Records nodes and relations of a diff as uploaded, call after the upload succeeded """
+        label = diff['label']
+        relation_label = diff.get('relation_label')
+        with self._lock:
+            nodes = self._load_nodes(label)
+            nodes.update(zip(*diff['hashes']))
+            self._db.executemany(
+                'INSERT OR REPLACE INTO nodes (label, key, hash) VALUES (?, ?, ?)',
+                [(label, k, h) for k, h in zip(*diff['hashes'])]
+            )
+            for source_node in diff['source_nodes']:
+                # relations of source nodes, which are not known to exist, were possibly not created. With multiple
+                # source labels the relation is recorded for the labels of existing source nodes only
+                exists = diff['source_keys'].isin(self._load_nodes(source_node).keys()).to_numpy()
+                pairs = set(diff['pairs'][exists])
+                source_label = source_node.split('.', 1)[0]
+                self._load_relations(source_label, relation_label).update(pairs)
+                self._db.executemany(
+                    'INSERT OR IGNORE INTO relations (source_label, label, pair) VALUES (?, ?, ?)',
+                    [(source_label, relation_label, p) for p in pairs]
+                )
+            self._db.commit()
+
+    def add_nodes(self, label: str, attribute: str, keys: list):
+        """ Records nodes without other attributes, which were added to the graph, e.g. SearchTerm nodes """
+        self.commit({
+            'label': f'{label}.{attribute}', 'source_nodes': list(), 'hashes': ([str(k) for k in keys], [0] * len(keys))
+        })
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM nodes')
+            self._db.execute('DELETE FROM relations')
+            self._db.commit()
+            self._nodes = dict()
+            self._relations = dict()
+        if self.logger:
+            self.logger.info('Cleared upload manifest.')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _load_nodes(self, label: str) -> dict:
+        if label not in self._nodes:
+            self._nodes[label] = dict(self._db.execute('SELECT key, hash FROM nodes WHERE label = ?', (label,)))
+        return self._nodes[label]
+
+    def _load_relations(self, source_label: str, label: str) -> set:
+        if (source_label, label) not in self._relations:
+            self._relations[source_label, label] = {
+                r[0] for r in self._db.execute(
+                    'SELECT pair FROM relations WHERE source_label = ? AND label = ?', (source_label, label)
+                )
+            }
+        return self._relations[source_label, label]
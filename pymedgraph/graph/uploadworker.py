@@ -0,0 +1,101 @@
+import queue
+import threading
+import contextvars
+
+
+class UploadWorker(object):
+    """
+    Class uploads `pymedgraph.dataextraction.basepipe.PipeOutput` objects in a background thread, while the
+    `pymedgraph.manager.MedGraphManager` is still running the following pipes. This way the write latency of neo4j
+    overlaps with the processing of the later pipes instead of adding up.
+
+    The outputs are uploaded one after another in the order they were submitted. Since the manager submits each output
+    as soon as its pipe is finished, and a pipe only finishes after all pipes it depends on, the nodes of a source
+    table are always uploaded before the relations pointing to them.
+
+    Usage:
+        uploader = UploadWorker(neo4j)
+        disease, outputs, delete_graph = manager.construct_med_graph(req_specs, uploader=uploader)
+        uploader.finish()
+    """
+    _STOP = object()
+
+    def __init__(self, connector, logger=None, max_pending: int = 0):
+        """
+        :param connector: pymedgraph.graph.neo4jconnector.Neo4jConnector
+        :param logger: logging.logger
+        :param max_pending: int - maximum number of outputs waiting for upload, `submit()` blocks if reached. Bounds
+        the memory of chunked builds, 0 means no limit
+        """
+        self.connector = connector
+        self.logger = logger
+        self.error = None
+        self.uploaded = list()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    def start(self, disease: str or list, delete_graph: bool = False):
+        """
+        Method starts the worker thread, which first initialises the graph with the SearchTerm node.
+
+        :param disease: str or list - name of search term or list of search terms of a batch build
+        :param delete_graph: bool - flag if existing graph shall be deleted or not
+        """
+        if self._thread is not None:
+            raise RuntimeError('UploadWorker was already started.')
+        # run in copy of current context, to keep the active trace of `pymedgraph.metrics`
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._work, disease, delete_graph), daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, pipe_output):
+        """ Adds PipeOutput to upload queue """
+        if self._thread is None:
+            raise RuntimeError('UploadWorker must be started before submitting outputs.')
+        self._queue.put(pipe_output)
+
+    def finish(self, timeout: float = None) -> list:
+        """
+        Method waits until all submitted outputs are uploaded and stops the worker thread.
+        Raises a RuntimeError if one of the uploads failed.
+
+        :param timeout: float - seconds to wait for the worker
+        :return: list - names of uploaded pipes
+        """
+        if self._thread is None:
+            return self.uploaded
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise RuntimeError(f'UploadWorker did not finish within {timeout} seconds.')
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        return self.uploaded
+
+    def _work(self, disease: str, delete_graph: bool):
+        try:
+            self.connector._init_new_neo4j_graph(disease, delete_graph)
+        except Exception as ex:
+            self._set_error(ex)
+        while True:
+            pipe_output = self._queue.get()
+            if pipe_output is self._STOP:
+                break
+            # skip remaining outputs after failure, their relations would point to missing nodes
+            if self.error is not None:
+                continue
+            try:
+                self.connector.upload_pipe_output(pipe_output)
+                self.uploaded.append(pipe_output.pipe)
+            except Exception as ex:
+                self._set_error(ex)
+            # release output, it is only referenced by the caller now
+            del pipe_output
+        # also after a failure, the uploaded part of the subgraph is in the graph
+        self.connector.update_reachability(disease)
+
+    def _set_error(self, ex: Exception):
+        if self.logger:
+            self.logger.error(f'UploadWorker stopped uploads after failure: {ex}')
+        self.error = ex
@@ -1,5 +1,19 @@
+import io
+import time
 from Bio import Entrez
 
+from pymedgraph.metrics import measure
+
+
+def _read_handle(handle, m) -> bytes:
+    """ Reads and closes Entrez handle and adds the number of bytes to the measurement """
+    data = handle.read()
+    handle.close()
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    m.bytes += len(data)
+    return data
+
 
 class NCBIFetcher(object):
     """
@@ -28,13 +42,31 @@ class NCBIFetcher(object):
             Returning PubMed articles.
         """
         paper_ids = self.search_pubmed(term, n_articles)
-        # do request
-        handle = Entrez.efetch(db='pubmed', id=paper_ids, retmode='xml')
-        records = Entrez.read(handle)
-        handle.close()
-        return records['PubmedArticle']
+        return self.fetch_pubmed_paper(paper_ids)
+
+    def fetch_pubmed_paper(self, paper_ids: list, chunk_size: int = 500) -> list:
+        """ Method fetches the PubMed articles for given UID`s. The request is split into chunks of `chunk_size` ids.
+
+        :param paper_ids:
+            List of PubMed UIDs, see `NCBIFetcher.search_pubmed()`.
+
+        :param chunk_size:
+            Maximum number of ids per request.
 
-    def search_pubmed(self, term: str, n_articles: int = None) -> list:
+        :return:
+            Returning PubMed articles.
+        """
+        paper = list()
+        with measure('pubmed.efetch', kind='fetch', rows_in=len(paper_ids)) as m:
+            for i in range(0, len(paper_ids), chunk_size):
+                # do request
+                handle = Entrez.efetch(db='pubmed', id=paper_ids[i:i + chunk_size], retmode='xml')
+                records = Entrez.read(io.BytesIO(_read_handle(handle, m)))
+                paper += records['PubmedArticle']
+            m.rows_out = len(paper)
+        return paper
+
+    def search_pubmed(self, term: str, n_articles: int = None, mindate: str = None, reldate: int = None) -> list:
         """ Method to get UID`s from pubmed for given search term. The UID`s are used to fetch the pubmed records
 
         :param term:
@@ -43,19 +75,34 @@ class NCBIFetcher(object):
         :param n_articles:
             Number of articles which should be fetched.
 
+        :param mindate:
+            Only articles added to PubMed at or after this date ('YYYY/MM/DD') are returned.
+
+        :param reldate:
+            Only articles added to PubMed within the last `reldate` days are returned.
+
         :return:
             Returns UIDs.
         """
         # make sure to not fetch more articles then set `max_articles`
         if not n_articles or n_articles > self.max_articles:
             n_articles = self.max_articles
-        # do request
-        handle = Entrez.esearch(db='pubmed', term=term, idtype='acc', retmax=n_articles, sort="relevance")
-        # parse response
-        record = Entrez.read(handle)
-        handle.close()
-        # get IDs of found articles
-        article_ids = record['IdList']
+        # filter by entrez date, mindate requires a maxdate
+        date_params = dict()
+        if mindate:
+            date_params = {'datetype': 'edat', 'mindate': mindate, 'maxdate': time.strftime('%Y/%m/%d')}
+        elif reldate:
+            date_params = {'datetype': 'edat', 'reldate': reldate}
+        with measure('pubmed.esearch', kind='fetch') as m:
+            # do request
+            handle = Entrez.esearch(
+                db='pubmed', term=term, idtype='acc', retmax=n_articles, sort="relevance", **date_params
+            )
+            # parse response
+            record = Entrez.read(io.BytesIO(_read_handle(handle, m)))
+            # get IDs of found articles
+            article_ids = record['IdList']
+            m.rows_out = len(article_ids)
         return article_ids
 
     def get_medgen_summaries(self, cui:list) -> list:
@@ -68,9 +115,9 @@ class NCBIFetcher(object):
             Returns summaries of MedGen pipeline.
         """
         uids = self.get_medgen_uids(cui)
-        handle = Entrez.esummary(db='medgen', id=','.join(uids), retmode='xml')
-        records = handle.read()
-        handle.close()
+        with measure('medgen.esummary', kind='fetch', rows_in=len(uids)) as m:
+            handle = Entrez.esummary(db='medgen', id=','.join(uids), retmode='xml')
+            records = _read_handle(handle, m)
         return records
 
     def get_medgen_uids(self, cui:list) -> list:
@@ -85,7 +132,8 @@ class NCBIFetcher(object):
         """
         # to make only one request for multiple CUI concepts we join the ids with an OR
         search_term = ' OR '.join(cui)
-        handle = Entrez.esearch(db='medgen', term=search_term, retmax=len(cui))
-        record = Entrez.read(handle)
-        handle.close()
+        with measure('medgen.esearch', kind='fetch', rows_in=len(cui)) as m:
+            handle = Entrez.esearch(db='medgen', term=search_term, retmax=len(cui))
+            record = Entrez.read(io.BytesIO(_read_handle(handle, m)))
+            m.rows_out = len(record['IdList'])
         return record['IdList']
@@ -2,6 +2,7 @@ import requests
 from io import StringIO
 import pandas as pd
 
+from pymedgraph.metrics import measure
 from pymedgraph.dataextraction.uniprotcolumns import UNIPROT_COLS
 
 
@@ -46,19 +47,23 @@ def get_uniprot_results(genes: list, extra_max_entries: int = 10, columns=None)
         columns = ','.join([v['returned_field'] for _, v in UNIPROT_COLS.items()])
 
     query = _build_query(genes, organism=True)
-    response = requests.get(
-        UNIPROT_URL,
-        params={
-            "query": query,
-            "limit": len(genes) + extra_max_entries,
-            'format': 'tsv',
-            'fields': columns
-        }
-    )
-    if response.status_code != 200:
-        print("Error: ", response.status_code)
-    # parse tab seperated table to pd.DataFrame
-    return pd.read_csv(StringIO(response.text), delimiter='\t')
+    with measure('uniprot.search', kind='fetch', rows_in=len(genes)) as m:
+        response = requests.get(
+            UNIPROT_URL,
+            params={
+                "query": query,
+                "limit": len(genes) + extra_max_entries,
+                'format': 'tsv',
+                'fields': columns
+            }
+        )
+        m.bytes = len(response.content)
+        if response.status_code != 200:
+            print("Error: ", response.status_code)
+        # parse tab seperated table to pd.DataFrame
+        df = pd.read_csv(StringIO(response.text), delimiter='\t')
+        m.rows_out = len(df)
+    return df
 
 
 def _build_query(genes: list, organism=True, only_reviewed=True):
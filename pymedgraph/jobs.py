@@ -0,0 +1,309 @@
+import json
+import time
+import queue
+import asyncio
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(RuntimeError):
+    """ Raised by `JobQueue.submit()` if the queue limit is reached """
+
+
+def request_key(disease, pipe_cfg: dict) -> str:
+    """
+    Method builds the key of a parsed request, see `RequestParser.parse_request()`. Requests with the same key
+    produce the same graph.
+
+    :param disease: str or list - search term(s)
+    :param pipe_cfg: dict - parsed pipe config
+    :return: str - sha256 hex digest
+    """
+    return hashlib.sha256(
+        json.dumps({'disease': disease, 'cfg': pipe_cfg}, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+
+class ResourcePool(object):
+    """
+    Class holds a bounded number of resources, e.g. `MedGraphManager` objects, which are not safe to use from several
+    threads at once and expensive to create. The resources are created on first use and shared by the workers of
+    `JobQueue` and `BuildExecutor`. A worker waits, if all resources are in use.
+
+    Usage:
+        managers = ResourcePool(lambda: MedGraphManager(config_path='localconfig.json'), size=2)
+        with managers.acquire() as manager:
+            manager.construct_med_graph(req_specs)
+    """
+
+    def __init__(self, factory, size: int = 1, logger=None):
+        """
+        :param factory: callable - creates a resource
+        :param size: int - maximum number of resources
+        :param logger: logging.logger
+        """
+        self.factory = factory
+        self.size = size
+        self.logger = logger
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        """ Context manager, which lends a resource to the current thread """
+        resource = self._get()
+        try:
+            yield resource
+        finally:
+            self._idle.put(resource)
+
+    def created(self) -> int:
+        """ Returns number of created resources """
+        return self._created
+
+    def _get(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        if self.logger:
+            self.logger.info(f'Creating resource {self._created} of {self.size} for thread '
+                             f'\'{threading.current_thread().name}\'.')
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+
+class Job(object):
+    """
+    Class holds the state of one build request of the `pymedgraph.jobs.JobQueue`. The job is passed as `progress` to
+    the `pymedgraph.manager.MedGraphManager`, which reports started and finished stages to it.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, request: dict, key: str, kind: str = 'build'):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.key = key
+        self.kind = kind
+        self.status = self.QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.stages = dict()
+        self.result = None
+        self.error = None
+        self.merged_requests = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def on_stage_start(self, name: str):
+        with self._lock:
+            self.stages[name] = {'status': self.RUNNING, 'start': time.time() - self.started, 'duration': None}
+
+    def on_stage_done(self, name: str, result=None):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'start': time.time() - self.started})
+            stage['status'] = self.DONE
+            stage['duration'] = time.time() - self.started - stage['start']
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in [self.QUEUED, self.RUNNING]
+
+    def wait(self, timeout: float = None) -> bool:
+        """ Blocks until the job is done or failed, returns False if the timeout expired before """
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'jobId': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'created': self.created,
+                'queueTime': (self.started or time.time()) - self.created,
+                'runTime': ((self.finished or time.time()) - self.started) if self.started else None,
+                'stages': {k: dict(v) for k, v in self.stages.items()},
+                'mergedRequests': self.merged_requests,
+                'result': self.result,
+                'error': self.error
+            }
+
+
+class JobQueue(object):
+    """
+    Class runs build jobs on a bounded pool of worker threads, so an api request can return a job id right away.
+
+    - at most `max_workers` jobs run at the same time, the others wait in the queue
+    - if `max_queued` jobs are waiting, `JobQueue.submit()` raises a `QueueFullError`
+    - a request with the same key as a queued or running job is merged into this job
+    - finished jobs are kept for `JobQueue.get()` until more than `max_finished` jobs are finished
+    - if `resources` is set, each job gets a resource of the `ResourcePool`, e.g. a `MedGraphManager`, for its run.
+    It is passed to `run_func` together with the job
+
+    Usage:
+        jobs = JobQueue(lambda job: manager.construct_med_graph(job.request, progress=job), max_workers=1)
+        job, merged = jobs.submit(req_specs, request_key(*manager.parse_request(req_specs)))
+        jobs.get(job.id).to_dict()
+    """
+
+    def __init__(self, run_func, max_workers: int = 1, max_queued: int = 20, max_finished: int = 100,
+                 resources: ResourcePool = None, logger=None):
+        """
+        :param run_func: callable - called with the job (and a resource, if `resources` is set), the return value is
+        stored as `Job.result`
+        :param max_workers: int - number of jobs running at the same time
+        :param max_queued: int - maximum number of waiting jobs
+        :param max_finished: int - number of finished jobs kept for status requests
+        :param resources: ResourcePool - resources passed to `run_func`, can be shared with a `BuildExecutor`
+        :param logger: logging.logger
+        """
+        self.run_func = run_func
+        self.resources = resources
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.logger = logger
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pymedgraph-job')
+        self._lock = threading.Lock()
+        self._jobs = dict()
+        self._active = dict()
+        self._finished = list()
+
+    def submit(self, request: dict, key: str, kind: str = 'build') -> tuple:
+        """
+        Method adds a job for the request to the queue or returns the active job with the same key.
+
+        :param request: dict - request specs passed to `run_func` as `Job.request`
+        :param key: str - normalized request key, see `pymedgraph.jobs.request_key()`
+        :param kind: str - type of the job, e.g. 'build' or 'refresh', used by `run_func` to dispatch the job
+        :return: tuple - (Job, bool flag if request was merged into an existing job)
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and job.is_active:
+                job.merged_requests += 1
+                return job, True
+            if self.queued() >= self.max_queued:
+                raise QueueFullError(f'Job queue is full with {self.max_queued} waiting jobs.')
+            job = Job(request, key, kind)
+            self._jobs[job.id] = job
+            self._active[key] = job
+        self._pool.submit(self._run, job)
+        if self.logger:
+            self.logger.info(f'Queued job \'{job.id}\'.')
+        return job, False
+
+    def get(self, job_id: str) -> Job or None:
+        return self._jobs.get(job_id)
+
+    def queued(self) -> int:
+        return len([j for j in self._active.values() if j.status == Job.QUEUED])
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def _run(self, job: Job):
+        job.started = time.time()
+        job.status = Job.RUNNING
+        try:
+            if self.resources is not None:
+                with self.resources.acquire() as resource:
+                    job.result = self.run_func(job, resource)
+            else:
+                job.result = self.run_func(job)
+            job.status = Job.DONE
+        except Exception as ex:
+            if self.logger:
+                self.logger.error(f'Job \'{job.id}\' failed with {ex}')
+            job.error = str(ex)
+            job.status = Job.FAILED
+        job.finished = time.time()
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._finished.append(job.id)
+            while len(self._finished) > self.max_finished:
+                self._jobs.pop(self._finished.pop(0), None)
+        job._done.set()
+
+
+class BuildExecutor(object):
+    """
+    Class runs blocking builds for the async request handlers of `pymedgraph.asgi.AsyncAPI` on a bounded pool of
+    worker threads. The event loop only awaits the result, so read requests are answered while builds run.
+
+    - at most `max_workers` builds run at the same time, up to `max_queued` more wait for a worker
+    - further builds are rejected with a `QueueFullError`
+    - each build gets a resource of the `ResourcePool`, e.g. a `MedGraphManager`, which can be shared with the
+    `JobQueue`. A build waits for a resource, if all are in use
+
+    Usage:
+        builds = BuildExecutor(ResourcePool(lambda: MedGraphManager(config_path='localconfig.json')), max_workers=2)
+        msg = await builds.run(lambda manager, specs: manager.construct_med_graph(specs), req_specs)
+    """
+
+    def __init__(self, resources: ResourcePool, max_workers: int = 1, max_queued: int = 4, logger=None):
+        """
+        :param resources: ResourcePool - resources, which are passed to the build function
+        :param max_workers: int - number of builds running at the same time
+        :param max_queued: int - maximum number of builds waiting for a worker
+        :param logger: logging.logger
+        """
+        self.resources = resources
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.logger = logger
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pymedgraph-build')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    async def run(self, func, *args):
+        """
+        Method runs `func(resource, *args)` on a worker thread and returns its result. Raises a `QueueFullError`
+        right away, if `max_workers + max_queued` builds are pending. A build counts as pending until its worker
+        thread is finished, also if the awaiting request was cancelled.
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queued:
+                raise QueueFullError(f'Build queue is full with {self.max_queued} waiting builds.')
+            self._pending += 1
+        try:
+            future = self._pool.submit(self._call, func, args)
+        except RuntimeError:
+            # pool is shut down
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def pending(self) -> int:
+        """ Returns number of running and waiting builds """
+        return self._pending
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _call(self, func, args: tuple):
+        with self.resources.acquire() as resource:
+            return func(resource, *args)
@@ -1,132 +1,56 @@
 import os
+import gc
 import json
+import time
+
+import pandas as pd
 
 from pymedgraph.input.fetch_ncbi import NCBIFetcher
 from pymedgraph.dataextraction import StandardPubMedPipe, NERPipe, MedGenPipe, UniProtPipe
+from pymedgraph.scheduler import Stage, StageGraph, StageScheduler
+from pymedgraph.cache import ResultCache
+from pymedgraph.checkpoint import CheckpointStore
+from pymedgraph.metrics import start_trace, current_rss, peak_rss
 from pymedgraph.utils import store_medgen_genes_set
 
 
-class MedGraphManager(object):
+class RequestParser(object):
     """
-    Class to manage api requests and the data fetching and processing to build data tables for a neo4j Knowledge Graph.
-    The data processing are organised in pipelines, which are initialized by the initiation of this class.
-    The api request is handled by the method `MedGraphManager.construct_med_graph()`.
+    Class reads the config and parses and checks api requests, without the pipelines of the `MedGraphManager`. Used
+    by the api to check requests and build their keys, before they are queued for a manager.
+
+    Usage:
+        parser = RequestParser('localconfig.json')
+        disease, pipe_cfg = parser.parse_request(req_specs)
     """
 
     DISEASE = 'disease'
     REQUIRED_REQUEST_ARGS = [DISEASE, 'pipelines']
     PIPE_HIERARCHY = ['pubmed', 'ner', 'medGen', 'uniProt']
 
-    def __init__(self, config_path: str = 'localconfig.json', logger=None):
+    def __init__(self, config_path: str or dict = 'localconfig.json', logger=None):
         """
-        Inits MedGraphManager based and pipelines based on the passed config.
-        It is necessary to init the pipelines now, because of the great loading time of the NERPipe, meaning for one
-        the scispacy model but more importantly the `EntityLinker` which requires several minutes.
-
-        :param config_path: Takes credentials for NCBI databases and MedGenPipe specs
+        :param config_path: path to config file or config dict
         :param logger: logger
         """
-        # logger
         self.logger = logger
-
-        # read config
         self.cfg = self._read_config(config_path)
-        # init fetcher for api requests to pubmed
-        self.ncbi_fetcher = NCBIFetcher(
-            email=self.cfg['NCBI']['email'],
-            tool_name=self.cfg['NCBI']['tool_name'],
-            max_articles=self.cfg['NCBI']['max_articles']
-        )
-
-        # init pipelines
-        self.pubmed_pipe = StandardPubMedPipe()
-        self.ner_pipe = NERPipe(nlp_model='en_ner_bc5cdr_md', entity_linker='umls', depends_on='StandardPubMedPipe')
-        if self.cfg['pipes'].get('medgen'):
-            medgen_cfg = self.cfg['pipes']['medgen']
-            if 'medgen_list_path' in medgen_cfg.keys():
-                medgen_path = medgen_cfg['medgen_list_path']
-                if not os.path.isfile(medgen_path):
-                    store_medgen_genes_set(medgen_path, None)
-            self.medgen_pipe = MedGenPipe(self.ncbi_fetcher, depends_on='NERPipe', **medgen_cfg)
-        else:
-            self.medgen_pipe = MedGenPipe(self.ncbi_fetcher, depends_on='NERPipe')
-        self.uniprot_pipe = UniProtPipe(depends_on='MedGenPipe')
 
-    def construct_med_graph(self, request_json):
+    def parse_request(self, request_json) -> tuple:
         """
-        Main method of the class, which is called by the api. The calls every pipeline accordingly to the received
-        request specifications and collects the output.
-        The processing is as follows:
-        1. fetch data from Pubmed
-        2. StandardPubMedPipe: get data from basic info from response
-        3. NERPipe: extract CHEMICAl & DISEASE entities from abstracts and searches for UMLS concepts of DISEASE entities
-        4. MedGenPipe: collects promising UMLS Concept ID`s (CUI) and makes MedGen request plus extracts data
-        5. UniProtPipe: makes request based on genes from MedGenPipe and extracts Proteins + GenOntologies
-
-        The output of each pipe is a `pymedgraph.dataextraction.basepipe.PipeOutput` object containing n
-        `pymedgrapg.dataextraction.basepipe.NodeTable`. These objects are used for the neo4j upload.
-
-        :param request_json:
-            Json request passed from frontend.
+        Method parses and checks a single or batch request (with key `diseases`) without running it. Used to build
+        a normalized key of the request, see `pymedgraph.jobs.request_key()`.
 
-        :return: disease, outputs, delete_graph_flag:
-            Returns collected diseases and other outputs created by the pipelines.
+        :param request_json: Request in a Json-File or dict
+        :return: tuple - (search term or list of search terms, pipe config)
         """
-        outputs = list()
-        # get disease and possible filter
-        disease, pipe_cfg = self._parse_request(request_json)
-
-        if self.logger:
-            self.logger.info(f'*** START processing pipelines for \'{disease}\' ****')
-            self.logger.info('With pipe config: {cfg}'.format(cfg=pipe_cfg))
-
-        # get articles
-        pubmed_paper = self.ncbi_fetcher.get_pubmed_paper(
-            disease,
-            n_articles=pipe_cfg['n_articles'] if 'n_articles' in pipe_cfg.keys() else None
-        )
-
-        if self.logger:
-            self.logger.info('Successfully fetched pubmed articles.')
-
-        # build dataframe for pubmed data
-        pubmed_output = self.pubmed_pipe.run(
-            paper=pubmed_paper,
-            search_term=disease,
-            node_label='Paper',
-            mesh_terms=pipe_cfg['pipelines']['pubmed']['meshTerms']
-        )
-        outputs.append(pubmed_output)
-        if self.logger:
-            self.logger.info('Successfully extracted paper from response.')
-        # extract named entities and entity links to UMLS knowledgebase
-        ner_output = self.ner_pipe.run(
-            abstracts=pubmed_output.get_table('pubmedPaper'), id_col='pubmedID', abstract_col='abstract'
-        )
-        if self.logger:
-            self.logger.info('Successfully extracted entities from abstracts.')
-        outputs.append(ner_output)
-        df_entity = ner_output.get_table('Entities')
-        if 'medGen' in pipe_cfg['pipelines'].keys():
-            df_links = ner_output.get_table('UmlsLinks')
-            # fetch data from MedGen
-            medgen_output = self.medgen_pipe.run(
-                df_entities=df_entity,
-                df_links=df_links,
-                snomed=pipe_cfg['pipelines']['medGen']['Snomed'],
-                clinical_features=pipe_cfg['pipelines']['medGen']['clinicalFeatures']
-            )
-            outputs.append(medgen_output)
-            if self.logger:
-                self.logger.info('Successfully extracted medGen data.')
-        if 'uniProt' in pipe_cfg['pipelines'].keys():
-            genes = medgen_output.get_table('Genes')['gene'].tolist()
-            if genes:
-                uniprot_output = self.uniprot_pipe.run(genes=genes)
-                outputs.append(uniprot_output)
-                if self.logger:
-                    self.logger.info('Successfully extracted gene data from UniProt.')
-        return disease, outputs, pipe_cfg['delete_existing_graph']
+        if isinstance(request_json, dict):
+            request_data = request_json
+        else:
+            request_data = json.loads(request_json)
+        if 'diseases' in request_data:
+            return self._parse_batch_request(request_data)
+        return self._parse_request(request_data)
 
     def _parse_request(self, request_json: str) -> tuple:
         """
@@ -136,6 +60,8 @@ class MedGraphManager(object):
         example_json = {
                 'disease': 'phenylketonurie',
                 'n_articles': 100, # number of articles to be fetched
+                'reldate': 7, # optional, only used by refresh: fetch articles of the last n days
+                'use_cache': True, # optional, set False to ignore the result cache
                 'pipelines': {
                     'pubmed': {
                         'run': True,  # this database is required and must be set
@@ -172,6 +98,8 @@ class MedGraphManager(object):
         disease = request_data.pop(self.DISEASE)
         pipe_run_cfg['n_articles'] = request_data['n_articles'] if 'n_articles' in request_data.keys() else self.cfg['NCBI']['max_articles']
         pipe_run_cfg['delete_existing_graph'] = request_data['delete_graph'] if 'delete_graph' in request_data.keys() else False
+        pipe_run_cfg['reldate'] = request_data.get('reldate')
+        pipe_run_cfg['use_cache'] = request_data.get('use_cache', True)
         pipes = dict()
         for pipe, v in request_data['pipelines'].items():
             if v['run']:
@@ -190,6 +118,29 @@ class MedGraphManager(object):
 
         return disease.lower(), pipe_run_cfg
 
+    def _parse_batch_request(self, request_json) -> tuple:
+        """
+        Method parses a batch request, which contains a list of search terms under the key `diseases`. The rest of the
+        request is parsed and checked by `RequestParser._parse_request()`.
+
+        :param request_json: Request in a Json-File or dict
+        :return: tuple - (list of unique lower case search terms, pipe config)
+        """
+        if isinstance(request_json, dict):
+            request_data = request_json.copy()
+        else:
+            request_data = json.loads(request_json)
+        search_terms = request_data.pop('diseases', None)
+        if not search_terms or not isinstance(search_terms, list):
+            if self.logger:
+                self.logger.error('Batch request requires a non empty list of search terms under key \'diseases\'.')
+            raise RuntimeError('Batch request requires a non empty list of search terms under key \'diseases\'.')
+        request_data[self.DISEASE] = search_terms[0]
+        _, pipe_cfg = self._parse_request(request_data)
+        # remove duplicates but keep order
+        search_terms = list(dict.fromkeys(t.lower() for t in search_terms))
+        return search_terms, pipe_cfg
+
     def _read_config(self, cfg_path: str or dict) -> dict:
         """ Reads config file.
 
@@ -238,3 +189,732 @@ class MedGraphManager(object):
                         'Pipe \'{p}\' is set in request but required predecessor pipe \'{pp}\' is missing.'.format(
                         p=p, pp=rev_hierarchy[i+1]
                     ))
+
+
+class MedGraphManager(RequestParser):
+    """
+    Class to manage api requests and the data fetching and processing to build data tables for a neo4j Knowledge Graph.
+    The data processing are organised in pipelines, which are initialized by the initiation of this class.
+    The api request is handled by the method `MedGraphManager.construct_med_graph()`.
+    """
+
+    def __init__(self, config_path: str or dict = 'localconfig.json', logger=None):
+        """
+        Inits MedGraphManager based and pipelines based on the passed config.
+        It is necessary to init the pipelines now, because of the great loading time of the NERPipe, meaning for one
+        the scispacy model but more importantly the `EntityLinker` which requires several minutes.
+
+        :param config_path: Takes credentials for NCBI databases and MedGenPipe specs, or the config dict
+        :param logger: logger
+        """
+        # read config
+        super().__init__(config_path, logger=logger)
+        # init fetcher for api requests to pubmed
+        self.ncbi_fetcher = NCBIFetcher(
+            email=self.cfg['NCBI']['email'],
+            tool_name=self.cfg['NCBI']['tool_name'],
+            max_articles=self.cfg['NCBI']['max_articles']
+        )
+
+        # init pipelines
+        self.pubmed_pipe = StandardPubMedPipe()
+        self.ner_pipe = NERPipe(nlp_model='en_ner_bc5cdr_md', entity_linker='umls', depends_on='StandardPubMedPipe')
+        if self.cfg['pipes'].get('medgen'):
+            medgen_cfg = self.cfg['pipes']['medgen']
+            if 'medgen_list_path' in medgen_cfg.keys():
+                medgen_path = medgen_cfg['medgen_list_path']
+                if not os.path.isfile(medgen_path):
+                    store_medgen_genes_set(medgen_path, None)
+            self.medgen_pipe = MedGenPipe(self.ncbi_fetcher, depends_on='NERPipe', **medgen_cfg)
+        else:
+            self.medgen_pipe = MedGenPipe(self.ncbi_fetcher, depends_on='NERPipe')
+        self.uniprot_pipe = UniProtPipe(depends_on='MedGenPipe')
+        # stage name of each pipe in the stage graph
+        self.pipes = {
+            'pubmed': self.pubmed_pipe,
+            'ner': self.ner_pipe,
+            'medGen': self.medgen_pipe,
+            'uniProt': self.uniprot_pipe
+        }
+
+        # init scheduler for stage graph
+        self.scheduler = StageScheduler(logger=logger, **self.cfg.get('scheduler', {}))
+        self.stage_report = dict()
+        # init optional cache for outputs of identical requests
+        if self.cfg.get('cache'):
+            self.result_cache = ResultCache(logger=logger, **self.cfg['cache'])
+        else:
+            self.result_cache = None
+        # init optional checkpoints of stage results, to resume failed builds
+        if self.cfg.get('checkpoints'):
+            self.checkpoints = CheckpointStore(logger=logger, **self.cfg['checkpoints'])
+        else:
+            self.checkpoints = None
+
+    def construct_med_graph(self, request_json, uploader=None, progress=None, build_id: str = None):
+        """
+        Main method of the class, which is called by the api. The calls every pipeline accordingly to the received
+        request specifications and collects the output.
+        The processing is as follows:
+        1. fetch data from Pubmed
+        2. StandardPubMedPipe: get data from basic info from response
+        3. NERPipe: extract CHEMICAl & DISEASE entities from abstracts and searches for UMLS concepts of DISEASE entities
+        4. MedGenPipe: collects promising UMLS Concept ID`s (CUI) and makes MedGen request plus extracts data
+        5. UniProtPipe: makes request based on genes from MedGenPipe and extracts Proteins + GenOntologies
+
+        The output of each pipe is a `pymedgraph.dataextraction.basepipe.PipeOutput` object containing n
+        `pymedgrapg.dataextraction.basepipe.NodeTable`. These objects are used for the neo4j upload.
+
+        The steps are not called one after another, but are organised as stage graph (see
+        `MedGraphManager._build_stage_graph()`) and run by the `pymedgraph.scheduler.StageScheduler`. Stages without
+        dependency on each other run concurrently. Timings and the critical path of the last run are stored in
+        `MedGraphManager.stage_report`.
+
+        If an `uploader` is passed, each output is handed to it as soon as its pipe is finished, which allows to
+        upload the first outputs while the later pipes are still running.
+
+        :param request_json:
+            Json request passed from frontend.
+
+        :param uploader:
+            Object with the methods `start(disease, delete_graph)` and `submit(pipe_output)`, for instance
+            `pymedgraph.graph.uploadworker.UploadWorker`. The caller has to wait for the uploads to finish.
+
+        :param progress:
+            Object with the methods `on_stage_start(name)` and `on_stage_done(name, result)`, which are called for
+            every stage, for instance `pymedgraph.jobs.Job`.
+
+        :param build_id:
+            Id of the checkpoint of this build, if checkpoints are configured. A new id is generated if not set, the
+            id is part of `MedGraphManager.stage_report`. See `MedGraphManager.resume_med_graph()`.
+
+        :return: disease, outputs, delete_graph_flag:
+            Returns collected diseases and other outputs created by the pipelines.
+        """
+        # get disease and possible filter
+        disease, pipe_cfg = self._parse_request(request_json)
+
+        if self.logger:
+            self.logger.info(f'*** START processing pipelines for \'{disease}\' ****')
+            self.logger.info('With pipe config: {cfg}'.format(cfg=pipe_cfg))
+
+        with start_trace(f'buildGraph:{disease}', self.logger):
+            outputs = self._run_stage_graph(
+                self._build_stage_graph(disease, pipe_cfg), disease, pipe_cfg, uploader, progress=progress,
+                build_info=self._build_info(build_id, 'single', disease, pipe_cfg)
+            )
+        return disease, outputs, pipe_cfg['delete_existing_graph']
+
+    def construct_med_graph_chunked(self, request_json, uploader=None, progress=None):
+        """
+        Method builds the graph tables of a single search term in chunks of articles, which bounds the memory of
+        builds with very large article counts. Each chunk is fetched, passed through the StandardPubMedPipe and
+        NERPipe and its outputs are handed to the `uploader`, afterwards the chunk is released. Only the counts of the
+        DISEASE entities and the UMLS links selected for MedGen are kept over all chunks. MedGen and UniProt run once
+        after the last chunk, as in `MedGraphManager.construct_med_graph()`.
+
+        The chunk size is taken from `chunk_size` of the request or from the `chunking` config:
+            "chunking": {
+                "chunk_size": 1000,             # articles per chunk
+                "memory_budget": 2000000000     # optional, bytes of resident memory, the chunk size is halved if
+                                                # the process exceeds it after a chunk
+            }
+        The uploader should have a bounded queue (see `UploadWorker(max_pending=...)`), so a slow upload does not
+        pile up chunks in memory. Without uploader the outputs of all chunks are returned, so the memory is not bounded.
+        Chunk timings and memory are stored in `MedGraphManager.stage_report`. The result cache and checkpoints are not
+        used by chunked builds.
+
+        :param request_json: Json request, see `MedGraphManager.construct_med_graph()`, can contain `chunk_size`
+        :param uploader: see `MedGraphManager.construct_med_graph()`
+        :param progress: see `MedGraphManager.construct_med_graph()`, chunks are reported as stage `chunk:<n>`
+        :return: disease, outputs, delete_graph_flag - outputs contain only the outputs of MedGen and UniProt, if an
+        uploader is passed
+        """
+        disease, pipe_cfg = self._parse_request(request_json)
+        request_data = request_json if isinstance(request_json, dict) else json.loads(request_json)
+        chunk_cfg = self.cfg.get('chunking', {})
+        chunk_size = int(request_data.get('chunk_size') or chunk_cfg.get('chunk_size', 1000))
+        memory_budget = chunk_cfg.get('memory_budget')
+        pipelines = pipe_cfg['pipelines']
+        if chunk_size < 1:
+            if self.logger:
+                self.logger.error(f'Chunk size must be positive, got {chunk_size}.')
+            raise RuntimeError(f'Chunk size must be positive, got {chunk_size}.')
+
+        with start_trace(f'buildGraphChunked:{disease}', self.logger):
+            start = time.time()
+            stages = dict()
+            chunks = list()
+            outputs = list()
+            # DISEASE mentions and UMLS links of all chunks to select the CUI`s for MedGen
+            entity_counts = pd.Series(dtype='int64')
+            links = list()
+
+            uids = [str(uid) for uid in self.ncbi_fetcher.search_pubmed(disease, pipe_cfg['n_articles'])]
+            if self.logger:
+                self.logger.info(
+                    f'*** START chunked processing for \'{disease}\' with {len(uids)} articles in chunks of '
+                    f'{chunk_size} ***'
+                )
+            if uploader is not None:
+                uploader.start(disease, pipe_cfg['delete_existing_graph'])
+
+            pos = 0
+            while pos < len(uids):
+                name = f'chunk:{len(chunks)}'
+                chunk_ids = uids[pos:pos + chunk_size]
+                pos += len(chunk_ids)
+                if progress is not None:
+                    progress.on_stage_start(name)
+                chunk_start = time.time()
+                pubmed_output = self.pubmed_pipe.run(
+                    paper=self.ncbi_fetcher.fetch_pubmed_paper(chunk_ids),
+                    search_term=disease,
+                    node_label='Paper',
+                    mesh_terms=pipelines['pubmed']['meshTerms']
+                )
+                chunk_outputs = [pubmed_output]
+                if 'ner' in pipelines:
+                    ner_output = self.ner_pipe.run(
+                        abstracts=pubmed_output.get_table('pubmedPaper').drop_duplicates(subset=['pubmedID']),
+                        id_col='pubmedID',
+                        abstract_col='abstract'
+                    )
+                    chunk_outputs.append(ner_output)
+                    if 'medGen' in pipelines:
+                        entity_counts, chunk_links = self._aggregate_entities(entity_counts, ner_output)
+                        links.append(chunk_links)
+                for output in chunk_outputs:
+                    if self.cfg.get('tables', {}).get('compact'):
+                        for node_table in output.node_tables:
+                            node_table.compact()
+                    if uploader is not None:
+                        uploader.submit(output)
+                    else:
+                        outputs.append(output)
+                if progress is not None:
+                    progress.on_stage_done(name, None)
+                # release chunk before fetching the next one
+                del pubmed_output, chunk_outputs, output
+                if 'ner' in pipelines:
+                    del ner_output
+                gc.collect()
+
+                rss = current_rss()
+                duration = time.time() - chunk_start
+                stages[name] = {'start': chunk_start - start, 'duration': duration, 'status': 'done'}
+                chunks.append({'articles': len(chunk_ids), 'chunk_size': chunk_size, 'seconds': duration, 'rss': rss})
+                if self.logger:
+                    self.logger.info(f'Finished {name} with {len(chunk_ids)} articles in {duration:.3f}s, '
+                                     f'rss {rss / 1e6:.1f}MB.')
+                if memory_budget and rss > memory_budget and chunk_size > 1:
+                    chunk_size = max(1, chunk_size // 2)
+                    if self.logger:
+                        self.logger.warning(f'Memory of {rss} bytes exceeds budget of {memory_budget} bytes, '
+                                            f'reduced chunk size to {chunk_size}.')
+
+            final_outputs = self._run_final_stages(disease, pipe_cfg, entity_counts, links, stages, start, progress)
+            for output in final_outputs:
+                if uploader is not None:
+                    uploader.submit(output)
+                outputs.append(output)
+
+        wall_time = time.time() - start
+        self.stage_report = {
+            'wall_time': wall_time, 'stages': stages, 'critical_path': list(stages.keys()),
+            'critical_path_time': wall_time, 'parallelism': 1., 'cache_hit': False, 'build_id': None,
+            'chunks': chunks, 'peak_rss': peak_rss()
+        }
+        if self.logger:
+            self.logger.info(f'Finished {len(chunks)} chunks and final stages in {wall_time:.3f}s, '
+                             f'peak rss {self.stage_report["peak_rss"] / 1e6:.1f}MB.')
+        return disease, outputs, pipe_cfg['delete_existing_graph']
+
+    @staticmethod
+    def _aggregate_entities(entity_counts: pd.Series, ner_output) -> tuple:
+        """
+        Method adds the DISEASE mentions of a NERPipe output to `entity_counts` and returns the UMLS links, which can
+        be selected by `MedGenPipe._select_cui()`.
+
+        :param entity_counts: pd.Series - mentions per entity text of the previous chunks
+        :param ner_output: PipeOutput of NERPipe
+        :return: tuple - (updated entity counts, pd.DataFrame of links with `kb_score` > 0.85)
+        """
+        df_entities = ner_output.get_table('Entities')
+        chunk_counts = df_entities.loc[df_entities['node_label'] == 'DISEASE', 'text'].value_counts()
+        entity_counts = entity_counts.add(chunk_counts, fill_value=0).astype('int64')
+        df_links = ner_output.get_table('UmlsLinks')
+        if not isinstance(df_links, pd.DataFrame):
+            # NERPipe ran without entity links
+            return entity_counts, None
+        df_links = df_links.loc[df_links['kb_score'] > 0.85, ['source', 'CUI', 'kb_score']]
+        return entity_counts, df_links.drop_duplicates(subset=['source', 'CUI']).reset_index(drop=True)
+
+    def _run_final_stages(self, disease: str, pipe_cfg: dict, entity_counts: pd.Series, links: list, stages: dict,
+                          start: float, progress=None) -> list:
+        """ Runs MedGen and UniProt stages of a chunked build one after another, returns their outputs """
+        pipelines = pipe_cfg['pipelines']
+        if 'medGen' not in pipelines:
+            return list()
+        medgen_cfg = pipelines['medGen']
+        links = [df for df in links if df is not None]
+        df_links = pd.concat(links).drop_duplicates(subset=['source', 'CUI']) if links else \
+            pd.DataFrame(columns=['source', 'CUI', 'kb_score'])
+
+        def run_stage(name, func):
+            if progress is not None:
+                progress.on_stage_start(name)
+            stage_start = time.time()
+            result = func()
+            stages[name] = {'start': stage_start - start, 'duration': time.time() - stage_start, 'status': 'done'}
+            if progress is not None:
+                progress.on_stage_done(name, result)
+            return result
+
+        summaries = run_stage('medGenFetch', lambda: self.medgen_pipe.fetch_summaries(
+            df_entities=None,
+            df_links=df_links,
+            snomed=medgen_cfg['Snomed'],
+            clinical_features=medgen_cfg['clinicalFeatures'],
+            entity_counts=entity_counts
+        ))
+        medgen_output = run_stage('medGen', lambda: self.medgen_pipe.run(summaries=summaries, tables=['Genes']))
+        outputs = [medgen_output]
+        if medgen_cfg['Snomed'] or medgen_cfg['clinicalFeatures']:
+            outputs.append(run_stage('medGenConcepts', lambda: self.medgen_pipe.run(
+                summaries=summaries,
+                snomed=medgen_cfg['Snomed'],
+                clinical_features=medgen_cfg['clinicalFeatures'],
+                tables=['Snomed', 'ClinicalFeats']
+            )))
+        if 'uniProt' in pipelines:
+            uniprot_output = run_stage(
+                'uniProt', lambda: self._run_uniprot(medgen_output.get_table('Genes')['gene'].tolist())
+            )
+            if uniprot_output is not None:
+                outputs.append(uniprot_output)
+        return outputs
+
+    def construct_med_graph_batch(self, request_json, uploader=None, progress=None, build_id: str = None):
+        """
+        Method builds the graph tables for a list of search terms at once. The request has the same structure as for
+        `MedGraphManager.construct_med_graph()`, but contains the key `diseases` with a list of search terms instead of
+        `disease`.
+
+        Compared to one `construct_med_graph()` call per search term, the work is shared between the search terms:
+        1. the PubMed UID`s are searched for each term, but each article is fetched and NER'd only once
+        2. the CUI`s are selected for each term, but MedGen is requested once for the union of the CUI`s
+        3. UniProt is requested once for all found genes
+        The returned outputs contain the tables of all search terms, so the upload shares its batches, too.
+
+        :param request_json: Json request with `diseases` list
+        :param uploader: see `MedGraphManager.construct_med_graph()`
+        :param progress: see `MedGraphManager.construct_med_graph()`
+        :param build_id: see `MedGraphManager.construct_med_graph()`
+        :return: search_terms, outputs, delete_graph_flag
+        """
+        search_terms, pipe_cfg = self._parse_batch_request(request_json)
+
+        if self.logger:
+            self.logger.info(f'*** START processing pipelines for batch of {len(search_terms)} search terms ****')
+            self.logger.info('With pipe config: {cfg}'.format(cfg=pipe_cfg))
+
+        with start_trace(f'buildGraphBatch:{len(search_terms)}', self.logger):
+            graph = self._build_stage_graph(search_terms[0], pipe_cfg, search_terms=search_terms)
+            outputs = self._run_stage_graph(
+                graph, search_terms, pipe_cfg, uploader, progress=progress,
+                build_info=self._build_info(build_id, 'batch', search_terms, pipe_cfg)
+            )
+        return search_terms, outputs, pipe_cfg['delete_existing_graph']
+
+    def refresh_med_graph(self, request_json, search_term_state: dict = None, uploader=None, build_id: str = None):
+        """
+        Method runs an incremental build for an existing search term. Only articles, which are not yet part of the
+        graph, are fetched and processed by the pipes. The uploaded nodes and relations are merged into the existing
+        graph, the existing graph is never deleted.
+
+        The new articles are searched with the Entrez date filter: either the request contains `reldate` (number of
+        days) or the date of the last build is used as `mindate`. Articles, whose ids are already stored on the
+        SearchTerm node, are removed from the result.
+
+        :param request_json: Json request, see `MedGraphManager.construct_med_graph()`, can contain `reldate`
+        :param search_term_state: dict - returned by `Neo4jConnector.get_search_term_state()`, None for new terms
+        :param uploader: see `MedGraphManager.construct_med_graph()`
+        :param build_id: see `MedGraphManager.construct_med_graph()`
+        :return: disease, outputs, new_ids - list of PubMed UID`s of the processed articles
+        """
+        disease, pipe_cfg = self._parse_request(request_json)
+        pipe_cfg['delete_existing_graph'] = False
+        known_ids = set(search_term_state['ids']) if search_term_state else set()
+        mindate = None
+        if not pipe_cfg['reldate'] and search_term_state and search_term_state['last_build']:
+            mindate = time.strftime('%Y/%m/%d', time.gmtime(search_term_state['last_build']))
+
+        with start_trace(f'refreshGraph:{disease}', self.logger):
+            uids = self.ncbi_fetcher.search_pubmed(
+                disease, pipe_cfg['n_articles'], mindate=mindate, reldate=pipe_cfg['reldate']
+            )
+            new_ids = [str(uid) for uid in uids if f'pubmed~{uid}' not in known_ids]
+            if self.logger:
+                self.logger.info(
+                    f'*** START refresh for \'{disease}\' with {len(new_ids)} new of {len(uids)} found articles ***'
+                )
+            if not new_ids:
+                return disease, list(), new_ids
+
+            graph = self._build_stage_graph(disease, pipe_cfg, paper_ids=new_ids)
+            outputs = self._run_stage_graph(
+                graph, disease, pipe_cfg, uploader, use_cache=False,
+                build_info=self._build_info(build_id, 'refresh', disease, pipe_cfg, paper_ids=new_ids)
+            )
+        return disease, outputs, new_ids
+
+    def resume_med_graph(self, build_id: str, uploader=None, progress=None, upload_only: bool = False):
+        """
+        Method resumes a build from its checkpoint. Finished stages are loaded from disk and only the missing stages
+        are run. Since the upload merges nodes and relations, all outputs are handed to the uploader again, the
+        outputs of finished stages first.
+
+        :param build_id: str - id of build, see `MedGraphManager.construct_med_graph()`
+        :param uploader: see `MedGraphManager.construct_med_graph()`
+        :param progress: see `MedGraphManager.construct_med_graph()`
+        :param upload_only: bool - flag to only hand the outputs of the checkpoint to the uploader, raises a
+        RuntimeError if the checkpoint is incomplete
+        :return: disease, outputs, delete_graph_flag - disease is a list for batch builds
+        """
+        if self.checkpoints is None:
+            raise RuntimeError('Resume requires checkpoints, add \'checkpoints\' to the config.')
+        build, completed = self.checkpoints.load(build_id)
+        info = build['info']
+        disease, pipe_cfg = info['disease'], info['pipe_cfg']
+        graph = self._build_stage_graph(
+            disease if info['mode'] != 'batch' else disease[0], pipe_cfg,
+            search_terms=disease if info['mode'] == 'batch' else None, paper_ids=info.get('paper_ids')
+        )
+        missing = [s for s in graph.topological_order() if s not in completed]
+        if self.logger:
+            self.logger.info(f'*** RESUME build \'{build_id}\' for \'{disease}\', missing stages: {missing} ***')
+
+        with start_trace(f'resumeGraph:{build_id}', self.logger):
+            if upload_only:
+                if missing:
+                    raise RuntimeError(f'Checkpoint of build \'{build_id}\' misses the stages {missing}.')
+                outputs = self._collect_outputs(graph, completed)
+                if uploader is not None:
+                    uploader.start(disease, pipe_cfg['delete_existing_graph'])
+                    for output in outputs:
+                        uploader.submit(output)
+                self.stage_report = {
+                    'wall_time': 0., 'stages': dict(), 'critical_path': list(), 'critical_path_time': 0.,
+                    'parallelism': 0., 'cache_hit': False, 'build_id': build_id
+                }
+            else:
+                outputs = self._run_stage_graph(
+                    graph, disease, pipe_cfg, uploader, use_cache=False, progress=progress,
+                    build_info={'build_id': build_id, 'resume': True}, completed=completed
+                )
+        return disease, outputs, pipe_cfg['delete_existing_graph']
+
+    def _build_info(self, build_id: str, mode: str, disease, pipe_cfg: dict, paper_ids: list = None) -> dict or None:
+        """ Returns the info to create a checkpoint, None if checkpoints are not configured """
+        if self.checkpoints is None:
+            return None
+        return {
+            'build_id': build_id or self.checkpoints.new_build_id(),
+            'mode': mode,
+            'disease': disease,
+            'pipe_cfg': pipe_cfg,
+            'paper_ids': paper_ids
+        }
+
+    def _run_stage_graph(self, graph: StageGraph, disease, pipe_cfg: dict, uploader=None,
+                         use_cache: bool = True, progress=None, build_info: dict = None,
+                         completed: dict = None) -> list:
+        """
+        Method runs the stage graph with the scheduler and returns the collected outputs.
+
+        If the result cache is configured, the outputs of an identical previous request are returned without running
+        the stage graph, otherwise the new outputs are stored in the cache.
+
+        :param graph: StageGraph
+        :param disease: str or list - search term(s), passed to the uploader
+        :param pipe_cfg: dict - parsed pipe config
+        :param uploader: see `MedGraphManager.construct_med_graph()`
+        :param use_cache: bool - flag if result cache shall be used
+        :param progress: see `MedGraphManager.construct_med_graph()`
+        :param build_info: dict - checkpoint info, see `MedGraphManager._build_info()`, the result of each stage is
+        saved to the checkpoint of `build_info['build_id']`. If `resume` is set, the checkpoint already exists.
+        :param completed: dict - results of finished stages of a resumed build, their outputs are submitted first
+        :return: list - PipeOutput objects
+        """
+        cache_key = None
+        if use_cache and self.result_cache is not None and pipe_cfg['use_cache']:
+            cache_key = self.result_cache.key(disease, pipe_cfg)
+            start = time.time()
+            outputs = self.result_cache.get(cache_key)
+            if outputs is not None:
+                if progress is not None:
+                    progress.on_stage_start('cache')
+                if uploader is not None:
+                    uploader.start(disease, pipe_cfg['delete_existing_graph'])
+                    for output in outputs:
+                        uploader.submit(output)
+                self.stage_report = {
+                    'wall_time': time.time() - start, 'stages': dict(), 'critical_path': list(),
+                    'critical_path_time': 0., 'parallelism': 0., 'cache_hit': True
+                }
+                if progress is not None:
+                    progress.on_stage_done('cache', outputs)
+                if self.logger:
+                    self.logger.info(f'Loaded {len(outputs)} outputs from result cache.')
+                return outputs
+
+        callbacks = list()
+        if uploader is not None:
+            uploader.start(disease, pipe_cfg['delete_existing_graph'])
+            if completed:
+                for output in self._collect_outputs(graph, completed):
+                    uploader.submit(output)
+            callbacks.append(self._output_handler(graph, uploader))
+        build_id = None
+        if build_info is not None:
+            build_id = build_info['build_id']
+            if not build_info.get('resume'):
+                self.checkpoints.create(build_id, {k: v for k, v in build_info.items() if k != 'build_id'})
+            else:
+                self.checkpoints.set_status(build_id, CheckpointStore.RUNNING)
+            callbacks.append(lambda name, result: self.checkpoints.save_stage(build_id, name, result))
+            if self.logger:
+                self.logger.info(f'Saving checkpoints of build \'{build_id}\'.')
+        if progress is not None:
+            callbacks.append(progress.on_stage_done)
+
+        def on_stage_done(name, result):
+            for callback in callbacks:
+                callback(name, result)
+
+        try:
+            results = self.scheduler.run(
+                graph, on_stage_done=on_stage_done, on_stage_start=progress.on_stage_start if progress else None,
+                completed=completed
+            )
+        except Exception as ex:
+            if build_id is not None:
+                self.checkpoints.set_status(build_id, CheckpointStore.FAILED, str(ex))
+                if self.logger:
+                    self.logger.error(f'Build failed, resume with build id \'{build_id}\'.')
+            raise
+        if build_id is not None:
+            self.checkpoints.set_status(build_id, CheckpointStore.DONE)
+        outputs = self._collect_outputs(graph, results)
+        self.stage_report = dict(self.scheduler.report, cache_hit=False, build_id=build_id)
+        if cache_key is not None:
+            # the outputs are built and uploaded already, a failed cache write must not fail the build
+            try:
+                self.result_cache.put(cache_key, outputs, info={'disease': disease})
+            except Exception as ex:
+                if self.logger:
+                    self.logger.warning(f'Could not store outputs in result cache: {ex}')
+        if self.logger:
+            self.logger.info('Finished pipelines in {t:.3f}s with critical path {cp} ({cpt:.3f}s).'.format(
+                t=self.stage_report['wall_time'], cp=self.stage_report['critical_path'],
+                cpt=self.stage_report['critical_path_time']
+            ))
+            self.logger.info('Stage timings: {st}'.format(st={
+                k: round(v['duration'], 3) for k, v in self.stage_report['stages'].items()
+            }))
+        return outputs
+
+    def _build_stage_graph(self, disease: str, pipe_cfg: dict, search_terms: list = None,
+                           paper_ids: list = None) -> StageGraph:
+        """
+        Method builds the stage graph for one request. The dependencies between the pipe stages are taken from the
+        `depends_on` attribute of each pipe. The MedGen pipe is split into the request + parsing of MedGen summaries
+        and the building of the tables, which allows the UniProt request to run as soon as the genes are known,
+        while the SnomedConcept and ClinicalFeature tables are built in parallel. The MeSH terms are extracted from the
+        fetched articles while the NERPipe runs and are added to the paper table by the output stage `paper`.
+
+        Stage graph of a full request:
+            fetch -> pubmed -> ner -> medGenFetch -> medGen -> uniProt
+              |        |                          -> medGenConcepts
+              |        -> paper
+              -> mesh  -> paper
+
+        For a batch of `search_terms` the fetch stage searches the UID`s of every term and fetches the union of them,
+        the other stages work on the tables of all terms.
+
+        :param disease: str - search term
+        :param pipe_cfg: dict - parsed pipe config, see `RequestParser._parse_request()`
+        :param search_terms: list - search terms of a batch request, `disease` is ignored if set
+        :param paper_ids: list - PubMed UID`s to fetch instead of searching for `disease`
+        :return: StageGraph
+        """
+        pipelines = pipe_cfg['pipelines']
+        graph = StageGraph()
+
+        # get articles
+        if paper_ids is not None:
+            fetch_func = lambda inputs: (self.ncbi_fetcher.fetch_pubmed_paper(paper_ids), None)
+        elif search_terms is None:
+            fetch_func = lambda inputs: (
+                self.ncbi_fetcher.get_pubmed_paper(disease, n_articles=pipe_cfg['n_articles']), None
+            )
+        else:
+            fetch_func = lambda inputs: self._fetch_batch_paper(search_terms, pipe_cfg['n_articles'])
+        graph.add(Stage('fetch', fetch_func))
+        # build dataframe for pubmed data, the MeSH terms are extracted in their own stage
+        mesh_terms = pipelines['pubmed']['meshTerms']
+        graph.add(Stage(
+            'pubmed',
+            lambda inputs: self.pubmed_pipe.run(
+                paper=inputs['fetch'][0],
+                search_term=disease,
+                node_label='Paper',
+                paper_terms=inputs['fetch'][1]
+            ),
+            depends_on=['fetch'] + self._stage_dependencies(self.pubmed_pipe),
+            output=not mesh_terms
+        ))
+        if mesh_terms:
+            graph.add(Stage(
+                'mesh', lambda inputs: self.pubmed_pipe.extract_mesh_terms(inputs['fetch'][0]), depends_on=['fetch']
+            ))
+            graph.add(Stage(
+                'paper',
+                lambda inputs: self.pubmed_pipe.add_mesh_terms(inputs['pubmed'], inputs['mesh']),
+                depends_on=['pubmed', 'mesh'],
+                output=True
+            ))
+        # extract named entities and entity links to UMLS knowledgebase, each paper only once
+        graph.add(Stage(
+            'ner',
+            lambda inputs: self.ner_pipe.run(
+                abstracts=inputs['pubmed'].get_table('pubmedPaper').drop_duplicates(subset=['pubmedID']),
+                id_col='pubmedID',
+                abstract_col='abstract'
+            ),
+            depends_on=self._stage_dependencies(self.ner_pipe),
+            output=True
+        ))
+        if 'medGen' in pipelines.keys():
+            medgen_cfg = pipelines['medGen']
+            medgen_deps = self._stage_dependencies(self.medgen_pipe)
+            if search_terms is not None and 'pubmed' not in medgen_deps:
+                medgen_deps = medgen_deps + ['pubmed']
+            # fetch data from MedGen
+            graph.add(Stage(
+                'medGenFetch',
+                lambda inputs: self.medgen_pipe.fetch_summaries(
+                    df_entities=inputs[medgen_deps[0]].get_table('Entities'),
+                    df_links=inputs[medgen_deps[0]].get_table('UmlsLinks'),
+                    snomed=medgen_cfg['Snomed'],
+                    clinical_features=medgen_cfg['clinicalFeatures'],
+                    entity_groups=self._paper_groups(inputs['pubmed'], search_terms) if search_terms else None
+                ),
+                depends_on=medgen_deps
+            ))
+            graph.add(Stage(
+                'medGen',
+                lambda inputs: self.medgen_pipe.run(summaries=inputs['medGenFetch'], tables=['Genes']),
+                depends_on=['medGenFetch'],
+                output=True
+            ))
+            if medgen_cfg['Snomed'] or medgen_cfg['clinicalFeatures']:
+                graph.add(Stage(
+                    'medGenConcepts',
+                    lambda inputs: self.medgen_pipe.run(
+                        summaries=inputs['medGenFetch'],
+                        snomed=medgen_cfg['Snomed'],
+                        clinical_features=medgen_cfg['clinicalFeatures'],
+                        tables=['Snomed', 'ClinicalFeats']
+                    ),
+                    depends_on=['medGenFetch'],
+                    output=True
+                ))
+        if 'uniProt' in pipelines.keys():
+            uniprot_deps = self._stage_dependencies(self.uniprot_pipe)
+            graph.add(Stage(
+                'uniProt',
+                lambda inputs: self._run_uniprot(inputs[uniprot_deps[0]].get_table('Genes')['gene'].tolist()),
+                depends_on=uniprot_deps,
+                output=True
+            ))
+        if self.cfg.get('tables', {}).get('compact'):
+            for stage in graph.stages.values():
+                if stage.output:
+                    stage.func = self._compact_output(stage.func)
+        return graph
+
+    @staticmethod
+    def _compact_output(func):
+        """ Wraps function of an output stage, the NodeTables of the returned PipeOutput are compacted """
+        def compact_func(inputs):
+            output = func(inputs)
+            if output is not None:
+                for node_table in output.node_tables:
+                    node_table.compact()
+            return output
+        return compact_func
+
+    def _fetch_batch_paper(self, search_terms: list, n_articles: int) -> tuple:
+        """
+        Method searches the PubMed UID`s for each search term and fetches every article only once.
+
+        :param search_terms: list - search terms
+        :param n_articles: int - number of articles per search term
+        :return: tuple - (list of articles, dict UID -> list of search terms)
+        """
+        paper_terms = dict()
+        for term in search_terms:
+            for uid in self.ncbi_fetcher.search_pubmed(term, n_articles):
+                paper_terms.setdefault(str(uid), list()).append(term)
+        if self.logger:
+            self.logger.info('Found {n} unique articles for {t} search terms.'.format(
+                n=len(paper_terms), t=len(search_terms)))
+        return self.ncbi_fetcher.fetch_pubmed_paper(list(paper_terms.keys())), paper_terms
+
+    @staticmethod
+    def _paper_groups(pubmed_output, search_terms: list) -> list:
+        """ Returns list of paper ids for each search term from the pubmedPaper table """
+        df = pubmed_output.get_table('pubmedPaper')
+        return [df.loc[df['source'] == term, 'pubmedID'].tolist() for term in search_terms]
+
+    def _run_uniprot(self, genes: list):
+        """ Runs UniProtPipe, returns None if there are no genes to request """
+        if not genes:
+            return None
+        return self.uniprot_pipe.run(genes=genes)
+
+    def _stage_dependencies(self, pipe) -> list:
+        """
+        Method maps `BasePipe.depends_on` (name of pipe or list of names) to the stage names of the stage graph.
+
+        :param pipe: pymedgraph.dataextraction.basepipe.BasePipe
+        :return: list - stage names
+        """
+        if not pipe.depends_on:
+            return list()
+        depends_on = [pipe.depends_on] if isinstance(pipe.depends_on, str) else pipe.depends_on
+        stage_names = {p.name: stage for stage, p in self.pipes.items()}
+        unknown = [d for d in depends_on if d not in stage_names]
+        if unknown:
+            if self.logger:
+                self.logger.error(f'Pipe \'{pipe.name}\' depends on unknown pipes: {unknown}')
+            raise RuntimeError(f'Pipe \'{pipe.name}\' depends on unknown pipes: {unknown}')
+        return [stage_names[d] for d in depends_on]
+
+    @staticmethod
+    def _output_handler(graph: StageGraph, uploader):
+        """ Returns callback for `StageScheduler.run()`, which submits the output of finished pipe stages """
+        def on_stage_done(name, result):
+            if graph.stages[name].output and result is not None:
+                uploader.submit(result)
+        return on_stage_done
+
+    @staticmethod
+    def _collect_outputs(graph: StageGraph, results: dict) -> list:
+        """ Returns PipeOutputs of output stages in topological order of the stage graph """
+        return [
+            results[name] for name in graph.topological_order()
+            if graph.stages[name].output and results.get(name) is not None
+        ]
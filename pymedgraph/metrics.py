@@ -0,0 +1,233 @@
+"""
+Performance instrumentation of `pymedgraph`.
+
+Every instrumented step (fetch, pipe run, table build, upload query, ...) is wrapped with `measure()`, which records
+wall time, rows in and out, fetched bytes and the peak memory of the process. The measurements are aggregated in the
+global `REGISTRY`, which renders them in the Prometheus text format (see `/metrics` route of the api), and are added to
+the active `Trace`, which summarises one request in the log.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+
+_ACTIVE_TRACE = contextvars.ContextVar('pymedgraph_trace', default=None)
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def peak_rss() -> int:
+    """ Returns peak resident set size of the process in bytes, 0 if unknown """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def current_rss() -> int:
+    """ Returns current resident set size of the process in bytes, 0 if unknown (only read on linux) """
+    try:
+        with open('/proc/self/statm', 'r') as fh:
+            pages = int(fh.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return pages * _PAGE_SIZE
+
+
+class Measurement(object):
+    """ Values of one measured step. `rows_in`, `rows_out` and `bytes` are set by the measured code """
+    def __init__(self, name: str, kind: str, rows_in: int = 0):
+        self.name = name
+        self.kind = kind
+        self.rows_in = rows_in
+        self.rows_out = 0
+        self.bytes = 0
+        self.wall_time = 0.
+        self.peak_memory = 0
+        self.failed = False
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'wall_time': self.wall_time,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes': self.bytes,
+            'peak_memory': self.peak_memory,
+            'failed': self.failed
+        }
+
+
+class MetricsRegistry(object):
+    """
+    Class aggregates measurements per (kind, name) and renders them in the Prometheus text format.
+    """
+    PREFIX = 'pymedgraph'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = dict()
+
+    def observe(self, m: Measurement):
+        with self._lock:
+            key = (m.kind, m.name)
+            if key not in self._metrics:
+                self._metrics[key] = {
+                    'count': 0, 'seconds': 0., 'max_seconds': 0., 'rows_in': 0, 'rows_out': 0, 'bytes': 0,
+                    'failures': 0, 'peak_memory': 0
+                }
+            metric = self._metrics[key]
+            metric['count'] += 1
+            metric['seconds'] += m.wall_time
+            metric['max_seconds'] = max(metric['max_seconds'], m.wall_time)
+            metric['rows_in'] += m.rows_in
+            metric['rows_out'] += m.rows_out
+            metric['bytes'] += m.bytes
+            metric['failures'] += int(m.failed)
+            metric['peak_memory'] = max(metric['peak_memory'], m.peak_memory)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: dict(v) for k, v in self._metrics.items()}
+
+    def reset(self):
+        with self._lock:
+            self._metrics = dict()
+
+    def render(self) -> str:
+        """ Returns all metrics in the Prometheus text exposition format (version 0.0.4) """
+        metrics = self.snapshot()
+        families = [
+            ('step_seconds', 'summary', 'Wall time of instrumented steps.', None),
+            ('step_max_seconds', 'gauge', 'Maximum wall time of a single step.', 'max_seconds'),
+            ('step_rows_in_total', 'counter', 'Rows passed into steps.', 'rows_in'),
+            ('step_rows_out_total', 'counter', 'Rows returned by steps.', 'rows_out'),
+            ('step_bytes_total', 'counter', 'Bytes fetched by steps.', 'bytes'),
+            ('step_failures_total', 'counter', 'Failed steps.', 'failures'),
+            ('step_peak_memory_bytes', 'gauge', 'Peak resident memory of the process at the end of steps.',
+             'peak_memory')
+        ]
+        lines = list()
+        for name, metric_type, help_text, field in families:
+            full_name = f'{self.PREFIX}_{name}'
+            lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} {metric_type}')
+            for (kind, step), values in sorted(metrics.items()):
+                labels = '{{kind="{k}",name="{n}"}}'.format(k=_escape(kind), n=_escape(step))
+                if field is None:
+                    lines.append(f'{full_name}_count{labels} {values["count"]}')
+                    lines.append(f'{full_name}_sum{labels} {values["seconds"]}')
+                else:
+                    lines.append(f'{full_name}{labels} {values[field]}')
+        lines.append(f'# HELP {self.PREFIX}_process_peak_rss_bytes Peak resident memory of the process.')
+        lines.append(f'# TYPE {self.PREFIX}_process_peak_rss_bytes gauge')
+        lines.append(f'{self.PREFIX}_process_peak_rss_bytes {peak_rss()}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Trace(object):
+    """ Class collects the measurements of one request, e.g. one `/buildGraph` call """
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.time()
+        self.measurements = list()
+        self._lock = threading.Lock()
+
+    def add(self, m: Measurement):
+        with self._lock:
+            self.measurements.append(m)
+
+    def summary(self) -> dict:
+        """ Returns wall time of request and measurements aggregated per (kind, name) """
+        steps = dict()
+        with self._lock:
+            for m in self.measurements:
+                key = f'{m.kind}:{m.name}'
+                if key not in steps:
+                    steps[key] = {'count': 0, 'seconds': 0., 'rows_in': 0, 'rows_out': 0, 'bytes': 0}
+                steps[key]['count'] += 1
+                steps[key]['seconds'] = round(steps[key]['seconds'] + m.wall_time, 4)
+                steps[key]['rows_in'] += m.rows_in
+                steps[key]['rows_out'] += m.rows_out
+                steps[key]['bytes'] += m.bytes
+        return {
+            'trace': self.name,
+            'wall_time': round(time.time() - self.start, 4),
+            'peak_rss': peak_rss(),
+            'steps': steps
+        }
+
+
+@contextmanager
+def start_trace(name: str, logger=None):
+    """
+    Context manager activates a new trace for the current context. Measurements of threads started by the
+    `pymedgraph.scheduler.StageScheduler` or the `pymedgraph.graph.uploadworker.UploadWorker` are added, too.
+    If a trace is already active, it is reused and only the outermost trace writes its summary to the log.
+
+    :param name: str - name of trace, e.g. 'buildGraph:phenylketonuria'
+    :param logger: logging.logger
+    """
+    active = _ACTIVE_TRACE.get()
+    if active is not None:
+        yield active
+        return
+    trace = Trace(name)
+    token = _ACTIVE_TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        _ACTIVE_TRACE.reset(token)
+        if logger:
+            logger.info('Trace summary: {s}'.format(s=json.dumps(trace.summary())))
+
+
+@contextmanager
+def measure(name: str, kind: str = 'stage', rows_in: int = 0, registry: MetricsRegistry = None):
+    """
+    Context manager to measure a step. The yielded `Measurement` can be used to set `rows_out` and `bytes`.
+
+    Usage:
+        with measure('efetch', kind='fetch', rows_in=len(ids)) as m:
+            data = handle.read()
+            m.bytes = len(data)
+
+    :param name: str - name of step, e.g. name of pipe
+    :param kind: str - type of step: 'fetch', 'pipe', 'table', 'stage', 'upload', ...
+    :param rows_in: int - number of input rows
+    :param registry: MetricsRegistry - defaults to global `REGISTRY`
+    """
+    m = Measurement(name, kind, rows_in)
+    start = time.time()
+    try:
+        yield m
+    except BaseException:
+        m.failed = True
+        raise
+    finally:
+        m.wall_time = time.time() - start
+        m.peak_memory = peak_rss()
+        (registry or REGISTRY).observe(m)
+        trace = _ACTIVE_TRACE.get()
+        if trace is not None:
+            trace.add(m)
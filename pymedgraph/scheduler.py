@@ -0,0 +1,206 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from pymedgraph.metrics import measure
+
+
+class Stage(object):
+    """
+    Class describes a single node of a `pymedgraph.scheduler.StageGraph`.
+
+    A stage wraps a callable, which receives a dictionary with the results of all stages it depends on, e.g.
+    `func({'fetch': [...]})`. The return value of the callable is the result of the stage and will be passed to every
+    stage depending on it. Stages run on the thread pool of the `pymedgraph.scheduler.StageScheduler`.
+    """
+
+    def __init__(self, name: str, func, depends_on=None, output: bool = False):
+        """
+        :param name: str - unique name of stage within the graph, e.g. 'ner'
+        :param func: callable - takes dict of dependency results
+        :param depends_on: str or list - names of stages, which have to be finished before this stage can run
+        :param output: bool - flag if result of stage is a `pymedgraph.dataextraction.basepipe.PipeOutput`, which
+        belongs to the graph output
+        """
+        self.name = name
+        self.func = func
+        if depends_on is None:
+            depends_on = list()
+        elif isinstance(depends_on, str):
+            depends_on = [depends_on]
+        self.depends_on = list(depends_on)
+        self.output = output
+
+
+class StageGraph(object):
+    """
+    Class to collect `pymedgraph.scheduler.Stage` objects into a directed acyclic graph. The edges of the graph are
+    given by `Stage.depends_on`. Stages are kept in insertion order, which is used as tie-breaker for the order of
+    graph outputs.
+    """
+
+    def __init__(self):
+        self.stages = dict()
+
+    def add(self, stage: Stage):
+        if not isinstance(stage, Stage):
+            raise TypeError('Can only add objects of type Stage.')
+        if stage.name in self.stages:
+            raise RuntimeError(f'Stage \'{stage.name}\' is already part of the graph.')
+        self.stages[stage.name] = stage
+
+    def topological_order(self) -> list:
+        """
+        Method returns the stage names in an order, where each stage comes after all of its dependencies.
+        Raises a RuntimeError if a dependency is unknown or the graph contains a cycle.
+        """
+        for stage in self.stages.values():
+            missing = [d for d in stage.depends_on if d not in self.stages]
+            if missing:
+                raise RuntimeError(f'Stage \'{stage.name}\' depends on unknown stages: {missing}')
+        order = list()
+        done = set()
+        pending = list(self.stages.keys())
+        while pending:
+            ready = [s for s in pending if all(d in done for d in self.stages[s].depends_on)]
+            if not ready:
+                raise RuntimeError(f'Stage graph contains a cycle between stages: {pending}')
+            for s in ready:
+                order.append(s)
+                done.add(s)
+            pending = [s for s in pending if s not in done]
+        return order
+
+    def __len__(self):
+        return len(self.stages)
+
+
+def _timed_call(name, func, inputs):
+    """ Runs stage function and returns result with wall clock start and end time """
+    start = time.time()
+    with measure(name, kind='stage'):
+        result = func(inputs)
+    return result, start, time.time()
+
+
+class StageScheduler(object):
+    """
+    Class runs a `pymedgraph.scheduler.StageGraph`. Every stage is submitted as soon as all of its dependencies are
+    finished, so independent stages run concurrently on a thread pool.
+
+    After each run the scheduler holds a report (`StageScheduler.report`) with the timings of every stage and the
+    critical path of the graph, meaning the chain of dependent stages which determined the total wall time.
+    """
+
+    def __init__(self, max_workers: int = 4, logger=None):
+        """
+        :param max_workers: int - size of thread pool
+        :param logger: logging.logger
+        """
+        self.max_workers = max_workers
+        self.logger = logger
+        self.report = dict()
+
+    def run(self, graph: StageGraph, on_stage_done=None, on_stage_start=None, completed: dict = None) -> dict:
+        """
+        Method runs all stages of the graph and returns a dictionary with the result of each stage.
+
+        If a stage fails, no further stages are submitted. Already running stages are awaited and the exception of
+        the failed stage is raised afterwards.
+
+        :param graph: StageGraph
+        :param on_stage_done: callable - called with (stage_name, result) in the calling thread as soon as a stage
+        is finished
+        :param on_stage_start: callable - called with (stage_name) before a stage is submitted
+        :param completed: dict - results of stages, which are already done and will not be executed again
+        :return: dict - stage name -> result
+        """
+        order = graph.topological_order()
+        results = dict(completed) if completed else dict()
+        timings = dict()
+        pool = None
+        running = dict()
+        error = None
+        run_start = time.time()
+
+        try:
+            while True:
+                if error is None:
+                    for name in order:
+                        stage = graph.stages[name]
+                        if name in results or name in running.values():
+                            continue
+                        if not all(d in results for d in stage.depends_on):
+                            continue
+                        if on_stage_start:
+                            on_stage_start(name)
+                        if pool is None:
+                            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+                        inputs = {d: results[d] for d in stage.depends_on}
+                        # run in copy of current context, to keep the active trace of `pymedgraph.metrics`
+                        future = pool.submit(contextvars.copy_context().run, _timed_call, name, stage.func, inputs)
+                        running[future] = name
+                if not running:
+                    break
+                finished, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        result, start, end = future.result()
+                    except Exception as ex:
+                        if self.logger:
+                            self.logger.error(f'Stage \'{name}\' failed with {ex}')
+                        if error is None:
+                            error = ex
+                        continue
+                    results[name] = result
+                    timings[name] = {
+                        'start': start - run_start,
+                        'end': end - run_start,
+                        'duration': end - start,
+                        'depends_on': graph.stages[name].depends_on
+                    }
+                    if self.logger:
+                        self.logger.info(f'Finished stage \'{name}\' in {end - start:.3f}s.')
+                    if on_stage_done:
+                        on_stage_done(name, result)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+        self.report = self._build_report(graph, order, timings, time.time() - run_start)
+        if error is not None:
+            raise error
+        return results
+
+    @staticmethod
+    def _build_report(graph: StageGraph, order: list, timings: dict, wall_time: float) -> dict:
+        """
+        Method builds run report. The critical path is the chain of dependent stages with the largest summed
+        duration. Skipped stages (passed as `completed`) count with a duration of 0.
+        """
+        finish = dict()
+        previous = dict()
+        for name in order:
+            duration = timings[name]['duration'] if name in timings else 0.
+            deps = graph.stages[name].depends_on
+            prev = max(deps, key=lambda d: finish.get(d, 0.)) if deps else None
+            finish[name] = duration + (finish.get(prev, 0.) if prev else 0.)
+            previous[name] = prev
+        critical_path = list()
+        if finish:
+            name = max(finish, key=finish.get)
+            critical_time = finish[name]
+            while name:
+                critical_path.insert(0, name)
+                name = previous[name]
+        else:
+            critical_time = 0.
+        busy_time = sum(t['duration'] for t in timings.values())
+        return {
+            'wall_time': wall_time,
+            'stages': timings,
+            'critical_path': critical_path,
+            'critical_path_time': critical_time,
+            'parallelism': busy_time / wall_time if wall_time > 0 else 0.
+        }
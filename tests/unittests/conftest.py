@@ -2,6 +2,8 @@ import pytest
 import json
 import pandas as pd
 
+from pymedgraph.dataextraction.basepipe import NodeTable, PipeOutput
+
 
 @pytest.fixture
 def nodetable_df():
@@ -26,6 +28,40 @@ def nodetable_df():
     })
 
 
+@pytest.fixture
+def gene_table():
+    """ Returns a function, which builds a Genes NodeTable of up to four genes linked to UMLS nodes C1 - C3 """
+    def build(names: list) -> NodeTable:
+        df = pd.DataFrame({
+            'CUI': ['C1', 'C1', 'C2', 'C3'][:len(names)],
+            'node_label': 'Gene',
+            'GeneID': ['g1', 'g2', 'g2', 'g3'][:len(names)],
+            'name': names
+        })
+        return NodeTable('Genes', df, 'UMLS', 'CUI', 'CUI', 'Gene', 'GeneID', ['name'])
+    return build
+
+
+@pytest.fixture
+def pipe_outputs():
+    """
+    Returns a function, which builds the outputs of StandardPubMedPipe and NERPipe:
+        SearchTerm -> Paper from rows (search term, pubmedID, title)
+        Paper -> UMLS from rows (pubmedID, CUI, kb_score)
+    """
+    def build(papers: list, links: list) -> list:
+        paper_df = pd.DataFrame(papers, columns=['source', 'pubmedID', 'title'])
+        paper_df.insert(1, 'node_label', 'Paper')
+        link_df = pd.DataFrame(links, columns=['source', 'CUI', 'kb_score'])
+        link_df.insert(1, 'node_label', 'UMLS')
+        pubmed = PipeOutput('StandardPubMedPipe')
+        pubmed.add(NodeTable('pubmedPaper', paper_df, 'SearchTerm', 'label', 'source', 'Paper', 'pubmedID', ['title']))
+        ner = PipeOutput('NERPipe')
+        ner.add(NodeTable('UmlsLinks', link_df, 'Paper', 'pubmedID', 'source', 'UMLS', 'CUI', ['kb_score']))
+        return [pubmed, ner]
+    return build
+
+
 @pytest.fixture
 def request_json():
     return json.dumps({
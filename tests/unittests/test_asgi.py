@@ -0,0 +1,193 @@
+import json
+import time
+import asyncio
+import threading
+
+import pandas as pd
+import pytest
+
+from pymedgraph.asgi import AsyncAPI, WSGIFallback
+from pymedgraph.jobs import BuildExecutor, ResourcePool
+from pymedgraph.dataextraction.basepipe import NodeTable, PipeOutput
+from pymedgraph.graph.asyncreader import AsyncGraphReader
+from pymedgraph.graph.memorygraph import InMemoryGraph
+from pymedgraph.graph.registry import SearchTermRegistry
+
+
+class StandInReader(AsyncGraphReader):
+    """ Answers the queries of the reader from a dict instead of the async driver """
+    def __init__(self, connector, responses: dict = None):
+        self.connector = connector
+        self.driver = None
+        self.logger = None
+        self.responses = responses or dict()
+        self.queries = list()
+
+    async def query(self, query: str, parameters: dict = None) -> list or None:
+        self.queries.append(query)
+        await asyncio.sleep(0)
+        return self.responses.get(query)
+
+    async def close(self):
+        pass
+
+
+def _graph():
+    output = PipeOutput('StandardPubMedPipe')
+    output.add(NodeTable(
+        'pubmedPaper',
+        pd.DataFrame({'source': ['pku', 'pku', 'hpa'], 'node_label': 'Paper', 'pubmedID': ['1', '2', '2']}),
+        'SearchTerm', 'label', 'source', 'Paper', 'pubmedID', []
+    ))
+    graph = InMemoryGraph()
+    graph.build_biomed_graph(['pku', 'hpa'], [output])
+    return graph
+
+
+async def _request(app, method: str, path: str, query: str = '', body: bytes = b'') -> tuple:
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = list()
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(), 'headers': list()}
+    await app(scope, receive, send)
+    return sent[0]['status'], b''.join(m.get('body', b'') for m in sent[1:]).decode()
+
+
+def test_async_api():
+    graph = _graph()
+    release = threading.Event()
+
+    def build_func(resource, req_specs, batch):
+        release.wait(5)
+        return 'success'
+
+    builds = BuildExecutor(ResourcePool(lambda: object()), max_workers=1, max_queued=0)
+    reader = StandInReader(graph, {SearchTermRegistry.LOAD_QUERY: graph.get_search_term_info()})
+    app = AsyncAPI(reader, builds, build_func, ['t'])
+
+    async def run():
+        # 1. reads are answered while a build is running, further builds are rejected
+        build = asyncio.ensure_future(_request(
+            app, 'POST', '/buildGraph',
+            body=json.dumps({'request_specs': {'disease': 'pku'}, 'token': 't', 'wait': True}).encode()
+        ))
+        await asyncio.sleep(0.05)
+        assert await _request(app, 'GET', '/searchTerms', 'token=t') == (200, '{"searchTerms": ["pku", "hpa"]}')
+        status, body = await _request(app, 'GET', '/intersection', 'searchTerms=pku,hpa&level=Paper&token=t')
+        assert json.loads(body) == list(graph.get_intersection('pku,hpa', 'Paper'))
+        rejected = await _request(app, 'POST', '/buildGraphBatch',
+                                  body=b'{"request_specs": {}, "token": "t", "wait": true}')
+        assert rejected[0] == 429
+        assert not build.done()
+        release.set()
+        assert await build == (200, 'success')
+
+        # 2. request checks
+        assert (await _request(app, 'GET', '/searchTerms', 'token=x'))[0] == 403
+        assert (await _request(app, 'GET', '/intersection', 'token=t'))[0] == 400
+        assert (await _request(app, 'POST', '/buildGraph', body=b'no json'))[0] == 415
+        assert (await _request(app, 'GET', '/buildGraph'))[0] == 405
+        assert (await _request(app, 'GET', '/metrics'))[0] == 404
+
+        # 3. builds without wait are passed to the fallback, which queues them as jobs
+        def wsgi_app(environ, start_response):
+            start_response('202 Accepted', [('Content-Type', 'application/json')])
+            return [environ['wsgi.input'].read()]
+
+        app.fallback = WSGIFallback(wsgi_app)
+        body = b'{"request_specs": {"disease": "pku"}, "token": "t"}'
+        assert await _request(app, 'POST', '/buildGraph', body=body) == (202, body.decode())
+
+    asyncio.run(run())
+    builds.shutdown()
+
+
+def test_async_reader_registry():
+    version = [{'version': 1}]
+    terms = [{'label': 'pku', 'nodes': 2, 'last_build': None}]
+    graph = _graph()
+    graph.registry = SearchTermRegistry(graph, check_interval=60.)
+    reader = StandInReader(graph, {SearchTermRegistry.VERSION_QUERY: version, SearchTermRegistry.LOAD_QUERY: terms})
+
+    async def run():
+        assert await reader.get_search_terms() == ['pku']
+        # the registry cache is shared with the connector and checked with the version counter
+        assert await reader.get_search_terms() == ['pku']
+        assert reader.queries == [SearchTermRegistry.VERSION_QUERY, SearchTermRegistry.LOAD_QUERY]
+        graph.registry._checked = 0.
+        assert await reader.get_search_term_info() == terms
+        assert reader.queries[2:] == [SearchTermRegistry.VERSION_QUERY]
+
+    asyncio.run(run())
+
+
+def test_wsgi_fallback():
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return iter([environ['PATH_INFO'].encode(), b'?', environ['QUERY_STRING'].encode()])
+
+    assert asyncio.run(_request(WSGIFallback(wsgi_app, max_chunks=1), 'GET', '/metrics', 'token=t')) == \
+        (200, '/metrics?token=t')
+
+
+def test_wsgi_fallback_workers():
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def wsgi_app(environ, start_response):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    async def run():
+        fallback = WSGIFallback(wsgi_app, max_workers=2)
+        responses = await asyncio.gather(*[_request(fallback, 'GET', '/metrics', 'token=t') for _ in range(6)])
+        fallback.shutdown()
+        return responses
+
+    assert asyncio.run(run()) == [(200, 'ok')] * 6
+    # requests beyond the pool wait for a free thread
+    assert running[1] == 2
+
+
+def test_wsgi_fallback_disconnect():
+    closed = threading.Event()
+
+    class Body(object):
+        def __iter__(self):
+            for _ in range(100):
+                yield b'x'
+
+        def close(self):
+            closed.set()
+
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return Body()
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            raise OSError('client disconnected')
+
+    async def run():
+        scope = {'type': 'http', 'method': 'GET', 'path': '/subgraph', 'query_string': b'', 'headers': list()}
+        with pytest.raises(OSError):
+            await WSGIFallback(wsgi_app, max_chunks=1)(scope, receive, send)
+        # the worker thread is not blocked by the full queue and closes the response
+        assert await asyncio.get_running_loop().run_in_executor(None, closed.wait, 5)
+
+    asyncio.run(run())
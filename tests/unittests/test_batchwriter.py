@@ -0,0 +1,74 @@
+import time
+import threading
+
+import pandas as pd
+import pytest
+
+from pymedgraph.graph.batchwriter import BatchWriter
+
+
+class FakeResult(object):
+    def __init__(self, total):
+        self.total = total
+
+    def single(self):
+        return {'total': self.total}
+
+
+class FakeSession(object):
+    """ Session of `FakeDriver`, runs the managed transaction function once """
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute_write(self, func, *args):
+        return func(self, *args)
+
+    def run(self, query, rows):
+        with self.driver.lock:
+            self.driver.batches.append(len(rows))
+            self.driver.sessions.add(id(self))
+        if self.driver.fail:
+            raise ValueError('neo4j is down')
+        time.sleep(self.driver.row_latency * len(rows))
+        return FakeResult(len(rows))
+
+
+class FakeDriver(object):
+    def __init__(self, row_latency=0., fail=False):
+        self.row_latency = row_latency
+        self.fail = fail
+        self.batches = list()
+        self.sessions = set()
+        self.lock = threading.Lock()
+
+    def session(self):
+        return FakeSession(self)
+
+
+def test_batch_writer():
+    rows = pd.DataFrame({'gene': [f'G{i}' for i in range(1000)], 'node_label': 'Gene'})
+
+    # 1. parallel write of all rows with concurrent sessions
+    driver = FakeDriver(row_latency=0.0001)
+    writer = BatchWriter(driver, max_workers=4, batch_size=100, target_latency=10.)
+    result = writer.write('UNWIND $rows AS row', rows, columns=['gene'], parallel=True)
+    assert result['total'] == 1000
+    assert sum(driver.batches) == 1000
+    assert len(driver.sessions) > 1
+    assert result['rows_per_second'] > 0
+
+    # 2. batch size is halved if batches are slower than target latency
+    writer = BatchWriter(FakeDriver(row_latency=0.0001), batch_size=400, min_batch_size=50, target_latency=0.01)
+    writer.write('UNWIND $rows AS row', rows)
+    assert writer.batch_size < 400
+
+    # 3. failures raise instead of returning None
+    writer = BatchWriter(FakeDriver(fail=True), batch_size=100)
+    with pytest.raises(RuntimeError, match=r'Write of \'Genes:nodes\' failed *.'):
+        writer.write('UNWIND $rows AS row', rows, name='Genes:nodes', parallel=True)
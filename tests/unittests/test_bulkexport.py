@@ -0,0 +1,42 @@
+import os
+
+from pymedgraph.graph.bulkexport import export_bulk
+
+
+PAPERS = [('pku', '1', 'PKU "classic"'), ('pku', '2', 'HPA,\nreview'), ('hpa', '2', 'HPA,\nreview')]
+LINKS = [('1', 'C1', 0.9), ('2', 'C1', 0.9), ('3', 'C2', 1.0)]
+
+
+def _read(path):
+    files = dict()
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), 'rb') as fh:
+            files[name] = fh.read()
+    return files
+
+
+def test_export_bulk(tmp_path, pipe_outputs):
+    manifest = export_bulk(str(tmp_path / 'a'), ['pku', 'hpa'], pipe_outputs(PAPERS, LINKS))
+    export_bulk(str(tmp_path / 'b'), ['pku', 'hpa'], pipe_outputs(PAPERS, LINKS))
+
+    # 1. exports of same outputs are equal
+    assert _read(tmp_path / 'a') == _read(tmp_path / 'b')
+    files = {k: v.decode('utf-8') for k, v in _read(tmp_path / 'a').items()}
+
+    # 2. deduplicated nodes with stable ids and typed headers
+    assert files['nodes_Paper.csv'] == ':ID,pubmedID,title,:LABEL\n' \
+                                       'Paper:1,1,"PKU ""classic""",Paper\n' \
+                                       'Paper:2,2,"HPA,\nreview",Paper\n'
+    assert files['nodes_UMLS.csv'] == ':ID,CUI,kb_score:double,:LABEL\nUMLS:C1,C1,0.9,UMLS\nUMLS:C2,C2,1.0,UMLS\n'
+    assert files['nodes_SearchTerm.csv'] == ':ID,label,:LABEL\n' \
+                                            'SearchTerm:pku,pku,SearchTerm\n' \
+                                            'SearchTerm:hpa,hpa,SearchTerm\n'
+
+    # 3. relations are unique and only point from exported source nodes
+    assert files['relationships.csv'] == ':START_ID,:END_ID,:TYPE\n' \
+                                         'SearchTerm:pku,Paper:1,CONTAINS\n' \
+                                         'SearchTerm:pku,Paper:2,CONTAINS\n' \
+                                         'SearchTerm:hpa,Paper:2,CONTAINS\n' \
+                                         'Paper:1,UMLS:C1,CONTAINS\n' \
+                                         'Paper:2,UMLS:C1,CONTAINS\n'
+    assert manifest['counts'] == {'nodes': {'SearchTerm': 2, 'Paper': 2, 'UMLS': 2}, 'relationships': 5}
@@ -0,0 +1,74 @@
+import os
+import time
+import pytest
+from pandas.testing import assert_frame_equal
+
+from pymedgraph.dataextraction.basepipe import NodeTable, PipeOutput
+
+pytest.importorskip('pyarrow')
+from pymedgraph.cache import ResultCache, write_pipe_outputs, read_pipe_outputs  # noqa: E402
+
+
+@pytest.fixture
+def outputs(nodetable_df):
+    output = PipeOutput('MedGenPipe')
+    output.add(NodeTable(
+        name='Genes',
+        df=nodetable_df,
+        source_node='UMLS',
+        source_node_attr='CUI',
+        source_col='source',
+        node_label='Gene',
+        id_attribute='gene',
+        attribute_cols=''
+    ))
+    return [output]
+
+
+def test_write_read_pipe_outputs(tmp_path, outputs):
+    write_pipe_outputs(outputs, str(tmp_path / 'entry'))
+    loaded = read_pipe_outputs(str(tmp_path / 'entry'))
+
+    assert len(loaded) == 1
+    assert loaded[0].pipe == 'MedGenPipe'
+    assert loaded[0].node_tables[0].meta == outputs[0].node_tables[0].meta
+    assert_frame_equal(loaded[0].node_tables[0].data, outputs[0].node_tables[0].data)
+
+
+def test_result_cache(tmp_path, outputs):
+    cache = ResultCache(str(tmp_path), ttl=60)
+    pipe_cfg = {'n_articles': 10, 'delete_existing_graph': False, 'pipelines': {'pubmed': {'run': True}}}
+    key = cache.key('pku', pipe_cfg)
+
+    # 1. key ignores flags, which do not change the outputs
+    assert key == cache.key('pku', dict(pipe_cfg, delete_existing_graph=True))
+    assert key != cache.key('pku', dict(pipe_cfg, n_articles=20))
+
+    # 2. miss and hit
+    assert cache.get(key) is None
+    cache.put(key, outputs)
+    assert cache.get(key)[0].node_tables[0].name == 'Genes'
+
+    # 3. expired entry
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get(key) is None
+    assert os.listdir(str(tmp_path)) == []
+
+    # 4. size bound removes least recently used entry
+    cache.ttl = 60
+    cache.put('a', outputs)
+    time.sleep(0.01)
+    cache.put('b', outputs)
+    cache.max_bytes = cache._size(str(tmp_path / 'b'))
+    cache.evict()
+    assert os.listdir(str(tmp_path)) == ['b']
+
+
+def test_result_cache_failed_put(tmp_path, outputs):
+    cache = ResultCache(str(tmp_path), ttl=60)
+    outputs[0].node_tables[0].data['gene'] = [object(), object()]
+    with pytest.raises(Exception):
+        cache.put('a', outputs)
+    # no incomplete entry is left behind
+    assert os.listdir(str(tmp_path)) == []
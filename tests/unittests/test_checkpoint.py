@@ -0,0 +1,48 @@
+import pytest
+from pandas.testing import assert_frame_equal
+
+from pymedgraph.dataextraction.basepipe import NodeTable, PipeOutput
+
+pytest.importorskip('pyarrow')
+from pymedgraph.checkpoint import CheckpointStore  # noqa: E402
+
+
+def test_checkpoint_store(tmp_path, nodetable_df):
+    output = PipeOutput('MedGenPipe')
+    output.add(NodeTable(
+        name='Genes',
+        df=nodetable_df,
+        source_node='UMLS',
+        source_node_attr='CUI',
+        source_col='source',
+        node_label='Gene',
+        id_attribute='gene',
+        attribute_cols=''
+    ))
+    store = CheckpointStore(str(tmp_path))
+    info = {'mode': 'single', 'disease': 'pku', 'pipe_cfg': {'n_articles': 10}, 'paper_ids': None}
+    store.create('b1', info)
+    with pytest.raises(RuntimeError, match=r'Checkpoint of build \'b1\' already exists.'):
+        store.create('b1', info)
+
+    # 1. PipeOutputs and other results are stored
+    store.save_stage('b1', 'fetch', ([{'paper': 1}], None))
+    store.save_stage('b1', 'medGen', output)
+    store.set_status('b1', CheckpointStore.FAILED, 'UniProt is down')
+
+    build, results = store.load('b1')
+    assert build['status'] == CheckpointStore.FAILED
+    assert build['info'] == info
+    assert results['fetch'] == ([{'paper': 1}], None)
+    assert results['medGen'].pipe == 'MedGenPipe'
+    assert_frame_equal(results['medGen'].get_table('Genes'), output.get_table('Genes'))
+    assert [b['build_id'] for b in store.list()] == ['b1']
+
+    # 2. unknown and invalid build ids
+    with pytest.raises(RuntimeError, match=r'Found no checkpoint *.'):
+        store.load('b2')
+    with pytest.raises(RuntimeError, match=r'Invalid build id *.'):
+        store.get('../b1')
+
+    store.remove('b1')
+    assert store.list() == []
@@ -0,0 +1,113 @@
+import time
+import asyncio
+import threading
+import pytest
+
+from pymedgraph.jobs import Job, JobQueue, BuildExecutor, ResourcePool, QueueFullError, request_key
+
+
+def _wait(job, timeout=5.):
+    start = time.time()
+    while job.is_active and time.time() - start < timeout:
+        time.sleep(0.01)
+
+
+def test_request_key():
+    cfg = {'n_articles': 10, 'pipelines': {'pubmed': {'run': True}, 'ner': {'run': True}}}
+    same_cfg = {'pipelines': {'ner': {'run': True}, 'pubmed': {'run': True}}, 'n_articles': 10}
+    assert request_key('pku', cfg) == request_key('pku', same_cfg)
+    assert request_key('pku', cfg) != request_key('epilepsy', cfg)
+
+
+def test_job_queue():
+    release = threading.Event()
+
+    def run_func(job):
+        job.on_stage_start('fetch')
+        release.wait(5)
+        job.on_stage_done('fetch')
+        if job.request.get('fail'):
+            raise RuntimeError('build failed')
+        return {'msg': 'success'}
+
+    jobs = JobQueue(run_func, max_workers=1, max_queued=1)
+
+    # 1. identical requests are merged
+    job, merged = jobs.submit({'disease': 'a'}, 'a')
+    same_job, merged = jobs.submit({'disease': 'a'}, 'a')
+    assert same_job is job and merged
+    # 2. queue limit, first job is running, second is waiting
+    time.sleep(0.05)
+    waiting, _ = jobs.submit({'disease': 'b', 'fail': True}, 'b')
+    assert waiting.status == Job.QUEUED
+    with pytest.raises(QueueFullError):
+        jobs.submit({'disease': 'c'}, 'c')
+
+    release.set()
+    _wait(job)
+    _wait(waiting)
+    jobs.shutdown()
+
+    # 3. status, progress and result
+    status = jobs.get(job.id).to_dict()
+    assert status['status'] == Job.DONE
+    assert status['result'] == {'msg': 'success'}
+    assert status['stages']['fetch']['status'] == Job.DONE
+    assert status['mergedRequests'] == 1
+    assert jobs.get(waiting.id).status == Job.FAILED
+    assert jobs.get(waiting.id).error == 'build failed'
+
+
+def test_resource_pool():
+    resources = ResourcePool(lambda: object(), size=2)
+
+    def run_func(job, resource):
+        time.sleep(0.02)
+        return {'resource': id(resource)}
+
+    def build_func(resource):
+        time.sleep(0.02)
+        return id(resource)
+
+    jobs = JobQueue(run_func, resources=resources, max_workers=2, max_queued=4)
+    builds = BuildExecutor(resources, max_workers=2, max_queued=2)
+    submitted = [jobs.submit({'disease': str(i)}, str(i), kind='refresh')[0] for i in range(4)]
+
+    async def run():
+        return await asyncio.gather(*[builds.run(build_func) for _ in range(2)])
+
+    # job queue and build executor share the resources, at most `size` are created
+    built = asyncio.run(run())
+    for job in submitted:
+        assert job.wait(5)
+    jobs.shutdown()
+    builds.shutdown()
+    assert resources.created() == 2
+    assert len({job.result['resource'] for job in submitted} | set(built)) == 2
+    assert submitted[0].to_dict()['kind'] == 'refresh'
+
+
+def test_build_executor_cancel():
+    release = threading.Event()
+    builds = BuildExecutor(ResourcePool(lambda: object()), max_workers=1, max_queued=0)
+
+    async def run():
+        task = asyncio.ensure_future(builds.run(lambda resource: release.wait(5)))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # the worker thread still runs the cancelled build
+        assert builds.pending() == 1
+        with pytest.raises(QueueFullError):
+            await builds.run(lambda resource: None)
+        release.set()
+        for _ in range(100):
+            if builds.pending() == 0:
+                break
+            await asyncio.sleep(0.01)
+        return await builds.run(lambda resource: 'built')
+
+    assert asyncio.run(run()) == 'built'
+    assert builds.pending() == 0
+    builds.shutdown()
@@ -61,3 +61,74 @@ def test_init(tmp_path):
     # test for incorrect config file
     with pytest.raises(RuntimeError, match=r'Cannot *.'):
         MedGraphManager('no_file.json')
+
+
+def test_aggregate_entities():
+    import pandas as pd
+    from pymedgraph.dataextraction.basepipe import PipeOutput, NodeTable
+
+    def ner_output(texts, links):
+        output = PipeOutput('NERPipe')
+        output.add(NodeTable(
+            name='Entities', df=pd.DataFrame({'source': range(len(texts)), 'text': texts, 'node_label': 'DISEASE'}),
+            source_node='Paper', source_node_attr='pubmedID', source_col='source', node_label='DISEASE',
+            id_attribute='text', attribute_cols=''
+        ))
+        output.add(NodeTable(
+            name='UmlsLinks', df=pd.DataFrame(links, columns=['source', 'CUI', 'kb_score']).assign(node_label='UMLS'),
+            source_node='DISEASE', source_node_attr='text', source_col='source', node_label='UMLS',
+            id_attribute='CUI', attribute_cols=''
+        ))
+        return output
+
+    counts = pd.Series(dtype='int64')
+    counts, links_1 = MedGraphManager._aggregate_entities(
+        counts, ner_output(['pku', 'pku', 'epilepsy'], [('pku', 'C1', 0.9), ('epilepsy', 'C2', 0.5)])
+    )
+    counts, links_2 = MedGraphManager._aggregate_entities(
+        counts, ner_output(['epilepsy', 'pku'], [('pku', 'C1', 0.9)])
+    )
+    # counts are summed over chunks, links below the MedGen score threshold are dropped
+    assert counts.to_dict() == {'pku': 3, 'epilepsy': 2}
+    assert links_1[['source', 'CUI']].values.tolist() == [['pku', 'C1']]
+    assert len(links_2) == 1
+
+
+def test_mesh_stage():
+    from pymedgraph.dataextraction.basepipe import BasePipe, StandardPubMedPipe
+
+    class PubmedId(str):
+        attributes = {'IdType': 'pubmed'}
+
+    manager = MedGraphManager.__new__(MedGraphManager)
+    manager.logger = None
+    manager.cfg = dict()
+    manager.pubmed_pipe = StandardPubMedPipe()
+    manager.pipes = {
+        'pubmed': manager.pubmed_pipe,
+        'ner': BasePipe('NERPipe', depends_on='StandardPubMedPipe'),
+        'medGen': BasePipe('MedGenPipe', depends_on='NERPipe'),
+        'uniProt': BasePipe('UniProtPipe', depends_on='MedGenPipe')
+    }
+    manager.ner_pipe = manager.pipes['ner']
+    pipe_cfg = {'n_articles': 1, 'pipelines': {'pubmed': {'run': True, 'meshTerms': True}, 'ner': {'run': True}}}
+    graph = manager._build_stage_graph('pku', pipe_cfg)
+
+    # MeSH terms are extracted next to the NER stage, the paper table is uploaded with them
+    assert graph.stages['mesh'].depends_on == ['fetch']
+    assert graph.stages['ner'].depends_on == ['pubmed']
+    assert [name for name, stage in graph.stages.items() if stage.output] == ['paper', 'ner']
+
+    paper = {
+        'PubmedData': {'ArticleIdList': [PubmedId('1')]},
+        'MedlineCitation': {
+            'Article': {'ArticleTitle': 'title', 'Abstract': {'AbstractText': ['abstract']}},
+            'MeshHeadingList': [{'DescriptorName': 'phenylketonurias'}]
+        }
+    }
+    inputs = {'fetch': ([paper], None)}
+    inputs['pubmed'] = graph.stages['pubmed'].func(inputs)
+    inputs['mesh'] = graph.stages['mesh'].func(inputs)
+    df = graph.stages['paper'].func(inputs).get_table('pubmedPaper')
+    assert df['pubmedID'].tolist() == ['pubmed~1']
+    assert df['MeSH'].tolist() == [['Phenylketonurias']]
@@ -0,0 +1,96 @@
+import pytest
+
+from pymedgraph.graph.memorygraph import InMemoryGraph
+from pymedgraph.metrics import REGISTRY
+
+
+PAPERS = [('pku', '1', 'PKU'), ('pku', '2', 'HPA review'), ('hpa', '3', 'HPA')]
+LINKS = [('1', 'C1', 0.9), ('2', 'C2', 0.8), ('3', 'C1', 0.95), ('4', 'C3', 1.0)]
+
+
+def test_memory_graph(tmp_path, pipe_outputs):
+    graph = InMemoryGraph()
+    graph.build_biomed_graph(['pku', 'hpa'], pipe_outputs(PAPERS, LINKS))
+
+    # 1. nodes are merged on their key with the attributes of the first row, relations need the source node
+    assert graph.get_search_terms() == ['pku', 'hpa']
+    assert graph.count_nodes() == 8
+    assert graph.count_nodes('UMLS') == 3
+    assert graph.get_node('UMLS', 'CUI', 'C1') == {'CUI': 'C1', 'kb_score': 0.9}
+    assert graph.count_relationships() == 6
+    assert graph.get_search_term_state('pku')['ids'] == ['1', '2']
+    # ingested ids are read from the relations, only the build time is stored on the SearchTerm node
+    assert set(graph.get_node('SearchTerm', 'label', 'pku')) <= {'label', 'last_build'}
+    assert [(i['label'], i['nodes']) for i in graph.get_search_term_info()] == [('pku', 2), ('hpa', 1)]
+    status, result = graph.get_intersection('pku,hpa', 'UMLS')
+    assert status == 'success'
+    assert result == '[{"e1":"pku","e2":"pku","UMLS":2},{"e1":"pku","e2":"hpa","UMLS":1},' \
+                     '{"e1":"hpa","e2":"pku","UMLS":1},{"e1":"hpa","e2":"hpa","UMLS":1}]'
+    # search terms are not used as metric names
+    assert ('index', 'reachability') in REGISTRY.snapshot()
+    assert not [name for _, name in REGISTRY.snapshot() if 'pku' in name]
+    # uploading again does not duplicate nodes or relations
+    for output in pipe_outputs(PAPERS, LINKS):
+        graph.upload_pipe_output(output)
+    assert (graph.count_nodes(), graph.count_relationships()) == (8, 6)
+
+    # 2. snapshot
+    graph.save_snapshot(str(tmp_path / 'graph.pkl'))
+    loaded = InMemoryGraph.load_snapshot(str(tmp_path / 'graph.pkl'))
+    assert loaded.get_intersection('pku,hpa', 'UMLS') == (status, result)
+
+    # 3. delete keeps the shared umls node
+    result = loaded.delete_search_term('pku')
+    assert (result['deleted'], result['kept']) == (4, 1)
+    assert loaded.get_search_terms() == ['hpa']
+    assert loaded.get_node('UMLS', 'CUI', 'C1') is not None
+    assert (loaded.count_nodes(), loaded.count_relationships()) == (4, 2)
+    with pytest.raises(RuntimeError, match=r'InMemoryGraph does not run Cypher queries.'):
+        loaded.query('MATCH (n) RETURN n', None)
+
+
+def test_snapshot_export_import(tmp_path, pipe_outputs):
+    graph = InMemoryGraph()
+    graph.build_biomed_graph(['pku', 'hpa'], pipe_outputs(PAPERS, LINKS))
+    graph.record_search_term_build(pipe_outputs(PAPERS, LINKS)[0].node_tables[0])
+    manifest = graph.export_snapshot(str(tmp_path / 'snapshot'), ['hpa'], batch_size=2)
+    # paper 3 links to the shared umls node C1, paper 1 of pku is not exported
+    assert manifest['counts'] == {'nodes': {'SearchTerm': 1, 'Paper': 1, 'UMLS': 1}, 'relationships': 2}
+    assert manifest['keys'] == {'SearchTerm': 'label', 'Paper': 'pubmedID', 'UMLS': 'CUI'}
+
+    imported = InMemoryGraph()
+    result = imported.import_snapshot(str(tmp_path / 'snapshot'), batch_size=1)
+    assert (result['nodes'], result['relationships']) == (3, 2)
+    assert imported.get_search_terms() == ['hpa']
+    assert imported.get_node('UMLS', 'CUI', 'C1') == {'CUI': 'C1', 'kb_score': 0.9}
+    assert imported.get_search_term_state('hpa')['ids'] == ['3']
+    assert imported.get_intersection('hpa', 'UMLS')[1] == '[{"e1":"hpa","e2":"hpa","UMLS":1}]'
+    # import merges on the keys
+    imported.import_snapshot(str(tmp_path / 'snapshot'))
+    assert (imported.count_nodes(), imported.count_relationships()) == (3, 2)
+
+
+def test_subgraph_pages(pipe_outputs):
+    graph = InMemoryGraph()
+    graph.build_biomed_graph(['pku', 'hpa'], pipe_outputs(PAPERS, LINKS))
+    nodes, edges, cursor, pages = list(), list(), None, 0
+    while True:
+        status, records = graph.get_subgraph('pku', cursor=cursor, limit=2, fetch_size=1)
+        assert status == 'success'
+        records = list(records)
+        nodes += [r for r in records if r['type'] == 'node']
+        edges += [r for r in records if r['type'] == 'edge']
+        cursor, pages = records[-1]['cursor'], pages + 1
+        if cursor is None:
+            break
+    assert pages == 3
+    keys = {r['id']: r['properties'].get('label') or r['properties'].get('pubmedID') or r['properties']['CUI']
+            for r in nodes}
+    assert sorted(keys.values()) == ['1', '2', 'C1', 'C2', 'pku']
+    assert sorted((keys[e['start']], keys[e['end']]) for e in edges) == [
+        ('1', 'C1'), ('2', 'C2'), ('pku', '1'), ('pku', '2')
+    ]
+    # UMLS nodes are below the DISEASE level
+    _, records = graph.get_subgraph('pku', 'DISEASE')
+    assert list(records)[-1] == {'type': 'page', 'nodes': 3, 'edges': 2, 'cursor': None}
+    assert graph.get_subgraph('epilepsy')[0] == 'fail'
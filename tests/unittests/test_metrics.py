@@ -0,0 +1,54 @@
+import pytest
+
+from pymedgraph.metrics import MetricsRegistry, measure, start_trace
+from pymedgraph.scheduler import Stage, StageGraph, StageScheduler
+
+
+def test_measure():
+    registry = MetricsRegistry()
+    with measure('efetch', kind='fetch', rows_in=3, registry=registry) as m:
+        m.rows_out = 2
+        m.bytes = 100
+    with pytest.raises(ValueError):
+        with measure('efetch', kind='fetch', registry=registry):
+            raise ValueError('failed request')
+
+    metric = registry.snapshot()[('fetch', 'efetch')]
+    assert metric['count'] == 2
+    assert metric['rows_in'] == 3
+    assert metric['rows_out'] == 2
+    assert metric['bytes'] == 100
+    assert metric['failures'] == 1
+
+    text = registry.render()
+    assert 'pymedgraph_step_seconds_count{kind="fetch",name="efetch"} 2' in text
+    assert 'pymedgraph_step_bytes_total{kind="fetch",name="efetch"} 100' in text
+    assert '# TYPE pymedgraph_step_failures_total counter' in text
+
+
+def test_trace_scheduler_threads():
+    registry = MetricsRegistry()
+
+    def step(name):
+        def func(inputs):
+            with measure(name, kind='pipe', registry=registry) as m:
+                m.rows_out = 1
+            return name
+        return func
+
+    graph = StageGraph()
+    graph.add(Stage('a', step('a')))
+    graph.add(Stage('b', step('b')))
+    graph.add(Stage('c', step('c'), depends_on=['a', 'b']))
+
+    with start_trace('test') as trace:
+        # nested trace is reused
+        with start_trace('nested') as nested:
+            assert nested is trace
+        StageScheduler(max_workers=2).run(graph)
+
+    steps = trace.summary()['steps']
+    # measurements of stage threads are added to the trace of the calling thread
+    assert all(f'pipe:{s}' in steps for s in ['a', 'b', 'c'])
+    assert all(f'stage:{s}' in steps for s in ['a', 'b', 'c'])
+    assert steps['pipe:a']['rows_out'] == 1
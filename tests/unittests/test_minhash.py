@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from pymedgraph.graph.minhash import MinHashIndex
+from pymedgraph.graph.reachability import ReachabilityIndex
+
+
+def test_minhash_estimate():
+    rng = np.random.default_rng(0)
+    ids = rng.choice(10 ** 6, 20000, replace=False)
+    sketches = MinHashIndex(num_perm=256, bands=64)
+    # true jaccard: 10000 / 20000
+    sketches.set_term('pku', {'Gene': ids[:15000]})
+    sketches.set_term('hpa', {'Gene': ids[5000:]})
+    other_ids = rng.choice(10 ** 6, 15000, replace=False) + 10 ** 6
+    sketches.set_term('epilepsy', {'Gene': other_ids})
+    result = sketches.estimate(['pku', 'hpa', 'epilepsy'], 'Gene', [15000, 15000, 15000])
+    error = result['jaccard_error']
+    assert abs(result['jaccard'][0][1] - 0.5) <= error
+    assert result['jaccard'][0][2] <= error
+    assert result['intersection_low'][0][1] <= 10000 <= result['intersection_high'][0][1]
+
+    # 1. nearest search terms through LSH
+    assert [t for t, _ in sketches.top_k('pku', 'Gene')] == ['hpa']
+    # 2. merged signature equals signature of union
+    sketches.add('epilepsy', 'Gene', ids[:15000])
+    merged = sketches.signature(np.concatenate([other_ids, ids[:15000]]))
+    assert (sketches._get('epilepsy', 'Gene') == merged).all()
+    assert sketches.top_k('pku', 'Gene', k=1)[0][0] == 'epilepsy'
+
+    with pytest.raises(RuntimeError, match=r'Number of LSH bands *.'):
+        MinHashIndex(num_perm=100, bands=32)
+
+
+def test_reachability_sketches():
+    index = ReachabilityIndex()
+    index.update('pku', 0, [0, 0, 10], [10, 11, 12], ['Gene', 'Gene', 'GO'])
+    index.update('hpa', 1, [1, 1], [10, 11], ['Gene', 'Gene'])
+    assert index.sketches.jaccard(['pku', 'hpa'], 'Gene').tolist() == [[1., 1.], [1., 1.]]
+    assert index.sketches.top_k('hpa', 'Gene') == [('pku', 1.)]
+    index.remove('pku')
+    assert index.sketches.top_k('hpa', 'Gene') == []
@@ -0,0 +1,288 @@
+import pandas as pd
+import pytest
+
+from pymedgraph.dataextraction.basepipe import NodeTable
+from pymedgraph.graph.neo4jconnector import Neo4jConnector
+from pymedgraph.graph.reachability import ReachabilityIndex
+from pymedgraph.graph.setalgebra import SetAlgebra
+from pymedgraph.graph.registry import SearchTermRegistry
+from pymedgraph.graph.uploadmanifest import UploadManifest
+from pymedgraph.graph.snapshot import SnapshotWriter
+
+
+class RecordingConnector(Neo4jConnector):
+    """ Connector without driver, which records the queries """
+    def __init__(self, unique_constraints=False, single_pass=False):
+        self.driver = None
+        self.logger = None
+        self.unique_constraints = unique_constraints
+        self.single_pass = single_pass
+        self.writer = None
+        self._indexed = set()
+        self.reachability = ReachabilityIndex()
+        self.set_algebra = SetAlgebra(self.reachability)
+        self.registry = None
+        self.manifest = None
+        self.queries = list()
+
+    def query(self, query, parameters):
+        self.queries.append((query, parameters))
+        return [{'total': len(parameters['rows']) if parameters and 'rows' in parameters else 0}]
+
+
+def _umls_table():
+    df = pd.DataFrame({
+        'source': ['pku', 'pku', 'hpa'],
+        'node_label': 'UMLS',
+        'CUI': ['C1', 'C2', 'C1'],
+        'name': ['phenylketonuria', 'pku type 2', 'phenylketonuria']
+    })
+    return NodeTable('UmlsLinks', df, 'DISEASE', 'text', 'source', 'UMLS', 'CUI', ['name'])
+
+
+def test_ensure_indexes():
+    neo4j = RecordingConnector(unique_constraints=True)
+    neo4j.ensure_indexes([_umls_table(), _umls_table()])
+    queries = [q for q, _ in neo4j.queries]
+    # each key is provisioned once
+    assert queries == [
+        'CREATE CONSTRAINT umls_cui_unique IF NOT EXISTS FOR (n:UMLS) REQUIRE n.CUI IS UNIQUE',
+        'CREATE INDEX disease_text IF NOT EXISTS FOR (n:DISEASE) ON (n.text)'
+    ]
+
+
+def test_upload_nodetable_queries():
+    neo4j = RecordingConnector()
+    neo4j.upload_nodetable(_umls_table())
+    (node_query, node_params), (rel_query, rel_params) = neo4j.queries[-2:]
+    # MERGE on key only, attributes are set
+    assert node_query == 'UNWIND $rows AS row MERGE (n: UMLS {CUI: row.CUI}) SET n.name = row.name ' \
+                         'RETURN count(*) as total'
+    assert node_params['rows'] == [{'CUI': 'C1', 'name': 'phenylketonuria'}, {'CUI': 'C2', 'name': 'pku type 2'}]
+    assert 'MERGE (a)-[:CONTAINS]->(b)' in rel_query
+    assert rel_params['rows'] == [{'source': 'pku', 'CUI': 'C1'}, {'source': 'pku', 'CUI': 'C2'},
+                                  {'source': 'hpa', 'CUI': 'C1'}]
+
+
+def test_upload_nodetable_single_pass():
+    df = pd.DataFrame({
+        'source': ['1', '1', '2'],
+        'node_label': ['DISEASE', 'CHEMICAL', 'DISEASE'],
+        'text': ['pku', 'phenylalanine', 'pku']
+    })
+    entities = NodeTable('Entities', df, 'Paper', 'pubmedID', 'source', ['DISEASE', 'CHEMICAL'], 'text', '')
+    neo4j = RecordingConnector(single_pass=True)
+    neo4j.upload_nodetable(entities)
+    uploads = [(q, p) for q, p in neo4j.queries if p is not None]
+    # one query per label and each node is sent once
+    assert len(uploads) == 2
+    query, params = uploads[0]
+    assert query == 'UNWIND $rows AS row MERGE (n: DISEASE {text: row.text}) ' \
+                    'WITH n, row UNWIND row.sources AS source ' \
+                    'WITH n, source OPTIONAL MATCH (a0: Paper {pubmedID: source}) ' \
+                    'FOREACH (_ IN CASE WHEN a0 IS NULL THEN [] ELSE [1] END | MERGE (a0)-[:CONTAINS]->(n)) ' \
+                    'RETURN count(*) as total'
+    # rows are grouped by node with the list of source ids
+    assert params['rows'] == [{'text': 'pku', 'sources': ['1', '2']}]
+    assert uploads[1][1]['rows'] == [{'text': 'phenylalanine', 'sources': ['1']}]
+
+
+def test_insert_data_failure():
+    class FailingConnector(RecordingConnector):
+        def query(self, query, parameters):
+            return None
+
+    neo4j = FailingConnector()
+    with pytest.raises(RuntimeError, match=r'Upload of \'UmlsLinks:nodes\' failed *.'):
+        neo4j.insert_data('UNWIND $rows AS row', _umls_table().data, name='UmlsLinks:nodes')
+
+
+class GraphConnector(RecordingConnector):
+    """ Connector, which answers the delete queries on an in memory graph of node ids """
+    def __init__(self, terms: dict, edges: list, labels: dict = None):
+        super().__init__()
+        self.terms = terms
+        self.edges = set(edges)
+        self.labels = labels or dict()
+
+    def query(self, query, parameters):
+        self.queries.append((query, parameters))
+        if query == 'MATCH (s:SearchTerm) RETURN s':
+            return [{'s': {'label': t}} for t in self.terms]
+        if query.startswith('MATCH (s:SearchTerm'):
+            return [{'id': self.terms[parameters['term']]}] if parameters['term'] in self.terms else []
+        ids = parameters['ids']
+        if '(a)-[:CONTAINS]->(n) WHERE id(a) = i' in query:
+            return [{'parent': a, 'child': n, 'label': self.labels.get(n)} for i in ids for a, n in sorted(self.edges)
+                    if a == i]
+        if '(p)-[:CONTAINS]->(n) WHERE id(n) = i' in query:
+            return [{'parent': p, 'child': n} for i in ids for p, n in sorted(self.edges) if n == i]
+        # delete batch
+        self.edges = {(a, n) for a, n in self.edges if a not in ids and n not in ids}
+        return [{'total': len(ids)}]
+
+
+def test_delete_search_term():
+    # pku(0) -> paper 10 -> disease 11 -> umls 12 -> gene 13, paper 10 -> chemical 14
+    # hpa(1) -> paper 20 -> disease 21 -> umls 12
+    edges = [(0, 10), (10, 11), (11, 12), (12, 13), (10, 14), (1, 20), (20, 21), (21, 12)]
+    neo4j = GraphConnector({'pku': 0, 'hpa': 1}, edges)
+    result = neo4j.delete_search_term('pku', batch_size=2)
+    # shared umls node and gene below it are kept
+    assert result['deleted'] == 4
+    assert result['kept'] == 2
+    deletes = [p['ids'] for q, p in neo4j.queries if 'DETACH DELETE' in q]
+    assert deletes == [[10, 11], [14, 0]]
+    assert neo4j.edges == {(12, 13), (1, 20), (20, 21), (21, 12)}
+
+    with pytest.raises(RuntimeError, match=r'Search term \'ovarian cancer\' is not in Knowledge Graph.'):
+        neo4j.delete_search_term('ovarian cancer')
+
+
+def test_delete_graph():
+    neo4j = RecordingConnector()
+    totals = iter([2, 2, 1, 0])
+    neo4j.query = lambda query, parameters: [{'total': next(totals)}]
+    result = neo4j.delete_graph(batch_size=2)
+    assert result['deleted'] == 5
+    assert result['batches'] == 3
+
+
+def test_reachability(tmp_path):
+    # pku(0) -> paper 10 -> disease 11 -> umls 12, hpa(1) -> paper 20 -> disease 21 -> umls 12
+    labels = {10: 'Paper', 11: 'DISEASE', 12: 'UMLS', 20: 'Paper', 21: 'DISEASE', 13: 'Gene', 23: 'Gene'}
+    edges = [(0, 10), (10, 11), (11, 12), (1, 20), (20, 21), (21, 12)]
+    neo4j = GraphConnector({'pku': 0, 'hpa': 1}, edges, labels)
+    neo4j.reachability = ReachabilityIndex(str(tmp_path / 'reachability.npz'))
+    status, result = neo4j.get_intersection('pku,hpa', 'UMLS')
+    assert status == 'success'
+    assert result == '[{"e1":"pku","e2":"pku","UMLS":1},{"e1":"pku","e2":"hpa","UMLS":1},' \
+                     '{"e1":"hpa","e2":"pku","UMLS":1},{"e1":"hpa","e2":"hpa","UMLS":1}]'
+
+    # 1. build of hpa adds gene 13 below the shared umls node, pku reaches it too
+    neo4j.edges |= {(12, 13), (21, 23)}
+    neo4j.update_reachability('hpa')
+    assert neo4j.reachability.get('hpa', 'Gene').tolist() == [13, 23]
+    assert neo4j.reachability.get('pku', 'Gene').tolist() == [13]
+    n_queries = len(neo4j.queries)
+    assert neo4j.get_intersection('pku,hpa', 'Gene')[1] == \
+        '[{"e1":"pku","e2":"pku","Gene":1},{"e1":"pku","e2":"hpa","Gene":1},' \
+        '{"e1":"hpa","e2":"pku","Gene":1},{"e1":"hpa","e2":"hpa","Gene":2}]'
+    # only the search terms are queried for validation
+    assert len(neo4j.queries) == n_queries + 1
+
+    # 2. index is persisted and search terms are removed on delete
+    assert ReachabilityIndex(neo4j.reachability.path).get('pku', 'Gene').tolist() == [13]
+    neo4j.delete_search_term('pku')
+    assert ReachabilityIndex(neo4j.reachability.path).terms() == ['hpa']
+
+
+class VersionedGraph(object):
+    """ Answers the queries of the SearchTermRegistry from a dict of search terms and a version counter """
+    def __init__(self):
+        self.terms = {'pku': 3}
+        self.version = 1
+        self.queries = list()
+
+    def query(self, query, parameters):
+        self.queries.append(query)
+        if query == SearchTermRegistry.INCREMENT_QUERY:
+            self.version += 1
+        if query == SearchTermRegistry.LOAD_QUERY:
+            return [{'label': t, 'nodes': n, 'last_build': None} for t, n in self.terms.items()]
+        return [{'version': self.version}]
+
+
+def test_search_term_registry():
+    graph = VersionedGraph()
+    registry = SearchTermRegistry(graph, check_interval=60.)
+    assert registry.terms() == ['pku']
+    assert graph.queries == [SearchTermRegistry.VERSION_QUERY, SearchTermRegistry.LOAD_QUERY]
+    # cached reads and write-through do not load the search terms again
+    graph.queries = list()
+    graph.terms['epilepsy'] = 0
+    registry.add(['epilepsy'])
+    registry.set_build('epilepsy', 5, 1.)
+    registry.remove('pku')
+    assert registry.info() == [{'label': 'epilepsy', 'nodes': 5, 'last_build': 1.}]
+    assert SearchTermRegistry.LOAD_QUERY not in graph.queries
+    # a write of another process is detected with the version counter
+    graph.version += 1
+    registry._checked = 0.
+    assert sorted(registry.terms()) == ['epilepsy', 'pku']
+
+
+def test_reachability_graph_version(tmp_path):
+    graph = VersionedGraph()
+    registry = SearchTermRegistry(graph, check_interval=60.)
+    index = ReachabilityIndex(str(tmp_path / 'reachability.npz'))
+    registry.terms()
+    index.sync(registry.version, registry.changed_version)
+    index.update('pku', 0, [0], [10], ['Paper'])
+    # 1. own writes do not make the index stale, the graph version is persisted
+    registry.add(['hpa'])
+    index.sync(registry.version, registry.changed_version)
+    assert index.missing(['pku']) == []
+    index = ReachabilityIndex(index.path)
+    assert index.graph_version == graph.version
+    # 2. a write of another process, e.g. while the index file was not used, makes all search terms stale
+    graph.version += 1
+    other = SearchTermRegistry(graph, check_interval=60.)
+    other.terms()
+    index.sync(other.version, other.changed_version)
+    assert index.missing(['pku']) == ['pku']
+    assert ReachabilityIndex(index.path).missing(['pku']) == ['pku']
+
+
+def test_delete_graph_keeps_version():
+    class ClearableGraph(VersionedGraph):
+        def query(self, query, parameters):
+            if 'DETACH DELETE' in query:
+                if 'NOT n:GraphVersion' not in query:
+                    # the counter node is deleted and restarts at 1 with the next increment
+                    self.version = 0
+                deleted, self.terms = len(self.terms), dict()
+                return [{'total': deleted}]
+            return super().query(query, parameters)
+
+    graph = ClearableGraph()
+    neo4j = RecordingConnector()
+    neo4j.query = graph.query
+    neo4j.registry = SearchTermRegistry(graph, check_interval=60.)
+    other = SearchTermRegistry(graph, check_interval=60.)
+    assert neo4j.registry.terms() == other.terms() == ['pku']
+    neo4j.delete_graph()
+    assert neo4j.registry.terms() == []
+    # the registry of another process sees a new version and reloads the search terms
+    other._checked = 0.
+    assert other.terms() == []
+
+
+def test_upload_nodetable_with_manifest(gene_table):
+    neo4j = RecordingConnector()
+    neo4j.manifest = UploadManifest()
+    neo4j.manifest.add_nodes('UMLS', 'CUI', ['C1', 'C2', 'C3'])
+    neo4j.upload_nodetable(gene_table(['PAH', 'QDPR', 'QDPR', 'GCH1']))
+    assert [len(p['rows']) for _, p in neo4j.queries if p] == [3, 4]
+    neo4j.queries = list()
+    neo4j.upload_nodetable(gene_table(['PAH', 'QDPR', 'QDPR', 'GCH2']))
+    # only the changed node is sent, its relation exists
+    assert [p['rows'] for _, p in neo4j.queries if p] == [[{'GeneID': 'g3', 'name': 'GCH2'}]]
+
+
+def test_import_snapshot_queries(tmp_path):
+    pytest.importorskip('pyarrow')
+    writer = SnapshotWriter(str(tmp_path))
+    writer.add_nodes('UMLS', 'CUI', [{'CUI': 'C1', 'name': 'phenylketonuria'}])
+    writer.add_nodes('Gene', 'gene', [{'gene': 'PAH'}])
+    writer.add_relations([{'start_label': 'UMLS', 'start_key': 'C1', 'end_label': 'Gene', 'end_key': 'PAH'}])
+    writer.finish(['pku'])
+    neo4j = RecordingConnector()
+    result = neo4j.import_snapshot(str(tmp_path))
+    assert (result['nodes'], result['relationships']) == (2, 1)
+    assert [q for q, p in neo4j.queries if p] == [
+        'UNWIND $rows AS row MERGE (n:Gene {gene: row.gene}) SET n += row RETURN count(*) AS total',
+        'UNWIND $rows AS row MERGE (n:UMLS {CUI: row.CUI}) SET n += row RETURN count(*) AS total',
+        'UNWIND $rows AS row MATCH (a:UMLS {CUI: row.start_key}) MATCH (b:Gene {gene: row.end_key}) '
+        'MERGE (a)-[:CONTAINS]->(b) RETURN count(*) AS total'
+    ]
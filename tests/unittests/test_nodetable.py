@@ -129,4 +129,54 @@ def test_pipe_output_init():
 
     # init without name
     with pytest.raises(TypeError):
-        PipeOutput()
\ No newline at end of file
+        PipeOutput()
+
+def test_nodetable_no_copy(nodetable_df):
+    df = nodetable_df.copy()
+    df.loc[0, 'gene'] = None
+    node_table = NodeTable(
+        name='Genes',
+        df=df,
+        source_node='UMLS',
+        source_node_attr='CUI',
+        source_col='source',
+        node_label='Gene',
+        id_attribute='gene',
+        attribute_cols='',
+        copy=False
+    )
+    # missing values are filled in the passed DataFrame itself
+    assert node_table.data is df
+    assert node_table.data['gene'].tolist() == ['', 'QDPR']
+
+
+def test_nodetable_compact():
+    from pymedgraph.graph.neo4jconnector import to_records
+
+    df = pd.DataFrame({
+        'source': ['C0031485'] * 3 + ['C0268465'],
+        'node_label': ['Gene'] * 4,
+        'gene': ['PAH', 'QDPR', 'GCH1', 'PTS'],
+        'count': [1, 2, 3, 4]
+    })
+    node_table = NodeTable(
+        name='Genes',
+        df=df,
+        source_node='UMLS',
+        source_node_attr='CUI',
+        source_col='source',
+        node_label='Gene',
+        id_attribute='gene',
+        attribute_cols=['count'],
+        compact=True
+    )
+    assert isinstance(node_table.data['node_label'].dtype, pd.CategoricalDtype)
+    assert isinstance(node_table.data['source'].dtype, pd.CategoricalDtype)
+    # id attribute is never compacted
+    assert node_table.data['gene'].dtype == object
+
+    # records contain the categories and python types, like `to_dict('records')`
+    assert to_records(node_table.data.iloc[:2], ['source', 'gene', 'count']) == [
+        {'source': 'C0031485', 'gene': 'PAH', 'count': 1}, {'source': 'C0031485', 'gene': 'QDPR', 'count': 2}
+    ]
+    assert to_records(node_table.data) == df.astype({'source': str, 'node_label': str}).to_dict('records')
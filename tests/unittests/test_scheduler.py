@@ -0,0 +1,72 @@
+import time
+import pytest
+
+from pymedgraph.scheduler import Stage, StageGraph, StageScheduler
+
+
+def test_stage_graph_order():
+    graph = StageGraph()
+    graph.add(Stage('c', lambda inputs: None, depends_on=['a', 'b']))
+    graph.add(Stage('a', lambda inputs: None))
+    graph.add(Stage('b', lambda inputs: None, depends_on='a'))
+
+    assert graph.topological_order() == ['a', 'b', 'c']
+
+    # 1. duplicated stage
+    with pytest.raises(RuntimeError, match=r'Stage \'a\' is already *.'):
+        graph.add(Stage('a', lambda inputs: None))
+
+    # 2. unknown dependency
+    graph.add(Stage('d', lambda inputs: None, depends_on='x'))
+    with pytest.raises(RuntimeError, match=r'Stage \'d\' depends on unknown stages *.'):
+        graph.topological_order()
+
+    # 3. cycle
+    graph = StageGraph()
+    graph.add(Stage('a', lambda inputs: None, depends_on='b'))
+    graph.add(Stage('b', lambda inputs: None, depends_on='a'))
+    with pytest.raises(RuntimeError, match=r'Stage graph contains a cycle *.'):
+        graph.topological_order()
+
+
+def test_scheduler_run():
+    def sleep_and_return(value, sec):
+        def func(inputs):
+            time.sleep(sec)
+            return value + sum(inputs.values())
+        return func
+
+    graph = StageGraph()
+    graph.add(Stage('fetch', sleep_and_return(1, 0.05)))
+    graph.add(Stage('slow', sleep_and_return(10, 0.3), depends_on='fetch'))
+    graph.add(Stage('fast', sleep_and_return(100, 0.3), depends_on='fetch'))
+    graph.add(Stage('join', sleep_and_return(0, 0.), depends_on=['slow', 'fast']))
+
+    done = list()
+    scheduler = StageScheduler(max_workers=2)
+    results = scheduler.run(graph, on_stage_done=lambda name, result: done.append(name))
+
+    assert results == {'fetch': 1, 'slow': 11, 'fast': 101, 'join': 112}
+    assert done[0] == 'fetch' and done[-1] == 'join'
+    # independent stages run concurrently
+    assert scheduler.report['wall_time'] < 0.55
+    assert scheduler.report['critical_path'][0] == 'fetch'
+    assert scheduler.report['critical_path'][-1] == 'join'
+    assert len(scheduler.report['critical_path']) == 3
+
+    # skip completed stages
+    results = scheduler.run(graph, completed={'fetch': 2, 'slow': 0})
+    assert results['fast'] == 102
+    assert 'fetch' not in scheduler.report['stages']
+
+
+def test_scheduler_failure():
+    def fail(inputs):
+        raise ValueError('stage failed')
+
+    graph = StageGraph()
+    graph.add(Stage('a', fail))
+    graph.add(Stage('b', lambda inputs: 1, depends_on='a'))
+
+    with pytest.raises(ValueError, match=r'stage failed'):
+        StageScheduler().run(graph)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from pymedgraph.graph.reachability import ReachabilityIndex
+from pymedgraph.graph.setalgebra import SetAlgebra
+
+
+def _add(index, term, genes, go=()):
+    children = list(genes) + list(go)
+    labels = ['Gene'] * len(genes) + ['GO'] * len(go)
+    index.update(term, 0, [0] * len(children), children, labels)
+
+
+def test_set_algebra():
+    index = ReachabilityIndex()
+    _add(index, 'pku', [1, 2, 3], go=[10])
+    _add(index, 'hpa', [2, 3, 4, 5])
+    _add(index, 'epilepsy', [])
+    algebra = SetAlgebra(index, block_size=1)
+    genes = algebra.matrices(['pku', 'hpa', 'epilepsy'], ['Gene', 'GO'])['Gene']
+    assert genes['size'] == [3, 4, 0]
+    assert genes['intersection'] == [[3, 2, 0], [2, 4, 0], [0, 0, 0]]
+    assert genes['union'] == [[3, 5, 3], [5, 4, 4], [3, 4, 0]]
+    assert genes['jaccard'][0][1] == 0.4
+    assert genes['jaccard'][2][2] == 0.
+
+    # 1. results are cached until the index changes
+    result = algebra.matrices(['pku', 'hpa', 'epilepsy'], ['Gene', 'GO'])
+    assert algebra.matrices(['pku', 'hpa', 'epilepsy'], ['Gene', 'GO']) is result
+    _add(index, 'epilepsy', [5])
+    assert algebra.matrices(['hpa', 'epilepsy'], ['Gene'])['Gene']['intersection'] == [[4, 1], [1, 1]]
+
+    # 2. counts equal the intersection of the id arrays
+    rng = np.random.default_rng(0)
+    index = ReachabilityIndex()
+    for i in range(5):
+        _add(index, f't{i}', rng.choice(1000, 200, replace=False))
+    terms = index.terms()
+    matrix = SetAlgebra(index).matrices(terms, ['Gene'])['Gene']['intersection']
+    assert np.ravel(matrix).tolist() == [c for _, _, c in index.intersection_counts(terms, 'Gene')]
@@ -0,0 +1,23 @@
+import pytest
+
+from pymedgraph.graph.snapshot import SnapshotWriter, SnapshotReader
+
+pytest.importorskip('pyarrow')
+
+
+def test_snapshot_schema_change(tmp_path):
+    writer = SnapshotWriter(str(tmp_path))
+    writer.add_nodes('Gene', 'gene', [{'gene': 'PAH', 'score': None}])
+    # new types and properties start a new file, missing properties are written as nulls
+    writer.add_nodes('Gene', 'gene', [{'gene': 'QDPR', 'score': 0.5}, {'gene': 'GCH1', 'score': 1.}])
+    writer.add_nodes('Gene', 'gene', [{'gene': 'TH'}])
+    writer.add_nodes('Gene', 'gene', [{'gene': 'DDC', 'name': 'dopa decarboxylase'}])
+    manifest = writer.finish(['pku'])
+    assert manifest['nodes'] == {'Gene': ['nodes_Gene.parquet', 'nodes_Gene.1.parquet', 'nodes_Gene.2.parquet']}
+    assert manifest['counts']['nodes'] == {'Gene': 5}
+
+    rows = [row for _, _, batch in SnapshotReader(str(tmp_path)).nodes(batch_size=2) for row in batch]
+    assert rows == [
+        {'gene': 'PAH'}, {'gene': 'QDPR', 'score': 0.5}, {'gene': 'GCH1', 'score': 1.}, {'gene': 'TH'},
+        {'gene': 'DDC', 'name': 'dopa decarboxylase'}
+    ]
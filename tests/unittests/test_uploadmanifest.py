@@ -0,0 +1,29 @@
+from pymedgraph.graph.uploadmanifest import UploadManifest
+
+
+def test_upload_manifest(tmp_path, gene_table):
+    path = str(tmp_path / 'manifest.sqlite')
+    manifest = UploadManifest(path)
+    manifest.add_nodes('UMLS', 'CUI', ['C1', 'C2'])
+    table = gene_table(['PAH', 'QDPR', 'QDPR'])
+    diff = manifest.diff(table.data, table.meta, 'Gene', ['UMLS'])
+    assert (len(diff['nodes']), len(diff['relations']), len(diff['rows'])) == (2, 3, 3)
+    manifest.commit(diff)
+
+    # 1. unchanged rows are skipped, also after a restart
+    manifest = UploadManifest(path)
+    diff = manifest.diff(table.data, table.meta, 'Gene', ['UMLS'])
+    assert (len(diff['nodes']), len(diff['relations']), len(diff['rows'])) == (0, 0, 0)
+
+    # 2. changed attributes and new rows are sent, relations of unknown source nodes are sent again
+    table = gene_table(['PAH', 'QDPR2', 'QDPR2', 'GCH1'])
+    diff = manifest.diff(table.data, table.meta, 'Gene', ['UMLS'])
+    assert diff['nodes']['GeneID'].tolist() == ['g2', 'g3']
+    assert diff['relations']['CUI'].tolist() == ['C3']
+    manifest.commit(diff)
+    diff = manifest.diff(table.data, table.meta, 'Gene', ['UMLS'])
+    assert (len(diff['nodes']), diff['relations']['CUI'].tolist()) == (0, ['C3'])
+
+    manifest.clear()
+    assert len(manifest.diff(table.data, table.meta, 'Gene', ['UMLS'])['rows']) == 4
+